@@ -5,27 +5,63 @@ import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN, PLATFORMS
+from .const import (
+    DOMAIN,
+    PLATFORMS,
+    CONF_PROFILE_EVERY,
+    DEFAULT_PROFILE_EVERY,
+    DATA_CONFIG,
+    DATA_STATS,
+    DATA_COORDINATOR,
+    DATA_TELEMETRY,
+    LIVE_OPTIONS,
+    SIGNAL_OPTIONS_UPDATED,
+)
+from .coordinator import SmartThermostatCoordinator
+from .instrumentation import ControlLoopStats
+from .telemetry import ControlTelemetry
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the coordinator shared by all thermostat zones."""
+    coordinator = SmartThermostatCoordinator(hass)
+    await coordinator.async_register_shutdown()
+    hass.data.setdefault(DOMAIN, {})[DATA_COORDINATOR] = coordinator
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Smart Thermostat from a config entry."""
     # Store an instance of the "domain" that you can access in your entities
     hass.data.setdefault(DOMAIN, {})
 
     # Create instance of your component and store it in hass.data
-    hass.data[DOMAIN][entry.entry_id] = entry.data
+    hass.data[DOMAIN][entry.entry_id] = {
+        DATA_CONFIG: {**entry.data, **entry.options},
+        DATA_COORDINATOR: hass.data[DOMAIN][DATA_COORDINATOR],
+        DATA_STATS: ControlLoopStats(
+            int(entry.data.get(CONF_PROFILE_EVERY, DEFAULT_PROFILE_EVERY))
+        ),
+        DATA_TELEMETRY: ControlTelemetry(),
+    }
 
-    # Forward the setup to the climate platform
+    # Forward the setup to the climate and sensor platforms
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     # Register update listener to track config entry updates
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
 
     return True
 
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     # Unload entities for this entry/domain
@@ -37,7 +73,33 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     return unload_ok
 
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
     await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
\ No newline at end of file
+    await async_setup_entry(hass, entry)
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options to the running zone, or reload it.
+
+    Gains, thresholds and the schedule are handed to the zone, which keeps
+    its controller state, history and learned models. Other changes, such
+    as different entities, need the zone set up again.
+    """
+    runtime_data = hass.data[DOMAIN][entry.entry_id]
+    config = {**entry.data, **entry.options}
+    previous = runtime_data[DATA_CONFIG]
+    changed = {
+        key
+        for key in config.keys() | previous.keys()
+        if config.get(key) != previous.get(key)
+    }
+    if not changed:
+        return
+    if not changed <= LIVE_OPTIONS:
+        await async_reload_entry(hass, entry)
+        return
+    _LOGGER.debug("Applying %s to %s without a reload", sorted(changed), entry.title)
+    runtime_data[DATA_CONFIG] = config
+    async_dispatcher_send(hass, SIGNAL_OPTIONS_UPDATED.format(entry.entry_id), config)
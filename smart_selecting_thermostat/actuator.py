@@ -0,0 +1,258 @@
+"""Actuator command layer for the smart thermostat."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    ATTR_TEMPERATURE,
+    SERVICE_TURN_OFF,
+    SERVICE_TURN_ON,
+    STATE_OFF,
+    STATE_ON,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+)
+from homeassistant.core import HomeAssistant, State, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import SERVICE_CALL_TIMEOUT
+from .flight_recorder import FlightRecorder
+from .instrumentation import ControlLoopStats
+
+_LOGGER = logging.getLogger(__name__)
+
+# Fields tracked per entity
+FIELD_STATE = "state"
+FIELD_TEMPERATURE = ATTR_TEMPERATURE
+
+
+class ActuatorController:
+    """Send only the service calls needed to reach a desired actuator state.
+
+    For every entity the controller remembers the value it last commanded and
+    the state it last observed. A command is skipped when the observed value
+    already matches, or when the same command was sent and no newer state has
+    been observed since.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        stats: Optional[ControlLoopStats] = None,
+        recorder: Optional[FlightRecorder] = None,
+    ) -> None:
+        """Initialize the actuator controller."""
+        self.hass = hass
+        self.stats = stats if stats is not None else ControlLoopStats()
+        self.recorder = recorder
+        self._commanded: dict[tuple[str, str], Any] = {}
+        self._pending: set[tuple[str, str]] = set()
+        self._observed: dict[str, State] = {}
+
+    @callback
+    def async_observe(self, new_state: Optional[State]) -> bool:
+        """Record the latest observed state of an actuated entity.
+
+        Returns:
+            bool: True if the entity drifted away from a commanded value,
+            False for echoes of our own commands and unrelated changes
+        """
+        if new_state is None:
+            return False
+        entity_id = new_state.entity_id
+        self._observed[entity_id] = new_state
+        self._pending.difference_update(
+            [key for key in self._pending if key[0] == entity_id]
+        )
+        return any(
+            self._observed_value(*key) != value
+            for key, value in self._commanded.items()
+            if key[0] == entity_id
+        )
+
+    @callback
+    def async_invalidate(self, entity_id: Optional[str] = None) -> None:
+        """Forget remembered state so the next command is always sent."""
+        if entity_id is None:
+            self._commanded.clear()
+            self._pending.clear()
+            self._observed.clear()
+            return
+        self._observed.pop(entity_id, None)
+        for key in [key for key in self._commanded if key[0] == entity_id]:
+            self._commanded.pop(key)
+            self._pending.discard(key)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the commanded values for storage."""
+        return {
+            "commanded": [
+                [entity_id, field, value]
+                for (entity_id, field), value in self._commanded.items()
+            ]
+        }
+
+    @callback
+    def async_load(self, data: dict[str, Any]) -> None:
+        """Restore commanded values so drift is detected right after a restart."""
+        for entity_id, field, value in data.get("commanded", []):
+            self._commanded[(entity_id, field)] = value
+
+    def commanded(self, entity_id: str, field: str = FIELD_STATE) -> Any:
+        """Return the value last commanded for an entity field."""
+        return self._commanded.get((entity_id, field))
+
+    def _observed_value(self, entity_id: str, field: str) -> Any:
+        """Return the last observed value of an entity field."""
+        state = self._observed.get(entity_id)
+        if state is None:
+            state = self.hass.states.get(entity_id)
+            if state is None:
+                return None
+            self._observed[entity_id] = state
+        if state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return None
+        if field == FIELD_STATE:
+            return state.state
+        return state.attributes.get(field)
+
+    def _needs_command(self, key: tuple[str, str], desired: Any) -> bool:
+        """Return True if a service call is required to reach ``desired``."""
+        if key in self._pending and self._commanded.get(key) == desired:
+            return False
+        return self._observed_value(*key) != desired
+
+    def _claim(self, entity_id: str, field: str, desired: Any) -> bool:
+        """Return True if a command for ``desired`` is required.
+
+        Skipped commands are counted here so callers can batch the rest.
+        """
+        if self._needs_command((entity_id, field), desired):
+            return True
+        self.stats.skipped_calls += 1
+        return False
+
+    async def _async_call(
+        self,
+        domain: str,
+        service: str,
+        entity_ids: list[str],
+        field: str,
+        desired: Any,
+        data: Optional[dict[str, Any]] = None,
+    ) -> bool:
+        """Send one service call for ``entity_ids`` with a timeout."""
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(SERVICE_CALL_TIMEOUT):
+                await self.hass.services.async_call(
+                    domain,
+                    service,
+                    {ATTR_ENTITY_ID: entity_ids, **(data or {})},
+                    blocking=True,
+                )
+        except TimeoutError:
+            _LOGGER.warning(
+                "Timed out calling %s.%s for %s", domain, service, entity_ids
+            )
+            self.stats.failed_calls += 1
+            self._record_call(service, entity_ids, data, False)
+            return False
+        except HomeAssistantError as err:
+            _LOGGER.error(
+                "Error calling %s.%s for %s: %s", domain, service, entity_ids, err
+            )
+            self.stats.failed_calls += 1
+            self._record_call(service, entity_ids, data, False)
+            return False
+        self._record_call(service, entity_ids, data, True)
+
+        self.stats.record_call(
+            entity_ids,
+            time.monotonic() - started,
+            len(entity_ids) if field == FIELD_STATE else 0,
+        )
+        for entity_id in entity_ids:
+            key = (entity_id, field)
+            self._commanded[key] = desired
+            self._pending.add(key)
+        return True
+
+    def _record_call(
+        self,
+        service: str,
+        entity_ids: list[str],
+        data: Optional[dict[str, Any]],
+        succeeded: bool,
+    ) -> None:
+        """Record a service call in the flight recorder, if there is one."""
+        if self.recorder is not None:
+            self.recorder.call(
+                service,
+                entity_ids,
+                (data or {}).get(ATTR_TEMPERATURE),
+                succeeded,
+            )
+
+    async def _async_switch_many(
+        self, entity_ids: list[str], desired: str, service: str
+    ) -> bool:
+        """Switch entities concurrently, one service call per domain."""
+        by_domain: dict[str, list[str]] = {}
+        for entity_id in entity_ids:
+            if self._claim(entity_id, FIELD_STATE, desired):
+                by_domain.setdefault(entity_id.split(".", 1)[0], []).append(
+                    entity_id
+                )
+        if not by_domain:
+            return True
+
+        results = await asyncio.gather(
+            *(
+                self._async_call(domain, service, ids, FIELD_STATE, desired)
+                for domain, ids in by_domain.items()
+            )
+        )
+        return all(results)
+
+    async def async_turn_on(self, *entity_ids: str) -> bool:
+        """Turn entities on if they are not already on."""
+        return await self._async_switch_many(
+            list(entity_ids), STATE_ON, SERVICE_TURN_ON
+        )
+
+    async def async_turn_off(self, *entity_ids: str) -> bool:
+        """Turn entities off if they are not already off."""
+        return await self._async_switch_many(
+            list(entity_ids), STATE_OFF, SERVICE_TURN_OFF
+        )
+
+    async def async_set_temperature(self, entity_id: str, temperature: float) -> bool:
+        """Set a climate entity setpoint if it differs from ``temperature``."""
+        if not self._claim(entity_id, FIELD_TEMPERATURE, temperature):
+            return True
+        return await self._async_call(
+            entity_id.split(".", 1)[0],
+            "set_temperature",
+            [entity_id],
+            FIELD_TEMPERATURE,
+            temperature,
+            {ATTR_TEMPERATURE: temperature},
+        )
+
+    async def async_set_level(self, switches: list[str], level: int) -> bool:
+        """Leave only the switch for ``level`` turned on.
+
+        All stale level switches are turned off in a single call before the
+        requested level is turned on, so two levels are never on at once.
+        """
+        wanted = switches[level - 1] if 1 <= level <= len(switches) else None
+        if not await self.async_turn_off(*(s for s in switches if s != wanted)):
+            return False
+        if wanted is None:
+            return True
+        return await self.async_turn_on(wanted)
@@ -0,0 +1,238 @@
+"""Relay-feedback autotuning of the pellet stove PID gains."""
+from __future__ import annotations
+
+import math
+from typing import Any, Optional
+
+from .const import (
+    AUTOTUNE_ABORTED,
+    AUTOTUNE_CYCLES,
+    AUTOTUNE_FINISHED,
+    AUTOTUNE_HIGH_LEVEL,
+    AUTOTUNE_HYSTERESIS,
+    AUTOTUNE_LOW_LEVEL,
+    AUTOTUNE_MAX_DEVIATION,
+    AUTOTUNE_MAX_DURATION,
+    AUTOTUNE_RUNNING,
+    AUTOTUNE_SETTLE_CYCLES,
+    AUTOTUNE_TOLERANCE,
+)
+
+
+def relay_gains(
+    ultimate_gain: float, ultimate_period: float
+) -> tuple[float, float, float]:
+    """Return PID gains for the ultimate gain and period of a relay test.
+
+    The Tyreus-Luyben PI rule is used: it gives less overshoot than
+    Ziegler-Nichols on slow, lag dominated plants like a house heated by a
+    stove. The derivative gain is zero because the derivative of a sensor
+    with 0.1 °F steps, taken every sample time, would toggle the level
+    relays. The gains match ``PelletStovePIDController``, which integrates
+    per second.
+
+    Args:
+        ultimate_gain: Stove levels per °F at which the loop oscillates
+        ultimate_period: Seconds per oscillation at the ultimate gain
+
+    Returns:
+        The proportional, integral and derivative gains
+    """
+    kp = ultimate_gain / 3.2
+    ki = kp / (2.2 * ultimate_period)
+    kd = 0.0
+    return kp, ki, kd
+
+
+class RelayAutotuner:
+    """Åström-Hägglund relay experiment on the stove level.
+
+    The stove runs at the high level until the temperature rises past the
+    hysteresis band above the setpoint and at the low level until it falls
+    past the band below it. The lag of the stove and the house turns this
+    into a steady oscillation whose amplitude and period give the ultimate
+    gain and period of the loop. The first oscillations are discarded; the
+    result is taken once the last few agree within the tolerance.
+
+    The experiment aborts once it runs longer than the maximum duration or
+    the temperature leaves the allowed band around the setpoint. The tuner
+    holds no Home Assistant state; time is passed in with every reading.
+    """
+
+    __slots__ = (
+        "setpoint",
+        "high_level",
+        "low_level",
+        "hysteresis",
+        "cycles",
+        "settle_cycles",
+        "tolerance",
+        "max_duration",
+        "max_deviation",
+        "started_at",
+        "state",
+        "reason",
+        "heating",
+        "ultimate_gain",
+        "ultimate_period",
+        "gains",
+        "_extreme",
+        "_peak",
+        "_switched_up_at",
+        "_periods",
+        "_amplitudes",
+    )
+
+    def __init__(
+        self,
+        setpoint: float,
+        started_at: float,
+        high_level: int = AUTOTUNE_HIGH_LEVEL,
+        low_level: int = AUTOTUNE_LOW_LEVEL,
+        hysteresis: float = AUTOTUNE_HYSTERESIS,
+        cycles: int = AUTOTUNE_CYCLES,
+        settle_cycles: int = AUTOTUNE_SETTLE_CYCLES,
+        tolerance: float = AUTOTUNE_TOLERANCE,
+        max_duration: float = AUTOTUNE_MAX_DURATION,
+        max_deviation: float = AUTOTUNE_MAX_DEVIATION,
+    ) -> None:
+        """Initialize the experiment.
+
+        Args:
+            setpoint: Temperature the relay switches around
+            started_at: Timestamp the experiment starts
+            high_level: Stove level below the setpoint
+            low_level: Stove level above the setpoint
+            hysteresis: °F past the setpoint before the relay switches
+            cycles: Consistent oscillations needed for a result
+            settle_cycles: Oscillations discarded at the start
+            tolerance: Largest relative spread of the periods and amplitudes
+            max_duration: Seconds before the experiment is aborted
+            max_deviation: °F from the setpoint before it is aborted
+        """
+        if high_level <= low_level:
+            raise ValueError("The high level must be above the low level")
+        self.setpoint = setpoint
+        self.high_level = high_level
+        self.low_level = low_level
+        self.hysteresis = hysteresis
+        self.cycles = cycles
+        self.settle_cycles = settle_cycles
+        self.tolerance = tolerance
+        self.max_duration = max_duration
+        self.max_deviation = max_deviation
+        self.started_at = started_at
+        self.state = AUTOTUNE_RUNNING
+        self.reason: Optional[str] = None
+        self.heating: Optional[bool] = None
+        self.ultimate_gain: Optional[float] = None
+        self.ultimate_period: Optional[float] = None
+        self.gains: Optional[tuple[float, float, float]] = None
+        self._extreme = 0.0
+        self._peak: Optional[float] = None
+        self._switched_up_at: Optional[float] = None
+        self._periods: list[float] = []
+        self._amplitudes: list[float] = []
+
+    @property
+    def running(self) -> bool:
+        """Return True while the experiment runs."""
+        return self.state == AUTOTUNE_RUNNING
+
+    @property
+    def level(self) -> int:
+        """Return the stove level of the relay."""
+        return self.high_level if self.heating else self.low_level
+
+    def update(self, now: float, temperature: float) -> int:
+        """Feed a temperature reading and return the stove level to run.
+
+        Args:
+            now: Timestamp of the reading
+            temperature: Inside temperature
+
+        Returns:
+            The relay level; once the experiment ended, the level it ended on
+        """
+        if not self.running:
+            return self.level
+        if self.heating is None:
+            self.heating = temperature < self.setpoint
+            self._extreme = temperature
+        if now - self.started_at > self.max_duration:
+            self.abort("timeout")
+        elif abs(temperature - self.setpoint) > self.max_deviation:
+            self.abort("out_of_bounds")
+        elif self.heating:
+            self._extreme = min(self._extreme, temperature)
+            if temperature >= self.setpoint + self.hysteresis:
+                self._switch_up(now, temperature)
+        else:
+            self._extreme = max(self._extreme, temperature)
+            if temperature <= self.setpoint - self.hysteresis:
+                # The peak of this oscillation was reached while heating low
+                self._peak = self._extreme
+                self.heating = True
+                self._extreme = temperature
+        return self.level
+
+    def _switch_up(self, now: float, temperature: float) -> None:
+        """Switch to the low level, completing an oscillation."""
+        trough = self._extreme
+        if self._switched_up_at is not None and self._peak is not None:
+            self._periods.append(now - self._switched_up_at)
+            self._amplitudes.append((self._peak - trough) / 2)
+        self._switched_up_at = now
+        self.heating = False
+        self._extreme = temperature
+        self._evaluate()
+
+    def _evaluate(self) -> None:
+        """Finish the experiment once the last oscillations agree."""
+        measured = len(self._periods) - self.settle_cycles
+        if measured < self.cycles:
+            return
+        periods = self._periods[-self.cycles :]
+        amplitudes = self._amplitudes[-self.cycles :]
+        if _spread(periods) > self.tolerance or _spread(amplitudes) > self.tolerance:
+            return
+
+        period = sum(periods) / len(periods)
+        amplitude = sum(amplitudes) / len(amplitudes)
+        # Describing function of a relay with hysteresis
+        relay = (self.high_level - self.low_level) / 2
+        effective = amplitude * amplitude - self.hysteresis * self.hysteresis
+        self.ultimate_gain = 4 * relay / (
+            math.pi * (math.sqrt(effective) if effective > 0 else amplitude)
+        )
+        self.ultimate_period = period
+        self.gains = relay_gains(self.ultimate_gain, period)
+        self.state = AUTOTUNE_FINISHED
+
+    def abort(self, reason: str) -> None:
+        """Stop the experiment without a result."""
+        if self.running:
+            self.state = AUTOTUNE_ABORTED
+            self.reason = reason
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the progress of the experiment for the state attributes."""
+        data: dict[str, Any] = {
+            "state": self.state,
+            "cycles": max(len(self._periods) - self.settle_cycles, 0),
+        }
+        if self.reason is not None:
+            data["reason"] = self.reason
+        if self.gains is not None:
+            data["ultimate_gain"] = round(self.ultimate_gain, 3)
+            data["ultimate_period"] = round(self.ultimate_period)
+            data["gains"] = [round(gain, 6) for gain in self.gains]
+        return data
+
+
+def _spread(values: list[float]) -> float:
+    """Return the range of ``values`` relative to their mean."""
+    mean = sum(values) / len(values)
+    if mean <= 0:
+        return math.inf
+    return (max(values) - min(values)) / mean
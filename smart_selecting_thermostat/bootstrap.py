@@ -0,0 +1,208 @@
+"""Bootstrap the temperature history and heating models from the recorder."""
+from __future__ import annotations
+
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import partial
+from typing import Iterable, Optional
+
+from homeassistant.const import STATE_OFF, STATE_ON, STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant, State, split_entity_id
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    BOOTSTRAP_CHUNK,
+    BOOTSTRAP_HOURS,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+)
+from .heating_model import SourceRateModels
+from .sensor_fusion import SensorFusion
+from .temperature_history import TemperatureHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class BootstrapResult:
+    """Latest values seen while replaying the recorded history."""
+
+    inside_temp: Optional[float] = None
+    outside_temp: Optional[float] = None
+    samples: int = 0
+    model_updates: int = 0
+
+
+class HistoryReplay:
+    """Feed recorded states, oldest first, into a history and the models.
+
+    The temperatures pass through the same sensor fusion as live readings.
+    The active source is derived from the stove power switch and the
+    mini-split state, so the models only learn from periods where the
+    source is known.
+    """
+
+    def __init__(
+        self,
+        inside: SensorFusion,
+        outside: SensorFusion,
+        minisplit_entity: str,
+        stove_switch: str,
+        history: TemperatureHistory,
+        models: SourceRateModels,
+        target_temp: float,
+        train_after: float = 0.0,
+    ) -> None:
+        """Initialize the replay.
+
+        Args:
+            inside: Fusion of the inside temperature sensors
+            outside: Fusion of the outside temperature sensors
+            minisplit_entity: Mini-split climate entity
+            stove_switch: Pellet stove power switch
+            history: History to fill
+            models: Models to train
+            target_temp: Target temperature assumed for the replayed period
+            train_after: Only train on samples after this timestamp, e.g.
+                the time the stored models were saved
+        """
+        self.inside = inside
+        self.outside = outside
+        self.minisplit_entity = minisplit_entity
+        self.stove_switch = stove_switch
+        self.history = history
+        self.models = models
+        self.target_temp = target_temp
+        self.train_after = train_after
+        self.result = BootstrapResult()
+        self._stove_on = False
+        self._minisplit_on = False
+        self._source: Optional[str] = None
+        self._source_since = 0.0
+
+    @property
+    def needs_attributes(self) -> bool:
+        """Return True if a temperature sensor is read from its attributes.
+
+        Weather entities report the temperature as an attribute, so their
+        history has to be read with the attributes.
+        """
+        return any(
+            split_entity_id(entity_id)[0] == "weather"
+            for entity_id in (*self.inside.entity_ids, *self.outside.entity_ids)
+        )
+
+    def feed(self, state: State) -> None:
+        """Replay one recorded state."""
+        timestamp = state.last_updated_timestamp
+        entity_id = state.entity_id
+        if entity_id in self.inside:
+            if (value := self.inside.update_state(entity_id, state, timestamp)) is None:
+                return
+            self.history.append(timestamp, value)
+            self.result.inside_temp = value
+            self.result.samples += 1
+            if (
+                self._source is not None
+                and timestamp > self.train_after
+                and self.models.observe(
+                    self._source,
+                    self._source_since,
+                    timestamp,
+                    self.result.outside_temp,
+                    self.target_temp,
+                    self.history,
+                )
+            ):
+                self.result.model_updates += 1
+            return
+
+        if entity_id in self.outside:
+            self.result.outside_temp = self.outside.update_state(
+                entity_id, state, timestamp
+            )
+            return
+
+        if entity_id == self.stove_switch:
+            self._stove_on = state.state == STATE_ON
+        elif entity_id == self.minisplit_entity:
+            self._minisplit_on = state.state not in (
+                STATE_OFF,
+                STATE_UNKNOWN,
+                STATE_UNAVAILABLE,
+            )
+        source = None
+        if self._stove_on:
+            source = SOURCE_PELLET
+        elif self._minisplit_on:
+            source = SOURCE_MINISPLIT
+        if source != self._source:
+            self._source = source
+            self._source_since = timestamp
+
+    def feed_all(self, states: Iterable[State]) -> None:
+        """Replay states in order."""
+        for state in states:
+            self.feed(state)
+
+
+def _merge_chunk(chunk: dict[str, list[State]]) -> Iterable[State]:
+    """Merge the per-entity state lists of a chunk by time."""
+    return heapq.merge(
+        *chunk.values(), key=lambda state: state.last_updated_timestamp
+    )
+
+
+async def async_replay_recorder(
+    hass: HomeAssistant,
+    replay: HistoryReplay,
+    hours: float = BOOTSTRAP_HOURS,
+    chunk_seconds: float = BOOTSTRAP_CHUNK,
+) -> BootstrapResult:
+    """Stream the last ``hours`` of recorded states into ``replay``.
+
+    The history is read in chunks of ``chunk_seconds`` on the recorder
+    executor, so only one chunk is held in memory at a time and the event
+    loop is never blocked by the database. The attributes are only read
+    when a weather entity supplies a temperature.
+    """
+    # The recorder is an optional dependency
+    from homeassistant.components.recorder import get_instance, history
+
+    recorder = get_instance(hass)
+    no_attributes = not replay.needs_attributes
+    entity_ids = [
+        *replay.inside.entity_ids,
+        *replay.outside.entity_ids,
+        replay.minisplit_entity,
+        replay.stove_switch,
+    ]
+    end = dt_util.utcnow()
+    start = end - timedelta(hours=hours)
+    first = True
+    while start < end:
+        chunk_end = min(start + timedelta(seconds=chunk_seconds), end)
+        chunk = await recorder.async_add_executor_job(
+            partial(
+                history.get_significant_states,
+                hass,
+                start,
+                chunk_end,
+                entity_ids,
+                include_start_time_state=first,
+                significant_changes_only=False,
+                no_attributes=no_attributes,
+            )
+        )
+        replay.feed_all(_merge_chunk(chunk))
+        first = False
+        start = chunk_end
+
+    _LOGGER.debug(
+        "Replayed %d inside samples (%d model updates) from the recorder",
+        replay.result.samples,
+        replay.result.model_updates,
+    )
+    return replay.result
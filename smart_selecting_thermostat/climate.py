@@ -1,10 +1,13 @@
 """Climate platform for smart thermostat."""
 from __future__ import annotations
 
+import asyncio
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from typing import Any, Optional
 
+import voluptuous as vol
 from homeassistant.components.climate import (
     ClimateEntity,
     ClimateEntityFeature,
@@ -15,12 +18,21 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     ATTR_TEMPERATURE,
     PRECISION_TENTHS,
+    STATE_OFF,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
     UnitOfTemperature,
 )
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, entity_platform
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_state_change_event, async_track_time_interval
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
@@ -31,22 +43,83 @@ from .const import (
     CONF_INSIDE_TEMP_SENSOR,
     CONF_MIN_OUTSIDE_TEMP,
     CONF_CONTROL_MODE,
+    CONF_EVENT_DEBOUNCE,
+    CONF_TARGET_TIMEOUT,
+    CONF_WEATHER_ENTITY,
+    CONF_MIN_FORECAST_HOURS,
+    CONF_ELECTRICITY_PRICE_ENTITY,
+    CONF_PELLET_PRICE,
+    CONF_PELLET_EFFICIENCY,
+    CONF_COP_CURVE,
+    CONF_SCHEDULE,
+    CONF_PID_KP,
+    CONF_PID_KI,
+    CONF_PID_KD,
+    DEFAULT_EVENT_DEBOUNCE,
+    DEFAULT_MIN_FORECAST_HOURS,
+    DEFAULT_TARGET_TEMP,
+    DEFAULT_PELLET_PRICE,
+    DEFAULT_PELLET_EFFICIENCY,
+    DEFAULT_COP_CURVE,
+    DEFAULT_PID_KP,
+    DEFAULT_PID_KI,
+    DEFAULT_PID_KD,
     ATTR_ACTIVE_SOURCE,
     ATTR_SOURCE_REASON,
+    ATTR_HEAT_COST,
+    ATTR_OUTSIDE_TEMP,
+    ATTR_SENSOR_HEALTH,
+    ATTR_FAULTY_SENSORS,
+    ATTR_AUTOTUNE,
+    ATTR_NEXT_SETPOINT,
+    AUTOTUNE_FINISHED,
+    AUTOTUNE_HIGH_LEVEL,
+    AUTOTUNE_LOW_LEVEL,
+    REASON_AUTOTUNE,
+    SERVICE_ABORT_AUTOTUNE,
+    SERVICE_START_AUTOTUNE,
+    SIGNAL_OPTIONS_UPDATED,
+    FORECAST_HORIZON,
+    PELLET_BAG_WEIGHT,
     SOURCE_MINISPLIT,
     SOURCE_PELLET,
-    REASON_TEMP_TOO_LOW,
-    REASON_TEMP_DECREASING,
-    REASON_NOT_REACHING_TARGET,
     MODE_PID,
-    MONITOR_INTERVAL,
+    MODE_MPC,
     TEMP_TREND_PERIOD,
+    TEMP_HISTORY_CAPACITY,
+    TEMP_CHANGE_THRESHOLD,
     TARGET_TIMEOUT,
+    MODEL_SAVE_DELAY,
+    STORAGE_VERSION,
+    SNAPSHOT_SAVE_INTERVAL,
+    SNAPSHOT_MAX_AGE,
+    SOURCE_MIN_RUN_TIME,
+    PID_SAMPLE_TIME,
+    TICK_MIN_INTERVAL,
+    TICK_TRANSITION_TIME,
+    DATA_STATS,
+    DATA_COORDINATOR,
+    DATA_TELEMETRY,
 )
-from .pid_controller import PelletStovePIDController
+from .actuator import ActuatorController
+from .autotune import RelayAutotuner
+from .bootstrap import HistoryReplay, async_replay_recorder
+from .cost_model import CopCurve, CostModel, CostPlan, PriceProfile, parse_cop_curve
+from .flight_recorder import FlightRecorder
+from .heating_model import SourceRateModels
+from .mpc import MpcController
+from .pid_controller import PelletStovePIDController, on_off_level
+from .relay_scheduler import RelayScheduler
+from .schedule import ComfortSchedule, OptimalStartPlanner, parse_schedule
+from .sensor_fusion import SensorFusion
+from .source_selector import SourceSelector
+from .telemetry import Rollup, statistics
+from .temperature_history import TemperatureHistory
+from .tick_scheduler import TickScheduler
 
 _LOGGER = logging.getLogger(__name__)
 
+
 async def async_setup_entry(
     hass: HomeAssistant,
     config_entry: ConfigEntry,
@@ -55,7 +128,40 @@ async def async_setup_entry(
     """Set up the Smart Thermostat climate device."""
     async_add_entities([SmartThermostat(hass, config_entry)])
 
-class SmartThermostat(ClimateEntity):
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_START_AUTOTUNE,
+        {
+            vol.Optional("high_level", default=AUTOTUNE_HIGH_LEVEL): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=5)
+            ),
+            vol.Optional("low_level", default=AUTOTUNE_LOW_LEVEL): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=5)
+            ),
+        },
+        "async_start_autotune",
+    )
+    platform.async_register_entity_service(
+        SERVICE_ABORT_AUTOTUNE, {}, "async_abort_autotune"
+    )
+
+
+def _changed(previous: Optional[float], current: float) -> bool:
+    """Return True if a temperature moved past the change threshold."""
+    return previous is None or abs(current - previous) >= TEMP_CHANGE_THRESHOLD
+
+
+def _reading(state) -> Optional[float]:
+    """Return the numeric value of a sensor state, if it has one."""
+    if state is None:
+        return None
+    try:
+        return float(state.state)
+    except ValueError:
+        return None
+
+
+class SmartThermostat(ClimateEntity, RestoreEntity):
     """Smart thermostat with intelligent source selection."""
 
     _enable_turn_on_off_backwards_compatibility = False
@@ -67,32 +173,129 @@ class SmartThermostat(ClimateEntity):
         self._attr_name = "Smart Thermostat"
         self._attr_unique_id = config_entry.entry_id
 
-        # Get configuration
-        self._minisplit_entity = config_entry.data[CONF_MINISPLIT_ENTITY]
-        self._pellet_power_switch = config_entry.data[CONF_PELLET_POWER_SWITCH]
-        self._pellet_level_switches = config_entry.data[CONF_PELLET_LEVEL_SWITCHES]
-        self._outside_temp_sensor = config_entry.data[CONF_OUTSIDE_TEMP_SENSOR]
-        self._inside_temp_sensor = config_entry.data[CONF_INSIDE_TEMP_SENSOR]
-        self._min_outside_temp = config_entry.data[CONF_MIN_OUTSIDE_TEMP]
-        self._control_mode = config_entry.data[CONF_CONTROL_MODE]
+        # Get configuration; options written by the options flow override
+        # the data entered at setup
+        config = {**config_entry.data, **config_entry.options}
+        self._minisplit_entity = config[CONF_MINISPLIT_ENTITY]
+        self._pellet_power_switch = config[CONF_PELLET_POWER_SWITCH]
+        self._pellet_level_switches = config[CONF_PELLET_LEVEL_SWITCHES]
+        self._outside_temp_sensors = tuple(
+            cv.ensure_list(config[CONF_OUTSIDE_TEMP_SENSOR])
+        )
+        self._inside_temp_sensors = cv.ensure_list(
+            config[CONF_INSIDE_TEMP_SENSOR]
+        )
+        self._min_outside_temp = config[CONF_MIN_OUTSIDE_TEMP]
+        self._control_mode = config[CONF_CONTROL_MODE]
+        self._weather_entity = config.get(CONF_WEATHER_ENTITY)
+        self._min_forecast_hours = config.get(
+            CONF_MIN_FORECAST_HOURS, DEFAULT_MIN_FORECAST_HOURS
+        )
+        self._electricity_price_entity = config.get(
+            CONF_ELECTRICITY_PRICE_ENTITY
+        )
+        self._actuated_entities = {
+            self._minisplit_entity,
+            self._pellet_power_switch,
+            *self._pellet_level_switches,
+        }
 
         # State variables
         self._active_source = SOURCE_MINISPLIT
         self._source_reason = None
         self._hvac_mode = HVACMode.OFF
-        self._target_temp = 20.0
+        self._target_temp = float(DEFAULT_TARGET_TEMP)
         self._current_temp = None
         self._outside_temp = None
-        self._temp_history = []
+        self._inside_fusion = SensorFusion(self._inside_temp_sensors)
+        self._temp_history = TemperatureHistory(
+            TEMP_TREND_PERIOD, TEMP_HISTORY_CAPACITY
+        )
         self._last_target_change = datetime.now()
+        runtime_data = hass.data[DOMAIN][config_entry.entry_id]
+        self._coordinator = runtime_data[DATA_COORDINATOR]
+        self._stats = runtime_data[DATA_STATS]
+        self._telemetry = runtime_data[DATA_TELEMETRY]
+        # Always-on log of inputs and decisions, replayable offline
+        self._flight_recorder = FlightRecorder(
+            hass.config.path(STORAGE_DIR, f"{DOMAIN}.{config_entry.entry_id}.flight"),
+            [
+                self._minisplit_entity,
+                self._pellet_power_switch,
+                *self._pellet_level_switches,
+            ],
+            time_fn=lambda: dt_util.utcnow().timestamp(),
+        )
+        self._actuator = ActuatorController(hass, self._stats, self._flight_recorder)
+        self._relay_scheduler = RelayScheduler(stats=self._stats)
+        self._cancel_pending_change: Optional[CALLBACK_TYPE] = None
+        self._source_selector = SourceSelector(
+            self._min_outside_temp,
+            config.get(CONF_TARGET_TIMEOUT, TARGET_TIMEOUT),
+        )
+        self._pid_gains = (
+            config.get(CONF_PID_KP, DEFAULT_PID_KP),
+            config.get(CONF_PID_KI, DEFAULT_PID_KI),
+            config.get(CONF_PID_KD, DEFAULT_PID_KD),
+        )
+        self._autotune: Optional[RelayAutotuner] = None
+        # Comfort schedule with optimal start, if one is configured
+        self._schedule = config.get(CONF_SCHEDULE)
+        self._planner = self._make_planner(self._schedule)
+        self._rate_models = SourceRateModels()
+        self._source_since = dt_util.utcnow().timestamp()
+        self._tick_scheduler = TickScheduler()
+        self._tick_interval = self._tick_scheduler.interval
+        self._store: Store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}"
+        )
+        self._last_snapshot = time.monotonic()
+        self._snapshot_saved_at = 0.0
+
+        # Cost based source selection, if an electricity price is configured
+        self._cost_model: Optional[CostModel] = None
+        self._price_profile = PriceProfile()
+        self._electricity_price: Optional[float] = None
+        self._cost_plan: Optional[CostPlan] = None
+        self._cost_plan_key: Optional[tuple] = None
+        if self._electricity_price_entity:
+            self._cost_model = CostModel(
+                CopCurve(
+                    parse_cop_curve(
+                        config.get(CONF_COP_CURVE, DEFAULT_COP_CURVE)
+                    )
+                ),
+                config.get(CONF_PELLET_PRICE, DEFAULT_PELLET_PRICE)
+                / PELLET_BAG_WEIGHT,
+                config.get(
+                    CONF_PELLET_EFFICIENCY, DEFAULT_PELLET_EFFICIENCY
+                ),
+            )
+
+        # Event pipeline: bursts of sensor events are coalesced into one
+        # control pass, and only one pass runs at a time
+        self._control_lock = asyncio.Lock()
+        self._control_requested = False
+        self._controlled_temp: Optional[float] = None
+        self._controlled_outside_temp: Optional[float] = None
+        self._debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=config.get(
+                CONF_EVENT_DEBOUNCE, DEFAULT_EVENT_DEBOUNCE
+            ),
+            immediate=False,
+            function=self._async_run_control,
+        )
 
         # Set up PID controller if needed
         if self._control_mode == MODE_PID:
-            self._pid_controller = PelletStovePIDController(
-                config_entry.data.get("pid_kp", 1.0),
-                config_entry.data.get("pid_ki", 0.1),
-                config_entry.data.get("pid_kd", 0.05),
-            )
+            self._pid_controller = PelletStovePIDController(*self._pid_gains)
+
+        # Set up the model-predictive controller if needed
+        self._mpc: Optional[MpcController] = None
+        if self._control_mode == MODE_MPC:
+            self._mpc = MpcController()
 
         # Set up supported features
         self._attr_supported_features = (
@@ -111,36 +314,265 @@ class SmartThermostat(ClimateEntity):
         """Run when entity about to be added."""
         await super().async_added_to_hass()
 
-        # Set up state change listeners
-        self.async_on_remove(
-            async_track_state_change_event(
-                self.hass,
-                [
-                    self._inside_temp_sensor,
-                    self._outside_temp_sensor,
-                    self._minisplit_entity,
-                    self._pellet_power_switch,
-                ],
-                self._async_state_changed,
+        # Restore the mode and target, then the learned heating rates and
+        # the controller snapshot
+        if (last_state := await self.async_get_last_state()) is not None:
+            self._restore_last_state(last_state)
+        if (stored := await self._store.async_load()) is not None:
+            self._rate_models.load(stored.get("models", {}))
+            if self._mpc is not None and stored.get("stove_model"):
+                self._mpc.load(stored["stove_model"])
+            self._restore_snapshot(stored.get("snapshot"))
+
+        try:
+            await self.hass.async_add_executor_job(self._flight_recorder.open)
+        except OSError as err:
+            _LOGGER.warning("Flight recorder disabled: %s", err)
+        self._flight_recorder.config(
+            self._control_mode,
+            self._min_outside_temp,
+            self._source_selector.target_timeout,
+            self._pid_gains if self._control_mode == MODE_PID else None,
+        )
+        self._flight_recorder.target(self._target_temp)
+        self._flight_recorder.hvac_mode(self._hvac_mode != HVACMode.OFF)
+
+        now = dt_util.utcnow().timestamp()
+        for sensor in self._inside_temp_sensors:
+            self._inside_fusion.update_state(sensor, self.hass.states.get(sensor), now)
+        self._current_temp = self._inside_fusion.estimate
+        if self._electricity_price_entity:
+            self._update_electricity_price(
+                self.hass.states.get(self._electricity_price_entity)
             )
+
+        # State changes, periodic monitoring and forecast updates are
+        # driven by the coordinator shared by all zones
+        self.async_on_remove(self._coordinator.async_add_zone(self))
+        self._outside_temp = self._coordinator.outside_temp(
+            self._outside_temp_sensors
         )
 
-        # Set up periodic monitoring
+        self.async_on_remove(self._debouncer.async_cancel)
+        self.async_on_remove(self._async_cancel_pending_change)
         self.async_on_remove(
-            async_track_time_interval(
+            async_dispatcher_connect(
                 self.hass,
-                self._async_monitor_conditions,
-                timedelta(seconds=MONITOR_INTERVAL),
+                SIGNAL_OPTIONS_UPDATED.format(self.config_entry.entry_id),
+                self._async_apply_options,
             )
         )
 
+        # Fill the trend history and models from the recorder in the
+        # background; control passes wait for it to finish
+        if "recorder" in self.hass.config.components:
+            self.hass.async_create_task(self._async_bootstrap())
+
+        # Resume right away instead of waiting for the next tick
+        if self._hvac_mode != HVACMode.OFF:
+            self._stats.triggers += 1
+            await self._debouncer.async_call()
+
+    def _make_planner(self, schedule: Optional[str]) -> Optional[OptimalStartPlanner]:
+        """Return the optimal start planner of a schedule, None without one."""
+        if not schedule:
+            return None
+        return OptimalStartPlanner(
+            ComfortSchedule(parse_schedule(schedule), dt_util.DEFAULT_TIME_ZONE),
+            self._min_outside_temp,
+        )
+
+    @callback
+    def _async_apply_options(self, config: dict[str, Any]) -> None:
+        """Apply changed gains, thresholds and schedule to the running zone.
+
+        The temperature history, learned models and controller state are
+        kept: new gains continue from the PID's current integral, and the
+        next control pass, requested right away, uses the new settings.
+        """
+        self._pid_gains = (
+            config.get(CONF_PID_KP, DEFAULT_PID_KP),
+            config.get(CONF_PID_KI, DEFAULT_PID_KI),
+            config.get(CONF_PID_KD, DEFAULT_PID_KD),
+        )
+        if self._control_mode == MODE_PID:
+            self._pid_controller.set_tunings(*self._pid_gains)
+        self._min_outside_temp = config[CONF_MIN_OUTSIDE_TEMP]
+        self._source_selector.min_outside_temp = self._min_outside_temp
+        self._source_selector.target_timeout = config.get(
+            CONF_TARGET_TIMEOUT, TARGET_TIMEOUT
+        )
+        if (schedule := config.get(CONF_SCHEDULE)) != self._schedule:
+            self._schedule = schedule
+            self._planner = self._make_planner(schedule)
+        elif self._planner is not None and self._planner.planned_at is not None:
+            # Plan the preheats again for the new threshold
+            self._planner.min_outside_temp = self._min_outside_temp
+            self._planner.plan(
+                dt_util.utcnow().timestamp(),
+                self._current_temp,
+                self._rate_models,
+                self._outside_at,
+            )
+        self._flight_recorder.config(
+            self._control_mode,
+            self._min_outside_temp,
+            self._source_selector.target_timeout,
+            self._pid_gains if self._control_mode == MODE_PID else None,
+        )
+        _LOGGER.info("Applied new options to %s", self.entity_id)
+        self.async_write_ha_state()
+        self.hass.async_create_task(self.async_control_heating())
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Save the controller snapshot before a reload or removal."""
+        await super().async_will_remove_from_hass()
+        await self._store.async_save(self._data_to_store())
+        await self.hass.async_add_executor_job(self._flight_recorder.close)
+
+    @callback
+    def _restore_last_state(self, last_state) -> None:
+        """Restore the mode, target and source from the last entity state."""
+        if last_state.state in (HVACMode.OFF, HVACMode.HEAT):
+            self._hvac_mode = HVACMode(last_state.state)
+        if (target := last_state.attributes.get(ATTR_TEMPERATURE)) is not None:
+            self._target_temp = float(target)
+        if (source := last_state.attributes.get(ATTR_ACTIVE_SOURCE)) in (
+            SOURCE_MINISPLIT,
+            SOURCE_PELLET,
+        ):
+            self._active_source = source
+            self._source_reason = last_state.attributes.get(ATTR_SOURCE_REASON)
+
+    @callback
+    def _restore_snapshot(self, snapshot: Optional[dict[str, Any]]) -> None:
+        """Restore the controller state saved by ``_data_to_store``.
+
+        The temperature history is filtered to the trend window; the source,
+        relay limits and PID state are only restored if the snapshot is recent.
+        """
+        if not snapshot:
+            return
+        now = dt_util.utcnow().timestamp()
+        self._snapshot_saved_at = snapshot["saved_at"]
+        self._temp_history.unpack(snapshot["history"], now)
+        self._actuator.async_load(snapshot["actuator"])
+        self._stats.ignitions = snapshot.get("ignitions", 0)
+        self._stats.relay_actuations.update(snapshot.get("relay_actuations", {}))
+        self._price_profile.load(snapshot.get("prices", []))
+        if now - snapshot["saved_at"] > SNAPSHOT_MAX_AGE:
+            return
+        self._active_source = snapshot["source"]
+        self._source_since = snapshot["source_since"]
+        if self._hvac_mode != HVACMode.OFF:
+            # Seed the relay limits so a running stove is not counted as a
+            # new ignition and keeps its minimum run time and level dwell
+            level_since = snapshot.get("level_since")
+            self._relay_scheduler.restore(
+                self._active_source,
+                now - self._source_since,
+                snapshot.get("level"),
+                now - level_since if level_since is not None else 0.0,
+            )
+        if self._control_mode == MODE_PID and snapshot.get("pid"):
+            self._pid_controller.restore(snapshot["pid"])
+
+    async def _async_bootstrap(self) -> None:
+        """Replay recent recorder history into the trend history and models."""
+        async with self._control_lock:
+            history = TemperatureHistory(TEMP_TREND_PERIOD, TEMP_HISTORY_CAPACITY)
+            replay = HistoryReplay(
+                SensorFusion(self._inside_temp_sensors),
+                SensorFusion(self._outside_temp_sensors),
+                self._minisplit_entity,
+                self._pellet_power_switch,
+                history,
+                self._rate_models,
+                self._target_temp,
+                train_after=self._snapshot_saved_at,
+            )
+            try:
+                result = await async_replay_recorder(self.hass, replay)
+            except Exception:  # pylint: disable=broad-except
+                # Startup must never depend on the recorder
+                _LOGGER.exception("Unable to bootstrap from the recorder")
+                return
+
+            # Keep samples that arrived while the recorder was read
+            replayed_until = history.latest_time or 0.0
+            for timestamp, value in self._temp_history:
+                if timestamp > replayed_until:
+                    history.append(timestamp, value)
+            self._temp_history = history
+            if self._current_temp is None:
+                self._current_temp = result.inside_temp
+            if self._outside_temp is None:
+                self._outside_temp = result.outside_temp
+            if result.model_updates:
+                self._store.async_delay_save(self._data_to_store, MODEL_SAVE_DELAY)
+
+        if self._hvac_mode != HVACMode.OFF:
+            await self.async_control_heating()
+
+    @property
+    def tracked_entities(self) -> set[str]:
+        """Return the entities whose state changes this zone handles."""
+        entities = {*self._inside_temp_sensors, *self._actuated_entities}
+        if self._electricity_price_entity:
+            entities.add(self._electricity_price_entity)
+        return entities
+
+    @property
+    def outside_temp_sensors(self) -> tuple[str, ...]:
+        """Return the outside temperature sensors of this zone."""
+        return self._outside_temp_sensors
+
+    @property
+    def weather_entity(self) -> Optional[str]:
+        """Return the weather entity of this zone, if any."""
+        return self._weather_entity
+
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return entity specific state attributes."""
-        return {
+        now = dt_util.utcnow().timestamp()
+        attributes = {
             ATTR_ACTIVE_SOURCE: self._active_source,
             ATTR_SOURCE_REASON: self._source_reason,
+            ATTR_OUTSIDE_TEMP: self._outside_temp,
+            ATTR_SENSOR_HEALTH: {"inside": round(self._inside_fusion.health(now), 2)},
         }
+        faulty = self._inside_fusion.faulty_sensors(now)
+        outside_fusion = self._coordinator.outside_fusions.get(
+            self._outside_temp_sensors
+        )
+        if outside_fusion is not None:
+            attributes[ATTR_SENSOR_HEALTH]["outside"] = round(
+                outside_fusion.health(now), 2
+            )
+            faulty += outside_fusion.faulty_sensors(now)
+        if faulty:
+            attributes[ATTR_FAULTY_SENSORS] = faulty
+        if (
+            self._cost_model is not None
+            and self._outside_temp is not None
+            and self._electricity_price is not None
+        ):
+            attributes[ATTR_HEAT_COST] = self._cost_model.as_dict(
+                self._outside_temp, self._electricity_price
+            )
+        if self._autotune is not None:
+            attributes[ATTR_AUTOTUNE] = self._autotune.as_dict()
+        if self._planner is not None and (
+            event := self._planner.next_event
+        ) is not None:
+            attributes[ATTR_NEXT_SETPOINT] = {
+                "target": event.target,
+                "at": dt_util.utc_from_timestamp(event.at).isoformat(),
+                "start": dt_util.utc_from_timestamp(event.start).isoformat(),
+                "source": event.source,
+            }
+        return attributes
 
     @property
     def current_temperature(self) -> Optional[float]:
@@ -170,152 +602,666 @@ class SmartThermostat(ClimateEntity):
         """Set new target temperature."""
         if (temp := kwargs.get(ATTR_TEMPERATURE)) is None:
             return
+        self._async_set_target(temp)
+        await self.async_control_heating()
+        self._coordinator.async_request_tick(TICK_MIN_INTERVAL)
+
+    @callback
+    def _async_set_target(self, temp: float) -> None:
+        """Change the target temperature."""
         self._target_temp = temp
         self._last_target_change = datetime.now()
-        await self._async_control_heating()
+        self._flight_recorder.target(temp)
+        if self._autotune is not None and self._autotune.running:
+            # The oscillation was measured around the old target
+            self._async_end_autotune("target_changed")
 
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
         """Set new target hvac mode."""
+        self._flight_recorder.hvac_mode(hvac_mode != HVACMode.OFF)
+        previous, self._hvac_mode = self._hvac_mode, hvac_mode
         if hvac_mode == HVACMode.OFF:
+            if self._autotune is not None and self._autotune.running:
+                self._async_end_autotune("turned_off")
             await self._async_turn_off_all()
-        elif hvac_mode == HVACMode.HEAT and self._hvac_mode == HVACMode.OFF:
+        elif hvac_mode == HVACMode.HEAT and previous == HVACMode.OFF:
+            # The pass has to see the new mode, and the idle tick may be up
+            # to TICK_MAX_INTERVAL away
             await self._async_start_heating()
-        self._hvac_mode = hvac_mode
+            self._coordinator.async_request_tick(TICK_MIN_INTERVAL)
 
-    async def _async_control_heating(self) -> None:
-        """Control the heating system based on current conditions."""
+    async def async_control_heating(self) -> None:
+        """Request a control pass right away."""
+        self._stats.triggers += 1
+        await self._async_run_control()
+
+    async def _async_run_control(self) -> None:
+        """Run a control pass, folding concurrent requests into one follow-up."""
+        self._control_requested = True
+        if self._control_lock.locked():
+            return
+        async with self._control_lock:
+            while self._control_requested:
+                self._control_requested = False
+                await self._async_timed_control_pass()
+
+    async def _async_timed_control_pass(self) -> None:
+        """Run a control pass, recording its latency and sampling a profile."""
+        profiler = self._stats.profiler()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is active, e.g. from a second thermostat
+                profiler = None
+        started = time.monotonic()
+        try:
+            await self._async_control_pass()
+        finally:
+            self._stats.control_pass.record(time.monotonic() - started)
+            self._stats.passes += 1
+            if profiler is not None:
+                profiler.disable()
+                self._stats.add_profile(profiler)
+        self._async_schedule_pending_change()
+        self._async_record_telemetry()
+        self._tick_interval = self._next_tick_interval()
+        self._coordinator.async_request_tick(self._tick_interval)
+        if time.monotonic() - self._last_snapshot >= SNAPSHOT_SAVE_INTERVAL:
+            self._last_snapshot = time.monotonic()
+            self._store.async_delay_save(self._data_to_store)
+
+    @callback
+    def _async_record_telemetry(self) -> None:
+        """Add the zone's state to the rollups and push the finished hours."""
+        heating = self._hvac_mode != HVACMode.OFF
+        error = None
+        if heating and self._current_temp is not None:
+            error = self._current_temp - self._target_temp
+        stove = heating and self._active_source == SOURCE_PELLET
+        completed = self._telemetry.observe(
+            dt_util.utcnow().timestamp(),
+            (
+                self._current_temp,
+                self._outside_temp,
+                error,
+                (self._relay_scheduler.level or 0) if stove else 0,
+                100.0 if stove else 0.0,
+                100.0 if heating and not stove else 0.0,
+            ),
+        )
+        if completed and "recorder" in self.hass.config.components:
+            self._async_add_statistics(completed)
+
+    @callback
+    def _async_add_statistics(self, rollups: list[Rollup]) -> None:
+        """Import hourly rollups into the long-term statistics."""
+        # The recorder is an optional dependency
+        from homeassistant.components.recorder.statistics import (
+            async_add_external_statistics,
+        )
+
+        object_id = self.entity_id.split(".", 1)[1]
+        for metadata, rows in statistics(object_id, self.name, rollups):
+            for row in rows:
+                row["start"] = dt_util.utc_from_timestamp(row["start"])
+            try:
+                async_add_external_statistics(self.hass, metadata, rows)
+            except HomeAssistantError as err:
+                _LOGGER.warning(
+                    "Unable to add statistics %s: %s", metadata["statistic_id"], err
+                )
+
+    def _next_tick_interval(self) -> float:
+        """Return the seconds until the zone needs its next periodic pass.
+
+        Ticks are fast after a source switch, while a relay change is held
+        back and away from the target, and never sleep through a decision
+        that falls due at a known time.
+        """
         if self._hvac_mode == HVACMode.OFF:
+            return self._tick_scheduler.idle()
+        now = dt_util.utcnow().timestamp()
+        in_source = now - self._source_since
+        transition = (
+            in_source < TICK_TRANSITION_TIME
+            or (self._autotune is not None and self._autotune.running)
+            or self._relay_scheduler.pending_source is not None
+            or self._relay_scheduler.pending_level is not None
+        )
+        deadlines = []
+        if self._active_source == SOURCE_MINISPLIT:
+            # The stove may take over once the target timeout or a full
+            # trend window has passed
+            deadlines.append(
+                self._source_selector.target_timeout
+                - (datetime.now() - self._last_target_change).total_seconds()
+            )
+            deadlines.append(self._temp_history.window - in_source)
+        else:
+            deadlines.append(SOURCE_MIN_RUN_TIME - in_source)
+        if self._mpc is not None:
+            deadlines.append(self._mpc.next_plan_at - now)
+        if self._planner is not None:
+            if (event := self._planner.next_event) is not None:
+                deadlines.append(event.start - now)
+            if self._planner.planned_at is not None:
+                deadlines.append(
+                    self._planner.planned_at + self._planner.replan_interval - now
+                )
+        forecast = self._coordinator.forecast(self._weather_entity)
+        if forecast is not None and (
+            schedule := forecast.schedule(
+                self._min_outside_temp, self._min_forecast_hours
+            )
+        ) is not None:
+            if (change := schedule.next_change_after(now)) is not None:
+                deadlines.append(change - now)
+
+        # The PID gains are tuned for its sample time, so it keeps its rate
+        # while it drives the stove
+        max_interval = None
+        if self._active_source == SOURCE_PELLET and self._control_mode == MODE_PID:
+            max_interval = PID_SAMPLE_TIME
+
+        error = None
+        if self._current_temp is not None:
+            error = self._current_temp - self._target_temp
+        return self._tick_scheduler.next_interval(
+            error, self._temp_history.slope, transition, deadlines, max_interval
+        )
+
+    @property
+    def tick_interval(self) -> float:
+        """Return the seconds until the zone needs its next periodic pass."""
+        return self._tick_interval
+
+    async def _async_control_pass(self) -> None:
+        """Control the heating system based on current conditions."""
+        # Drop inside sensors that stopped reporting
+        if (
+            estimate := self._inside_fusion.refresh_states(
+                self.hass.states.get, dt_util.utcnow().timestamp()
+            )
+        ) is not None:
+            self._current_temp = estimate
+        if self._hvac_mode == HVACMode.OFF or self._current_temp is None:
             return
 
+        self._controlled_temp = self._current_temp
+        self._controlled_outside_temp = self._outside_temp
+
+        if self._autotune is not None and self._autotune.running:
+            await self._async_control_autotune()
+            return
+
+        if self._planner is not None:
+            self._async_follow_schedule()
+
         # Check conditions and select heating source
+        started = time.monotonic()
         await self._async_select_heating_source()
+        self._stats.source_selection.record(time.monotonic() - started)
 
         if self._active_source == SOURCE_MINISPLIT:
             await self._async_control_minisplit()
         else:
             await self._async_control_pellet_stove()
 
+    @callback
+    def _async_follow_schedule(self) -> None:
+        """Apply the setpoint steps of the comfort schedule as they fall due.
+
+        A manually set target holds until the next step of the schedule.
+        """
+        planner = self._planner
+        now = dt_util.utcnow().timestamp()
+        if planner.needs_plan(now):
+            if planner.planned_at is None:
+                self._async_set_target(planner.schedule.target_at(now))
+            planner.plan(now, self._current_temp, self._rate_models, self._outside_at)
+        if (event := planner.due(now)) is not None:
+            self._async_set_target(event.target)
+
+    def _outside_at(self, timestamp: float) -> Optional[float]:
+        """Return the forecast outside temperature, or the current one."""
+        forecast = self._coordinator.forecast(self._weather_entity)
+        if forecast is not None and (
+            schedule := forecast.schedule(
+                self._min_outside_temp, self._min_forecast_hours
+            )
+        ) is not None:
+            if (temperature := schedule.temperature_at(timestamp)) is not None:
+                return temperature
+        return self._outside_temp
+
     async def _async_select_heating_source(self) -> None:
         """Select the appropriate heating source based on conditions."""
-        # Check outside temperature
-        if self._outside_temp < self._min_outside_temp:
-            if self._active_source != SOURCE_PELLET:
-                self._active_source = SOURCE_PELLET
-                self._source_reason = REASON_TEMP_TOO_LOW
-                return
-
-        # Check temperature trend if using mini-split
-        if (
-            self._active_source == SOURCE_MINISPLIT
-            and len(self._temp_history) >= 2
+        if self._current_temp is None:
+            return
+        now = dt_util.utcnow().timestamp()
+        self._temp_history.trim(now)
+        if self._rate_models.observe(
+            self._active_source,
+            self._source_since,
+            now,
+            self._outside_temp,
+            self._target_temp,
+            self._temp_history,
         ):
-            start_temp = self._temp_history[0]
-            end_temp = self._temp_history[-1]
-            if end_temp < start_temp:
-                self._active_source = SOURCE_PELLET
-                self._source_reason = REASON_TEMP_DECREASING
-                return
+            self._store.async_delay_save(self._data_to_store, MODEL_SAVE_DELAY)
 
-        # Check if target temperature is being reached
         time_since_target_change = datetime.now() - self._last_target_change
-        if (
-            self._active_source == SOURCE_MINISPLIT
-            and time_since_target_change.total_seconds() > TARGET_TIMEOUT
-            and self._current_temp < self._target_temp
-        ):
-            self._active_source = SOURCE_PELLET
-            self._source_reason = REASON_NOT_REACHING_TARGET
-            return
+        forecast = self._coordinator.forecast(self._weather_entity)
+        forecast_source = None
+        if forecast is not None:
+            forecast_source = forecast.source_at(
+                now, self._min_outside_temp, self._min_forecast_hours
+            )
+        time_to_target = self._rate_models.time_to_target(
+            self._current_temp, self._outside_temp, self._target_temp
+        )
+        cost_source = self._cost_source(now)
+        preheat_source = None
+        if self._planner is not None and (
+            preheat := self._planner.preheating(now)
+        ) is not None:
+            preheat_source = preheat.source
+        self._flight_recorder.control_pass(
+            self._active_source,
+            self._current_temp,
+            self._target_temp,
+            self._outside_temp,
+            time_since_target_change.total_seconds(),
+            forecast_source,
+            time_to_target,
+            now - self._source_since,
+            cost_source,
+            preheat_source,
+            timestamp=now,
+        )
+        selected, reason = self._source_selector.select(
+            self._active_source,
+            self._current_temp,
+            self._target_temp,
+            self._outside_temp,
+            self._temp_history,
+            time_since_target_change.total_seconds(),
+            forecast_source,
+            time_to_target,
+            now - self._source_since,
+            cost_source,
+            preheat_source,
+        )
+        # Hold back switches that would short-cycle a source
+        source = self._relay_scheduler.request_source(selected)
+        self._flight_recorder.source(selected, reason, source)
+        if source != self._active_source:
+            if source == SOURCE_PELLET and self._control_mode == MODE_PID:
+                # Bumpless transfer from the mini-split to the stove
+                self._pid_controller.transfer(self._current_temp, self._target_temp)
+            self._source_since = now
+            self._active_source = source
+            self._source_reason = reason
 
     async def _async_control_minisplit(self) -> None:
         """Control the mini-split heat pump."""
-        await self.hass.services.async_call(
-            "climate",
-            "set_temperature",
-            {
-                "entity_id": self._minisplit_entity,
-                "temperature": self._target_temp,
-            },
-            blocking=True,
+        if self._mpc is not None:
+            self._mpc.track(0, dt_util.utcnow().timestamp())
+        await asyncio.gather(
+            self._actuator.async_set_temperature(
+                self._minisplit_entity, self._target_temp
+            ),
+            # Make sure the stove is off after switching back
+            self._actuator.async_turn_off(
+                self._pellet_power_switch, *self._pellet_level_switches
+            ),
         )
 
     async def _async_control_pellet_stove(self) -> None:
         """Control the pellet stove."""
+        await self._actuator.async_turn_on(self._pellet_power_switch)
         if self._control_mode == MODE_PID:
             # Update PID controller
-            output = self._pid_controller.compute(
+            level = self._pid_controller.compute_level(
                 self._current_temp, self._target_temp
             )
-            await self._async_set_pellet_level(int(output))
+            self._flight_recorder.pid(
+                self._pid_controller.components, self._pid_controller.output
+            )
+            await self._async_set_pellet_level(level)
+        elif self._control_mode == MODE_MPC:
+            await self._async_set_pellet_level(await self._async_mpc_level())
         else:
-            # Simple on/off control
-            if self._current_temp < self._target_temp:
-                await self._async_set_pellet_level(3)  # Medium power
-            else:
-                await self._async_set_pellet_level(1)  # Low power
+            # Simple on/off control with hysteresis around the target
+            await self._async_set_pellet_level(
+                on_off_level(
+                    self._current_temp,
+                    self._target_temp,
+                    self._relay_scheduler.level,
+                )
+            )
+
+    async def _async_mpc_level(self) -> int:
+        """Return the stove level planned by the model-predictive controller.
+
+        The plan is solved on the event loop within the time budget; if a
+        solve ran over, the next one searches in the executor instead, on a
+        snapshot of the stove model taken here so the loop can keep
+        tracking the stove meanwhile.
+        """
+        mpc = self._mpc
+        now = dt_util.utcnow().timestamp()
+        self._temp_history.trim(now)
+        mpc.observe(now, self._outside_temp, self._temp_history)
+        if not mpc.due(now, self._target_temp):
+            return mpc.planned_level
+        if self._outside_temp is None:
+            return mpc.planned_level or 3
+
+        forecast = self._coordinator.forecast(self._weather_entity)
+        schedule = None
+        if forecast is not None:
+            schedule = forecast.schedule(
+                self._min_outside_temp, self._min_forecast_hours
+            )
+        outside = []
+        for step in range(1, mpc.horizon_steps + 1):
+            forecast_temp = None
+            if schedule is not None:
+                forecast_temp = schedule.temperature_at(now + step * mpc.step)
+            outside.append(
+                self._outside_temp if forecast_temp is None else forecast_temp
+            )
+
+        target = self._target_temp
+        args = (mpc.problem(now), self._current_temp, target, outside)
+        if mpc.over_budget:
+            self._stats.mpc_offloads += 1
+            result = await self.hass.async_add_executor_job(mpc.search, *args)
+        else:
+            result = mpc.search(*args, mpc.budget)
+        level = mpc.apply(now, target, result)
+        self._stats.mpc_solve.record(mpc.last_solve_time)
+        return level
 
     async def _async_set_pellet_level(self, level: int) -> None:
-        """Set the pellet stove power level."""
-        # Turn off all level switches
-        for switch in self._pellet_level_switches:
-            await self.hass.services.async_call(
-                "switch",
-                "turn_off",
-                {"entity_id": switch},
-                blocking=True,
+        """Set the pellet stove power level, within the relay dwell limits."""
+        requested = level
+        level = self._relay_scheduler.request_level(level)
+        self._flight_recorder.level(requested, level)
+        if self._mpc is not None:
+            self._mpc.track(level, dt_util.utcnow().timestamp())
+        await self._actuator.async_set_level(self._pellet_level_switches, level)
+
+    async def async_start_autotune(
+        self, high_level: int = AUTOTUNE_HIGH_LEVEL, low_level: int = AUTOTUNE_LOW_LEVEL
+    ) -> None:
+        """Start a relay-feedback experiment that tunes the PID gains.
+
+        The stove is lit and switched between the two levels around the
+        current target until the oscillation is steady; the resulting gains
+        are then saved through the options flow and applied without a reload.
+        """
+        if self._hvac_mode == HVACMode.OFF:
+            raise HomeAssistantError("Turn the thermostat on before autotuning")
+        if self._current_temp is None:
+            raise HomeAssistantError("The inside temperature is unknown")
+        if self._autotune is not None and self._autotune.running:
+            raise HomeAssistantError("Autotuning is already running")
+        try:
+            self._autotune = RelayAutotuner(
+                self._target_temp,
+                dt_util.utcnow().timestamp(),
+                high_level=high_level,
+                low_level=low_level,
             )
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+        self._flight_recorder.autotune(
+            self._autotune.state, self._current_temp, self._target_temp, None
+        )
+        _LOGGER.info(
+            "Autotuning %s between stove levels %d and %d around %.1f°F",
+            self.entity_id,
+            low_level,
+            high_level,
+            self._target_temp,
+        )
+        await self.async_control_heating()
+
+    async def async_abort_autotune(self) -> None:
+        """Abort a running autotune experiment and resume normal control."""
+        if self._autotune is None or not self._autotune.running:
+            return
+        self._async_end_autotune("aborted")
+        await self.async_control_heating()
 
-        # Turn on the requested level
-        if 1 <= level <= len(self._pellet_level_switches):
-            await self.hass.services.async_call(
-                "switch",
-                "turn_on",
-                {"entity_id": self._pellet_level_switches[level - 1]},
-                blocking=True,
+    async def _async_control_autotune(self) -> None:
+        """Run the stove as the relay of the autotune experiment."""
+        now = dt_util.utcnow().timestamp()
+        # The stove is lit within the usual short-cycle limits
+        source = self._relay_scheduler.request_source(SOURCE_PELLET)
+        if source != self._active_source:
+            self._source_since = now
+            self._active_source = source
+            self._source_reason = REASON_AUTOTUNE
+        if source != SOURCE_PELLET:
+            await self._async_control_minisplit()
+            return
+
+        await self._actuator.async_turn_on(self._pellet_power_switch)
+        level = self._autotune.update(now, self._current_temp)
+        await self._async_set_pellet_level(level)
+        if not self._autotune.running:
+            self._async_end_autotune()
+
+    @callback
+    def _async_end_autotune(self, reason: Optional[str] = None) -> None:
+        """End the autotune experiment and save its gains if it finished.
+
+        Args:
+            reason: Why the experiment is aborted, None if it ended by itself
+        """
+        autotune = self._autotune
+        if reason is not None:
+            autotune.abort(reason)
+        level = self._relay_scheduler.level
+        self._flight_recorder.autotune(
+            autotune.state, self._current_temp, self._target_temp, level
+        )
+        if self._control_mode == MODE_PID and level is not None:
+            # Continue from the experiment's level without a bump
+            self._pid_controller.transfer(
+                self._current_temp, self._target_temp, float(level)
+            )
+        if autotune.state != AUTOTUNE_FINISHED:
+            _LOGGER.warning(
+                "Autotuning %s aborted: %s", self.entity_id, autotune.reason
             )
+            return
+        _LOGGER.info(
+            "Autotuning %s finished: ultimate gain %.3f, period %.0f s, "
+            "gains %.4g, %.4g, %.4g",
+            self.entity_id,
+            autotune.ultimate_gain,
+            autotune.ultimate_period,
+            *autotune.gains,
+        )
+        self.hass.async_create_task(
+            self.hass.config_entries.options.async_init(
+                self.config_entry.entry_id,
+                data=dict(zip((CONF_PID_KP, CONF_PID_KI, CONF_PID_KD), autotune.gains)),
+            )
+        )
 
-    async def _async_turn_off_all(self) -> None:
-        """Turn off all heating sources."""
-        # Turn off mini-split
-        await self.hass.services.async_call(
-            "climate",
-            "turn_off",
-            {"entity_id": self._minisplit_entity},
-            blocking=True,
+    @callback
+    def _update_electricity_price(self, state) -> bool:
+        """Record the electricity price, returning True if it is known."""
+        if state is None or state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return False
+        try:
+            price = float(state.state)
+        except ValueError:
+            return False
+        self._electricity_price = price
+        self._price_profile.observe(state.last_updated.timestamp(), price)
+        return True
+
+    def _cost_source(self, now: float) -> Optional[str]:
+        """Return the source preferred by the cost plan, if costs are known.
+
+        The plan covers the forecast horizon with the forecast temperatures
+        and learned hourly prices, and is only rebuilt when the hour, the
+        current price, the outside temperature or the forecast changes.
+        """
+        if (
+            self._cost_model is None
+            or self._electricity_price is None
+            or self._outside_temp is None
+        ):
+            return None
+        forecast = self._coordinator.forecast(self._weather_entity)
+        schedule = None
+        if forecast is not None:
+            schedule = forecast.schedule(
+                self._min_outside_temp, self._min_forecast_hours
+            )
+        outside_temp = self._outside_temp
+        price = self._electricity_price
+        key = (int(now // 3600), price, round(outside_temp), schedule)
+        if key != self._cost_plan_key or self._cost_plan is None:
+
+            def outside_at(timestamp: float) -> float:
+                if timestamp - now < 3600 or schedule is None:
+                    return outside_temp
+                forecast_temp = schedule.temperature_at(timestamp)
+                return outside_temp if forecast_temp is None else forecast_temp
+
+            def price_at(timestamp: float) -> float:
+                if timestamp - now < 3600:
+                    return price
+                return self._price_profile.price_at(timestamp, price)
+
+            self._cost_plan = self._cost_model.plan(
+                now, FORECAST_HORIZON, outside_at, price_at
+            )
+            self._cost_plan_key = key
+        return self._cost_plan.source_at(now, self._active_source)
+
+    @callback
+    def _async_schedule_pending_change(self) -> None:
+        """Run a control pass once a held back change may be applied."""
+        self._async_cancel_pending_change()
+        when = self._relay_scheduler.next_change_at()
+        if when is None:
+            return
+        self._cancel_pending_change = async_call_later(
+            self.hass,
+            max(when - time.monotonic(), 0),
+            self._async_apply_pending_change,
         )
 
-        # Turn off pellet stove
-        await self.hass.services.async_call(
-            "switch",
-            "turn_off",
-            {"entity_id": self._pellet_power_switch},
-            blocking=True,
+    @callback
+    def _async_cancel_pending_change(self) -> None:
+        """Cancel the scheduled pass for a held back change."""
+        if self._cancel_pending_change is not None:
+            self._cancel_pending_change()
+            self._cancel_pending_change = None
+
+    async def _async_apply_pending_change(self, now: datetime) -> None:
+        """Apply a held back source or level change."""
+        self._cancel_pending_change = None
+        await self.async_control_heating()
+
+    async def _async_turn_off_all(self) -> None:
+        """Turn off all heating sources."""
+        self._relay_scheduler.stop()
+        if self._mpc is not None:
+            self._mpc.track(0, dt_util.utcnow().timestamp())
+        await self._actuator.async_turn_off(
+            self._minisplit_entity, self._pellet_power_switch
         )
 
     async def _async_start_heating(self) -> None:
         """Start the heating system."""
         await self._async_select_heating_source()
-        await self._async_control_heating()
+        await self.async_control_heating()
 
-    @callback
-    async def _async_state_changed(self, event) -> None:
-        """Handle state changes in monitored entities."""
-        if event.data["entity_id"] == self._inside_temp_sensor:
-            state = self.hass.states.get(self._inside_temp_sensor)
-            if state is not None and state.state not in ("unknown", "unavailable"):
-                self._current_temp = float(state.state)
-                self._temp_history.append(self._current_temp)
-                if len(self._temp_history) > TEMP_TREND_PERIOD:
-                    self._temp_history.pop(0)
-
-        elif event.data["entity_id"] == self._outside_temp_sensor:
-            state = self.hass.states.get(self._outside_temp_sensor)
-            if state is not None and state.state not in ("unknown", "unavailable"):
-                self._outside_temp = float(state.state)
-
-        await self._async_control_heating()
+    async def async_handle_state_change(self, event: Event) -> None:
+        """Handle a state change dispatched by the coordinator."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+        if entity_id in self._actuated_entities:
+            # Drop echoes of our own commands and unrelated attribute updates
+            drifted = self._actuator.async_observe(new_state)
+            if new_state is not None:
+                self._flight_recorder.device(
+                    entity_id,
+                    new_state.state
+                    not in (STATE_OFF, STATE_UNKNOWN, STATE_UNAVAILABLE),
+                    new_state.attributes.get(ATTR_TEMPERATURE),
+                    drifted,
+                )
+            if not drifted:
+                self._stats.dropped_events += 1
+                return
+
+        elif entity_id in self._inside_fusion:
+            # Spikes are rejected and redundant sensors fused before the
+            # reading reaches the trend history
+            timestamp = event.time_fired.timestamp()
+            estimate = self._inside_fusion.update_state(
+                entity_id, new_state, timestamp
+            )
+            self._flight_recorder.inside(timestamp, estimate, _reading(new_state))
+            if estimate is None:
+                return
+            self._current_temp = estimate
+            self._temp_history.append(timestamp, estimate)
+            if not _changed(self._controlled_temp, self._current_temp):
+                self._stats.dropped_events += 1
+                return
+
+        elif entity_id == self._electricity_price_entity:
+            if not self._update_electricity_price(new_state):
+                return
+
+        elif entity_id in self._outside_temp_sensors:
+            # Fused once by the coordinator for all zones sharing the sensors
+            outside_temp = self._coordinator.outside_temp(self._outside_temp_sensors)
+            if outside_temp is None:
+                return
+            self._outside_temp = outside_temp
+            self._flight_recorder.outside(outside_temp)
+            if not _changed(self._controlled_outside_temp, self._outside_temp):
+                self._stats.dropped_events += 1
+                return
+
+        self._stats.triggers += 1
+        await self._debouncer.async_call()
 
     @callback
-    async def _async_monitor_conditions(self, now: datetime) -> None:
-        """Periodic monitoring of conditions."""
-        await self._async_control_heating()
\ No newline at end of file
+    def _data_to_store(self) -> dict[str, Any]:
+        """Return the learned models and a snapshot of the controller."""
+        now = dt_util.utcnow().timestamp()
+        level_age = self._relay_scheduler.level_age()
+        return {
+            "models": self._rate_models.as_dict(),
+            "stove_model": self._mpc.as_dict() if self._mpc is not None else None,
+            "snapshot": {
+                "saved_at": now,
+                "history": self._temp_history.pack(),
+                "source": self._active_source,
+                "source_since": self._source_since,
+                "level": self._relay_scheduler.level,
+                "level_since": now - level_age if level_age is not None else None,
+                "pid": self._pid_controller.as_dict()
+                if self._control_mode == MODE_PID
+                else None,
+                "actuator": self._actuator.as_dict(),
+                "ignitions": self._stats.ignitions,
+                "relay_actuations": self._stats.relay_actuations,
+                "prices": self._price_profile.as_list(),
+            },
+        }
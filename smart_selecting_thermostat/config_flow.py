@@ -1,11 +1,30 @@
 """Config flow for Smart Thermostat integration."""
 from __future__ import annotations
 
+from typing import Any, Optional
+
 import voluptuous as vol
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.components.climate import (
+    ATTR_HVAC_MODES,
+    ClimateEntityFeature,
+    HVACMode,
+)
+from homeassistant.components.weather import ATTR_WEATHER_TEMPERATURE
+from homeassistant.const import (
+    ATTR_SUPPORTED_FEATURES,
+    ATTR_UNIT_OF_MEASUREMENT,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    UnitOfTemperature,
+)
+from homeassistant.core import HomeAssistant, State, callback
 from homeassistant.data_entry_flow import FlowResult
-from homeassistant.helpers import selector
+from homeassistant.helpers import (
+    config_validation as cv,
+    entity_registry as er,
+    selector,
+)
 
 from .const import (
     DOMAIN,
@@ -19,17 +38,275 @@ from .const import (
     CONF_PID_KP,
     CONF_PID_KI,
     CONF_PID_KD,
+    CONF_EVENT_DEBOUNCE,
+    CONF_TARGET_TIMEOUT,
+    CONF_WEATHER_ENTITY,
+    CONF_MIN_FORECAST_HOURS,
+    CONF_PROFILE_EVERY,
+    CONF_ELECTRICITY_PRICE_ENTITY,
+    CONF_PELLET_PRICE,
+    CONF_PELLET_EFFICIENCY,
+    CONF_COP_CURVE,
+    CONF_SCHEDULE,
     DEFAULT_MIN_OUTSIDE_TEMP,
     DEFAULT_PID_KP,
     DEFAULT_PID_KI,
     DEFAULT_PID_KD,
+    DEFAULT_EVENT_DEBOUNCE,
+    DEFAULT_MIN_FORECAST_HOURS,
+    DEFAULT_PROFILE_EVERY,
+    DEFAULT_PELLET_PRICE,
+    DEFAULT_PELLET_EFFICIENCY,
+    DEFAULT_COP_CURVE,
+    TARGET_TIMEOUT,
 )
+from .cost_model import parse_cop_curve
+from .schedule import parse_schedule
+
+
+def _entity_selectors() -> dict[str, selector.EntitySelector]:
+    """Return the selectors of the entities a zone uses."""
+    return {
+        CONF_MINISPLIT_ENTITY: selector.EntitySelector(
+            selector.EntitySelectorConfig(domain="climate"),
+        ),
+        CONF_PELLET_POWER_SWITCH: selector.EntitySelector(
+            selector.EntitySelectorConfig(domain="switch"),
+        ),
+        CONF_PELLET_LEVEL_SWITCHES: selector.EntitySelector(
+            selector.EntitySelectorConfig(
+                domain="switch",
+                multiple=True,
+            ),
+        ),
+        CONF_OUTSIDE_TEMP_SENSOR: selector.EntitySelector(
+            selector.EntitySelectorConfig(
+                domain=["sensor", "weather"],
+                multiple=True,
+            ),
+        ),
+        CONF_INSIDE_TEMP_SENSOR: selector.EntitySelector(
+            selector.EntitySelectorConfig(
+                domain="sensor",
+                multiple=True,
+            ),
+        ),
+        CONF_WEATHER_ENTITY: selector.EntitySelector(
+            selector.EntitySelectorConfig(domain="weather"),
+        ),
+    }
+
+
+def _min_outside_temp_selector() -> selector.NumberSelector:
+    """Return the selector of the minimum outside temperature."""
+    return selector.NumberSelector(
+        selector.NumberSelectorConfig(
+            min=-20,
+            max=100,
+            step=1,
+            unit_of_measurement="°F",
+        ),
+    )
+
+
+def _target_timeout_selector() -> selector.NumberSelector:
+    """Return the selector of the mini-split target timeout."""
+    return selector.NumberSelector(
+        selector.NumberSelectorConfig(
+            min=60,
+            max=14400,
+            step=60,
+            unit_of_measurement="s",
+        ),
+    )
+
+
+def _pid_fields(kp: float, ki: float, kd: float) -> dict:
+    """Return the form fields of the PID gains with the given defaults.
+
+    The gains are per second, so tuned integral gains are small and
+    derivative gains large; the boxes take any precision.
+    """
+    return {
+        vol.Optional(CONF_PID_KP, default=kp): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=0, max=100, step="any", mode=selector.NumberSelectorMode.BOX
+            ),
+        ),
+        vol.Optional(CONF_PID_KI, default=ki): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=0, max=100, step="any", mode=selector.NumberSelectorMode.BOX
+            ),
+        ),
+        vol.Optional(CONF_PID_KD, default=kd): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=0, max=100000, step="any", mode=selector.NumberSelectorMode.BOX
+            ),
+        ),
+    }
+
+
+def _schedule_field(schedule: str) -> dict:
+    """Return the form field of the comfort schedule.
+
+    The current schedule is suggested rather than defaulted. The frontend
+    leaves a cleared box out of the input, which the options flow saves as
+    an empty schedule.
+    """
+    return {
+        vol.Optional(
+            CONF_SCHEDULE, description={"suggested_value": schedule}
+        ): selector.TextSelector(),
+    }
+
+
+def _validate_schedule(schedule: str | None) -> None:
+    """Raise ValueError with a form error if the schedule does not parse."""
+    if not schedule:
+        return
+    try:
+        parse_schedule(schedule)
+    except ValueError as err:
+        raise ValueError("Invalid schedule, expected days HH:MM=temp") from err
+
+
+class EntityValidator:
+    """Check the entities and settings of a zone in a single pass.
+
+    Every problem is collected instead of stopping at the first one, so the
+    form reports them all on one submit. Entity registry entries are cached
+    for the life of the flow, since a form is usually submitted again with
+    most entities unchanged.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the validator."""
+        self.hass = hass
+        self._registry = er.async_get(hass)
+        self._registry_entries: dict[str, Optional[er.RegistryEntry]] = {}
+
+    def _registry_entry(self, entity_id: str) -> Optional[er.RegistryEntry]:
+        """Return the registry entry of an entity, if it has one."""
+        if entity_id not in self._registry_entries:
+            self._registry_entries[entity_id] = self._registry.async_get(entity_id)
+        return self._registry_entries[entity_id]
+
+    def _state(
+        self, entity_id: str, label: str, problems: list[str]
+    ) -> Optional[State]:
+        """Return the state of an entity, adding a problem if it is missing."""
+        entry = self._registry_entry(entity_id)
+        if entry is not None and entry.disabled:
+            problems.append(f"{label} is disabled")
+            return None
+        if (state := self.hass.states.get(entity_id)) is None:
+            problems.append(f"{label} not found")
+        return state
+
+    def _temperature(
+        self, entity_id: str, label: str, problems: list[str]
+    ) -> None:
+        """Check that an entity reports a temperature."""
+        if (state := self._state(entity_id, label, problems)) is None:
+            return
+        if state.domain == "weather":
+            value = state.attributes.get(ATTR_WEATHER_TEMPERATURE)
+        elif state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            # Not reporting yet, checked again once the zone runs
+            return
+        else:
+            value = state.state
+        if value is not None:
+            try:
+                float(value)
+            except ValueError:
+                problems.append(f"{label} is not numeric")
+                return
+        unit = state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        if state.domain != "weather" and unit is not None and unit not in (
+            UnitOfTemperature.CELSIUS,
+            UnitOfTemperature.FAHRENHEIT,
+        ):
+            problems.append(f"{label} does not report a temperature")
+
+    def _minisplit(self, entity_id: str, problems: list[str]) -> None:
+        """Check that the mini-split can heat to a target temperature."""
+        label = "Mini-split entity"
+        if (state := self._state(entity_id, label, problems)) is None:
+            return
+        features = state.attributes.get(ATTR_SUPPORTED_FEATURES)
+        if features is not None and not (
+            features & ClimateEntityFeature.TARGET_TEMPERATURE
+        ):
+            problems.append(f"{label} cannot set a target temperature")
+        modes = state.attributes.get(ATTR_HVAC_MODES)
+        if modes is not None and HVACMode.HEAT not in modes:
+            problems.append(f"{label} cannot heat")
+
+    def validate(self, config: dict[str, Any]) -> list[str]:
+        """Return the problems of the entities and settings in ``config``.
+
+        Only the keys present are checked, so an options form can be
+        validated on the fields it changes.
+        """
+        problems: list[str] = []
+        if minisplit := config.get(CONF_MINISPLIT_ENTITY):
+            self._minisplit(minisplit, problems)
+        if power_switch := config.get(CONF_PELLET_POWER_SWITCH):
+            self._state(power_switch, "Pellet stove power switch", problems)
+        for switch in config.get(CONF_PELLET_LEVEL_SWITCHES, []):
+            self._state(switch, f"Pellet stove level switch {switch}", problems)
+        for sensor in cv.ensure_list(config.get(CONF_OUTSIDE_TEMP_SENSOR)):
+            self._temperature(
+                sensor, f"Outside temperature sensor {sensor}", problems
+            )
+        for sensor in cv.ensure_list(config.get(CONF_INSIDE_TEMP_SENSOR)):
+            self._temperature(
+                sensor, f"Inside temperature sensor {sensor}", problems
+            )
+        if weather_entity := config.get(CONF_WEATHER_ENTITY):
+            self._state(weather_entity, "Weather entity", problems)
+
+        # The optional electricity price entity and the COP curve
+        if price_entity := config.get(CONF_ELECTRICITY_PRICE_ENTITY):
+            label = "Electricity price entity"
+            state = self._state(price_entity, label, problems)
+            if state is not None and state.state not in (
+                STATE_UNKNOWN,
+                STATE_UNAVAILABLE,
+            ):
+                try:
+                    float(state.state)
+                except ValueError:
+                    problems.append(f"{label} is not numeric")
+        if CONF_COP_CURVE in config:
+            try:
+                parse_cop_curve(config[CONF_COP_CURVE])
+            except ValueError:
+                problems.append("Invalid COP curve, expected temp:cop pairs")
+
+        try:
+            _validate_schedule(config.get(CONF_SCHEDULE))
+        except ValueError as err:
+            problems.append(str(err))
+        return problems
+
 
 class SmartThermostatConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Smart Thermostat."""
 
     VERSION = 1
 
+    _validator: Optional[EntityValidator] = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> SmartThermostatOptionsFlow:
+        """Return the options flow of a zone."""
+        return SmartThermostatOptionsFlow(config_entry)
+
     async def async_step_user(
             self, user_input: dict[str, any] | None = None
     ) -> FlowResult:
@@ -49,76 +326,106 @@ class SmartThermostatConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors["base"] = str(err)
 
         # Show the configuration form
+        entities = _entity_selectors()
         return self.async_show_form(
             step_id="user",
             data_schema=vol.Schema(
                 {
-                    vol.Required(CONF_MINISPLIT_ENTITY): selector.EntitySelector(
-                        selector.EntitySelectorConfig(domain="climate"),
-                    ),
-                    vol.Required(CONF_PELLET_POWER_SWITCH): selector.EntitySelector(
-                        selector.EntitySelectorConfig(domain="switch"),
-                    ),
-                    vol.Required(CONF_PELLET_LEVEL_SWITCHES): selector.EntitySelector(
-                        selector.EntitySelectorConfig(
-                            domain="switch",
-                            multiple=True,
-                        ),
-                    ),
-                    vol.Required(CONF_OUTSIDE_TEMP_SENSOR): selector.EntitySelector(
-                        selector.EntitySelectorConfig(
-                            domain=["sensor", "weather"],
-                        ),
-                    ),
-                    vol.Required(CONF_INSIDE_TEMP_SENSOR): selector.EntitySelector(
-                        selector.EntitySelectorConfig(domain="sensor"),
-                    ),
-                    vol.Required(
-                        CONF_MIN_OUTSIDE_TEMP,
-                        default=DEFAULT_MIN_OUTSIDE_TEMP
+                    vol.Required(CONF_MINISPLIT_ENTITY): entities[
+                        CONF_MINISPLIT_ENTITY
+                    ],
+                    vol.Required(CONF_PELLET_POWER_SWITCH): entities[
+                        CONF_PELLET_POWER_SWITCH
+                    ],
+                    vol.Required(CONF_PELLET_LEVEL_SWITCHES): entities[
+                        CONF_PELLET_LEVEL_SWITCHES
+                    ],
+                    vol.Required(CONF_OUTSIDE_TEMP_SENSOR): entities[
+                        CONF_OUTSIDE_TEMP_SENSOR
+                    ],
+                    vol.Required(CONF_INSIDE_TEMP_SENSOR): entities[
+                        CONF_INSIDE_TEMP_SENSOR
+                    ],
+                    vol.Optional(CONF_WEATHER_ENTITY): entities[CONF_WEATHER_ENTITY],
+                    vol.Optional(
+                        CONF_MIN_FORECAST_HOURS,
+                        default=DEFAULT_MIN_FORECAST_HOURS
                     ): selector.NumberSelector(
                         selector.NumberSelectorConfig(
-                            min=-20,
-                            max=100,
+                            min=1,
+                            max=24,
                             step=1,
-                            unit_of_measurement="°F",
+                            unit_of_measurement="h",
                         ),
                     ),
+                    vol.Required(
+                        CONF_MIN_OUTSIDE_TEMP,
+                        default=DEFAULT_MIN_OUTSIDE_TEMP
+                    ): _min_outside_temp_selector(),
                     vol.Required(CONF_CONTROL_MODE, default="pid"): selector.SelectSelector(
                         selector.SelectSelectorConfig(
-                            options=["pid", "on_off"],
+                            options=["pid", "on_off", "mpc"],
                             translation_key="control_mode",
                         ),
                     ),
                     # PID Parameters
+                    **_pid_fields(DEFAULT_PID_KP, DEFAULT_PID_KI, DEFAULT_PID_KD),
+                    # Cost based source selection
+                    vol.Optional(CONF_ELECTRICITY_PRICE_ENTITY): selector.EntitySelector(
+                        selector.EntitySelectorConfig(
+                            domain=["sensor", "input_number"],
+                        ),
+                    ),
                     vol.Optional(
-                        CONF_PID_KP,
-                        default=DEFAULT_PID_KP
+                        CONF_PELLET_PRICE,
+                        default=DEFAULT_PELLET_PRICE
                     ): selector.NumberSelector(
                         selector.NumberSelectorConfig(
                             min=0,
                             max=100,
-                            step=0.1,
+                            step=0.05,
+                            unit_of_measurement="per 40 lb bag",
                         ),
                     ),
                     vol.Optional(
-                        CONF_PID_KI,
-                        default=DEFAULT_PID_KI
+                        CONF_PELLET_EFFICIENCY,
+                        default=DEFAULT_PELLET_EFFICIENCY
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=0.3,
+                            max=1,
+                            step=0.01,
+                        ),
+                    ),
+                    vol.Optional(
+                        CONF_COP_CURVE,
+                        default=DEFAULT_COP_CURVE
+                    ): selector.TextSelector(),
+                    # Comfort schedule with optimal start
+                    **_schedule_field(""),
+                    vol.Optional(
+                        CONF_TARGET_TIMEOUT,
+                        default=TARGET_TIMEOUT
+                    ): _target_timeout_selector(),
+                    vol.Optional(
+                        CONF_EVENT_DEBOUNCE,
+                        default=DEFAULT_EVENT_DEBOUNCE
                     ): selector.NumberSelector(
                         selector.NumberSelectorConfig(
                             min=0,
-                            max=100,
-                            step=0.1,
+                            max=300,
+                            step=1,
+                            unit_of_measurement="s",
                         ),
                     ),
                     vol.Optional(
-                        CONF_PID_KD,
-                        default=DEFAULT_PID_KD
+                        CONF_PROFILE_EVERY,
+                        default=DEFAULT_PROFILE_EVERY
                     ): selector.NumberSelector(
                         selector.NumberSelectorConfig(
                             min=0,
-                            max=100,
-                            step=0.1,
+                            max=1000,
+                            step=1,
                         ),
                     ),
                 }
@@ -127,23 +434,99 @@ class SmartThermostatConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
     async def _validate_entities(self, hass: HomeAssistant, user_input: dict) -> None:
-        """Validate that the entities exist."""
-        # Check if mini-split entity exists
-        if not hass.states.get(user_input[CONF_MINISPLIT_ENTITY]):
-            raise ValueError("Mini-split entity not found")
-
-        # Check if pellet stove power switch exists
-        if not hass.states.get(user_input[CONF_PELLET_POWER_SWITCH]):
-            raise ValueError("Pellet stove power switch not found")
-
-        # Check if all level switches exist
-        for switch in user_input[CONF_PELLET_LEVEL_SWITCHES]:
-            if not hass.states.get(switch):
-                raise ValueError(f"Pellet stove level switch {switch} not found")
-
-        # Check if temperature sensors exist
-        if not hass.states.get(user_input[CONF_OUTSIDE_TEMP_SENSOR]):
-            raise ValueError("Outside temperature sensor not found")
-
-        if not hass.states.get(user_input[CONF_INSIDE_TEMP_SENSOR]):
-            raise ValueError("Inside temperature sensor not found")
\ No newline at end of file
+        """Validate the entities and settings, reporting every problem at once."""
+        if self._validator is None:
+            self._validator = EntityValidator(hass)
+        if problems := self._validator.validate(user_input):
+            raise ValueError("; ".join(problems))
+
+
+class SmartThermostatOptionsFlow(config_entries.OptionsFlow):
+    """Handle the options of a Smart Thermostat zone.
+
+    The options override the data entered at setup. The current entities,
+    thresholds and schedule are suggested rather than defaulted, so only
+    the fields submitted are saved, except that a schedule left out of a
+    submitted form is saved empty. Besides the form, the flow is run with
+    the gains found by autotuning as its input, which leaves the rest as it
+    is.
+    """
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+        self._validator: Optional[EntityValidator] = None
+        self._form_shown = False
+
+    def _schema(self, config: dict[str, Any]) -> vol.Schema:
+        """Return the options form for the zone's current configuration."""
+        entities = _entity_selectors()
+        fields = {
+            vol.Optional(
+                key, description={"suggested_value": config.get(key)}
+            ): entities[key]
+            for key in (
+                CONF_MINISPLIT_ENTITY,
+                CONF_PELLET_POWER_SWITCH,
+                CONF_PELLET_LEVEL_SWITCHES,
+                CONF_OUTSIDE_TEMP_SENSOR,
+                CONF_INSIDE_TEMP_SENSOR,
+            )
+        }
+        fields[
+            vol.Optional(
+                CONF_MIN_OUTSIDE_TEMP,
+                description={
+                    "suggested_value": config.get(
+                        CONF_MIN_OUTSIDE_TEMP, DEFAULT_MIN_OUTSIDE_TEMP
+                    )
+                },
+            )
+        ] = _min_outside_temp_selector()
+        fields[
+            vol.Optional(
+                CONF_TARGET_TIMEOUT,
+                description={
+                    "suggested_value": config.get(CONF_TARGET_TIMEOUT, TARGET_TIMEOUT)
+                },
+            )
+        ] = _target_timeout_selector()
+        return vol.Schema(
+            fields
+            | _pid_fields(
+                config.get(CONF_PID_KP, DEFAULT_PID_KP),
+                config.get(CONF_PID_KI, DEFAULT_PID_KI),
+                config.get(CONF_PID_KD, DEFAULT_PID_KD),
+            )
+            | _schedule_field(config.get(CONF_SCHEDULE, ""))
+        )
+
+    async def async_step_init(
+            self, user_input: dict[str, any] | None = None
+    ) -> FlowResult:
+        """Manage the entities, thresholds, PID gains and comfort schedule."""
+        errors = {}
+        config = {**self.config_entry.data, **self.config_entry.options}
+        schema = self._schema(config)
+
+        if user_input is not None:
+            try:
+                user_input = schema(user_input)
+                if self._validator is None:
+                    self._validator = EntityValidator(self.hass)
+                # Only the submitted fields are checked, the rest were
+                # checked when they were saved
+                if problems := self._validator.validate(user_input):
+                    raise ValueError("; ".join(problems))
+            except (vol.Invalid, ValueError) as err:
+                errors["base"] = str(err)
+            else:
+                options = {**self.config_entry.options, **user_input}
+                if self._form_shown:
+                    # A cleared box is left out, so a missing schedule is
+                    # turned off, including one entered at setup
+                    options[CONF_SCHEDULE] = user_input.get(CONF_SCHEDULE) or ""
+                return self.async_create_entry(title="", data=options)
+
+        self._form_shown = True
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
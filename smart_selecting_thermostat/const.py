@@ -1,7 +1,7 @@
 """Constants for the Smart Thermostat integration."""
 
 DOMAIN = "smart_thermostat"
-PLATFORMS = ["climate"]
+PLATFORMS = ["climate", "sensor"]
 
 # Configuration constants
 CONF_MINISPLIT_ENTITY = "minisplit_entity"
@@ -16,13 +16,39 @@ CONF_PID_KI = "pid_ki"
 CONF_PID_KD = "pid_kd"
 CONF_WEATHER_ENTITY = "weather_entity"
 CONF_MIN_FORECAST_HOURS = "min_forecast_hours"
+CONF_EVENT_DEBOUNCE = "event_debounce"
+CONF_TARGET_TIMEOUT = "target_timeout"
+CONF_PROFILE_EVERY = "profile_every"
+CONF_ELECTRICITY_PRICE_ENTITY = "electricity_price_entity"
+CONF_PELLET_PRICE = "pellet_price"
+CONF_PELLET_EFFICIENCY = "pellet_efficiency"
+CONF_COP_CURVE = "cop_curve"
+CONF_SCHEDULE = "schedule"
+
+# Options applied to a running zone, any other change reloads it
+LIVE_OPTIONS = frozenset(
+    {
+        CONF_PID_KP,
+        CONF_PID_KI,
+        CONF_PID_KD,
+        CONF_MIN_OUTSIDE_TEMP,
+        CONF_TARGET_TIMEOUT,
+        CONF_SCHEDULE,
+    }
+)
 
 # Default values
 DEFAULT_MIN_OUTSIDE_TEMP = 40  # °F
+DEFAULT_TARGET_TEMP = 68  # °F
 DEFAULT_PID_KP = 1.0
 DEFAULT_PID_KI = 0.1
 DEFAULT_PID_KD = 0.05
 DEFAULT_MIN_FORECAST_HOURS = 2
+DEFAULT_EVENT_DEBOUNCE = 5  # seconds
+DEFAULT_PROFILE_EVERY = 0  # control passes, 0 disables profiling
+DEFAULT_PELLET_PRICE = 6.5  # per 40 lb bag
+DEFAULT_PELLET_EFFICIENCY = 0.8
+DEFAULT_COP_CURVE = "-15:1.5, 5:2.0, 17:2.6, 32:3.2, 47:3.9, 62:4.5"  # °F:COP
 
 # State attributes
 ATTR_ACTIVE_SOURCE = "active_heating_source"
@@ -33,6 +59,11 @@ ATTR_INSIDE_TEMP = "inside_temperature"
 ATTR_TARGET_TEMP = "target_temperature"
 ATTR_CONTROL_MODE = "control_mode"
 ATTR_PID_OUTPUT = "pid_output"
+ATTR_HEAT_COST = "heat_cost_per_mbtu"
+ATTR_SENSOR_HEALTH = "sensor_health"
+ATTR_FAULTY_SENSORS = "faulty_sensors"
+ATTR_AUTOTUNE = "autotune"
+ATTR_NEXT_SETPOINT = "next_setpoint"
 
 # Heating sources
 SOURCE_MINISPLIT = "mini_split"
@@ -41,6 +72,7 @@ SOURCE_PELLET = "pellet_stove"
 # Control modes
 MODE_PID = "pid"
 MODE_ON_OFF = "on_off"
+MODE_MPC = "mpc"
 
 # Switch reasons
 REASON_TEMP_TOO_LOW = "outside_temp_below_minimum"
@@ -48,21 +80,134 @@ REASON_TEMP_DECREASING = "inside_temp_decreasing"
 REASON_NOT_REACHING_TARGET = "not_reaching_target"
 REASON_WEATHER_FORECAST = "weather_forecast_unfavorable"
 REASON_MANUAL = "manual_selection"
+REASON_MINISPLIT_ADEQUATE = "minisplit_adequate"
+REASON_PELLET_CHEAPER = "pellet_stove_cheaper"
+REASON_MINISPLIT_CHEAPER = "minisplit_cheaper"
+REASON_AUTOTUNE = "autotune"
+REASON_OPTIMAL_START = "optimal_start"
 
 # Time constants
 MONITOR_INTERVAL = 60  # seconds
-TEMP_TREND_PERIOD = 900  # 15 minutes
+TEMP_TREND_PERIOD = 900  # seconds (15 minutes)
 TARGET_TIMEOUT = 1800  # 30 minutes
 FORECAST_UPDATE_INTERVAL = 3600  # 1 hour
+FORECAST_HORIZON = 24  # hours
+STOVE_WARMUP_TIME = 1800  # seconds
+SOURCE_MIN_RUN_TIME = 3600  # seconds before switching back to the mini-split
+MINISPLIT_MIN_RUN_TIME = 900  # seconds before switching to the stove
+STOVE_MIN_OFF_TIME = 1800  # seconds between stove ignitions
+LEVEL_MIN_DWELL = 600  # seconds between stove level changes
+MAX_LEVEL_CHANGES_PER_HOUR = 4
+SERVICE_CALL_TIMEOUT = 10  # seconds
+BOOTSTRAP_HOURS = 24  # hours of recorder history replayed on startup
+BOOTSTRAP_CHUNK = 3600  # seconds of recorder history read at a time
 
 # Temperature constants
 TEMP_CHANGE_THRESHOLD = 0.5  # °F
 TEMP_TREND_SAMPLES = 5
+TEMP_TREND_MIN_RATE = 0.5  # °F per hour
+TEMP_HISTORY_CAPACITY = 1024  # samples
+ON_OFF_HYSTERESIS = 0.5  # °F
+
+# Sensor fusion constants
+FUSION_PROCESS_NOISE = 0.001  # °F² per second of random walk
+FUSION_MEASUREMENT_NOISE = 0.09  # °F² sensor noise
+FUSION_GATE = 4.0  # standard deviations before a reading is a spike
+FUSION_STEP_CONFIRM = 120  # seconds of rejected readings that confirm a step
+FUSION_MAX_AGE = 3600  # seconds before a sensor is stale
+FUSION_MAX_DEVIATION = 3.0  # °F from the median before a sensor is outvoted
+FUSION_HEALTH_SMOOTHING = 0.05
+SENSOR_FAULT_HEALTH = 0.5
+
+# Control tick constants
+TICK_MIN_INTERVAL = MONITOR_INTERVAL  # seconds between ticks in transitions
+TICK_MAX_INTERVAL = 600  # seconds between ticks once settled
+TICK_SETTLED_BAND = 0.3  # °F around the target
+TICK_FLAT_RATE = 0.5  # °F per hour
+TICK_TRANSITION_TIME = 1800  # seconds of fast ticks after a source switch
 
 # PID constants
 PID_SAMPLE_TIME = 60  # seconds
+PID_SAMPLE_JITTER = 0.5  # seconds a pass may come early and still update
 PID_OUTPUT_LIMITS = (1, 5)  # Pellet stove levels
+PID_LEVEL_HYSTERESIS = 0.2  # levels
+
+# Comfort schedule constants
+SCHEDULE_HORIZON = 24 * 3600  # seconds of setpoint steps planned ahead
+SCHEDULE_REPLAN_INTERVAL = 3600  # seconds between preheat plans
+PREHEAT_MAX_LEAD = 4 * 3600  # longest preheat before a setpoint step
+PREHEAT_DEFAULT_LEAD = 3600  # preheat while the heating models are untrained
+PREHEAT_MARGIN = 1.1  # safety factor on the predicted warm-up time
+
+# Autotune constants
+AUTOTUNE_HIGH_LEVEL = 4  # stove level while below the target
+AUTOTUNE_LOW_LEVEL = 1  # stove level while above the target
+AUTOTUNE_HYSTERESIS = 0.2  # °F relay band around the target
+AUTOTUNE_CYCLES = 3  # consistent oscillations needed for a result
+AUTOTUNE_SETTLE_CYCLES = 1  # oscillations discarded at the start
+AUTOTUNE_TOLERANCE = 0.2  # spread of period and amplitude over the cycles
+AUTOTUNE_MAX_DURATION = 16 * 3600  # seconds before the experiment is aborted
+AUTOTUNE_MAX_DEVIATION = 3.0  # °F from the target before it is aborted
+AUTOTUNE_RUNNING = "running"
+AUTOTUNE_FINISHED = "finished"
+AUTOTUNE_ABORTED = "aborted"
+
+# Model-predictive control constants
+MPC_STEP = 300  # seconds per prediction step
+MPC_BLOCK_STEPS = 3  # steps the stove level is held within the plan
+MPC_HORIZON_BLOCKS = 6  # blocks in the prediction horizon
+MPC_TIME_BUDGET = 0.005  # seconds a solve may take on the event loop
+MPC_COMFORT_WEIGHT = 1.0  # cost per °F² and hour of error
+MPC_OVERSHOOT_WEIGHT = 2.0  # extra cost per °F² and hour above target
+MPC_FUEL_WEIGHT = 0.05  # cost per stove level and hour
+MPC_SWITCH_WEIGHT = 0.1  # cost per level change
+# Prior stove response: rate = a + b * level + c * (inside - outside)
+MPC_MODEL_PRIOR = (0.0, 1.3, -0.075)  # °F/h, °F/h per level, 1/h
+MPC_PRIOR_COVARIANCE = 1.0
+MPC_MAX_COVARIANCE = 10.0  # bound on the trace of the covariance
+MPC_FORGETTING_FACTOR = 0.999
+MPC_MIN_STOVE_GAIN = 0.2  # °F/h per level
+
+# Heating rate model constants
+MODEL_FORGETTING_FACTOR = 0.995
+MODEL_MIN_SAMPLES = 10
+MODEL_UPDATE_INTERVAL = 60  # seconds
+MODEL_SAVE_DELAY = 600  # seconds
+
+# Cost constants
+BTU_PER_KWH = 3412.14
+PELLET_BTU_PER_LB = 8000
+PELLET_BAG_WEIGHT = 40  # lb
+PRICE_PROFILE_SMOOTHING = 0.3
+
+# Telemetry rollups kept in memory per zone
+TELEMETRY_MINUTES = 6 * 60  # per-minute rollups, six hours
+TELEMETRY_HOURS = 7 * 24  # per-hour rollups, a week
+TELEMETRY_DAYS = 366  # per-day rollups, a year
+TELEMETRY_MAX_GAP = 900  # seconds a reading is held before it is stale
+
+# Storage
+STORAGE_VERSION = 1
+SNAPSHOT_SAVE_INTERVAL = 300  # seconds
+SNAPSHOT_MAX_AGE = 3600  # seconds before the controller state is stale
+FLIGHT_RECORDER_CAPACITY = 65536  # records of 56 bytes, a few days of passes
+
+# Runtime data keys in hass.data[DOMAIN][entry_id]
+DATA_CONFIG = "config"
+DATA_STATS = "stats"
+DATA_COORDINATOR = "coordinator"
+DATA_TELEMETRY = "telemetry"
+
+# Diagnostics
+DIAGNOSTICS_SCAN_INTERVAL = 60  # seconds
+
+# Services
+SERVICE_START_AUTOTUNE = "start_autotune"
+SERVICE_ABORT_AUTOTUNE = "abort_autotune"
 
 # Events
 EVENT_SOURCE_CHANGED = "smart_thermostat_source_changed"
-EVENT_LEVEL_CHANGED = "smart_thermostat_level_changed"
\ No newline at end of file
+EVENT_LEVEL_CHANGED = "smart_thermostat_level_changed"
+
+# Dispatcher signals, formatted with the config entry id
+SIGNAL_OPTIONS_UPDATED = "smart_thermostat_options_updated_{}"
@@ -0,0 +1,251 @@
+"""Shared coordinator driving every smart thermostat zone."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from random import randint
+from typing import Optional, Protocol
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import (
+    RANDOM_MICROSECOND_MAX,
+    RANDOM_MICROSECOND_MIN,
+    async_call_at,
+    async_track_state_change_event,
+)
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, TICK_MAX_INTERVAL, TICK_MIN_INTERVAL
+from .forecast import ForecastManager
+from .sensor_fusion import SensorFusion
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ThermostatZone(Protocol):
+    """Interface of a zone driven by the coordinator."""
+
+    @property
+    def tracked_entities(self) -> set[str]:
+        """Return the entities whose state changes the zone handles."""
+
+    @property
+    def outside_temp_sensors(self) -> tuple[str, ...]:
+        """Return the outside temperature sensors of the zone."""
+
+    @property
+    def weather_entity(self) -> Optional[str]:
+        """Return the weather entity of the zone, if any."""
+
+    @property
+    def tick_interval(self) -> float:
+        """Return the seconds until the zone needs its next periodic pass."""
+
+    async def async_handle_state_change(self, event: Event) -> None:
+        """Handle a state change of a tracked entity."""
+
+    async def async_control_heating(self) -> None:
+        """Run a control pass for the zone."""
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the zone state to Home Assistant."""
+
+
+class SmartThermostatCoordinator(DataUpdateCoordinator[None]):
+    """Run one timer, one state listener and one forecast pipeline for all zones.
+
+    State changes are dispatched only to the zones that track the entity, the
+    outside temperature sensors are fused and the forecast is read once and
+    shared, and on every tick all zones are controlled in one batched pass.
+    The delay to the next tick is the shortest tick interval any zone asks
+    for, bounded by the next forecast refresh, and a zone can bring the next
+    tick forward after an event driven pass. The coordinator schedules the
+    ticks itself rather than through a fixed update interval, so the delay
+    can change from one tick to the next.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the coordinator."""
+        super().__init__(hass, _LOGGER, name=DOMAIN)
+        self.zones: list[ThermostatZone] = []
+        self.outside_fusions: dict[tuple[str, ...], SensorFusion] = {}
+        self.forecasts: dict[str, ForecastManager] = {}
+        self._dispatch: dict[str, list[ThermostatZone]] = {}
+        self._outside_groups: dict[str, list[tuple[str, ...]]] = {}
+        self._unsub_state_changes: Optional[CALLBACK_TYPE] = None
+        self._unsub_tick: Optional[CALLBACK_TYPE] = None
+        self._next_tick: Optional[float] = None
+        self._tick_delay = float(TICK_MIN_INTERVAL)
+        # Ticks fall on a fixed fraction of a second, staggered against
+        # other timers like the refreshes of any update coordinator
+        self._tick_offset = (
+            randint(RANDOM_MICROSECOND_MIN, RANDOM_MICROSECOND_MAX) / 10**6
+        )
+        self._stopped = False
+
+    @callback
+    def async_add_zone(self, zone: ThermostatZone) -> CALLBACK_TYPE:
+        """Start driving a zone.
+
+        Returns:
+            Callable: Removes the zone again
+        """
+        self.zones.append(zone)
+        sensors = zone.outside_temp_sensors
+        if sensors not in self.outside_fusions:
+            fusion = SensorFusion(sensors)
+            now = dt_util.utcnow().timestamp()
+            for sensor in sensors:
+                fusion.update_state(sensor, self.hass.states.get(sensor), now)
+            self.outside_fusions[sensors] = fusion
+        if zone.weather_entity and zone.weather_entity not in self.forecasts:
+            manager = ForecastManager(self.hass, zone.weather_entity)
+            self.forecasts[zone.weather_entity] = manager
+            self.hass.async_create_task(manager.async_refresh())
+        self._async_rebuild_dispatch()
+        remove_listener = self.async_add_listener(zone.async_write_ha_state)
+        if self._unsub_tick is None:
+            self._async_schedule_tick(TICK_MIN_INTERVAL)
+
+        @callback
+        def remove_zone() -> None:
+            remove_listener()
+            self.zones.remove(zone)
+            self._async_prune()
+            self._async_rebuild_dispatch()
+            if not self.zones:
+                self._async_cancel_tick()
+
+        return remove_zone
+
+    def outside_temp(self, sensors: tuple[str, ...]) -> Optional[float]:
+        """Return the fused outside temperature of a group of sensors."""
+        fusion = self.outside_fusions.get(sensors)
+        return fusion.estimate if fusion is not None else None
+
+    def forecast(self, weather_entity: Optional[str]) -> Optional[ForecastManager]:
+        """Return the shared forecast manager of a weather entity."""
+        if not weather_entity:
+            return None
+        return self.forecasts.get(weather_entity)
+
+    @callback
+    def _async_prune(self) -> None:
+        """Drop shared sensors and forecasts no zone uses any more."""
+        sensors = {zone.outside_temp_sensors for zone in self.zones}
+        weather_entities = {zone.weather_entity for zone in self.zones}
+        for group in set(self.outside_fusions) - sensors:
+            del self.outside_fusions[group]
+        for weather_entity in set(self.forecasts) - weather_entities:
+            del self.forecasts[weather_entity]
+
+    @callback
+    def _async_rebuild_dispatch(self) -> None:
+        """Subscribe once to the union of all tracked entities."""
+        dispatch: dict[str, list[ThermostatZone]] = {}
+        for zone in self.zones:
+            for entity_id in zone.tracked_entities | set(zone.outside_temp_sensors):
+                dispatch.setdefault(entity_id, []).append(zone)
+        self._outside_groups = {}
+        for group in self.outside_fusions:
+            for entity_id in group:
+                self._outside_groups.setdefault(entity_id, []).append(group)
+
+        if self._unsub_state_changes is not None and set(dispatch) == set(
+            self._dispatch
+        ):
+            self._dispatch = dispatch
+            return
+        if self._unsub_state_changes is not None:
+            self._unsub_state_changes()
+            self._unsub_state_changes = None
+        self._dispatch = dispatch
+        if dispatch:
+            self._unsub_state_changes = async_track_state_change_event(
+                self.hass, list(dispatch), self._async_state_changed
+            )
+
+    async def _async_state_changed(self, event: Event) -> None:
+        """Dispatch a state change to the zones tracking the entity."""
+        entity_id = event.data["entity_id"]
+        for group in self._outside_groups.get(entity_id, ()):
+            self.outside_fusions[group].update_state(
+                entity_id, event.data.get("new_state"), event.time_fired.timestamp()
+            )
+        for zone in self._dispatch.get(entity_id, ()):
+            await zone.async_handle_state_change(event)
+
+    @callback
+    def _async_schedule_tick(self, delay: float) -> None:
+        """Schedule the next tick in ``delay`` seconds, replacing a pending one."""
+        self._async_cancel_tick()
+        when = int(self.hass.loop.time()) + self._tick_offset + delay
+        self._unsub_tick = async_call_at(self.hass, self._async_tick, when)
+        self._next_tick = when
+
+    @callback
+    def _async_cancel_tick(self) -> None:
+        """Cancel the pending tick, if any."""
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        self._next_tick = None
+
+    async def _async_tick(self, _now: datetime) -> None:
+        """Control every zone, then schedule the next tick."""
+        self._unsub_tick = None
+        self._next_tick = None
+        await self.async_refresh()
+        if self.zones and not self._stopped and self._unsub_tick is None:
+            self._async_schedule_tick(self._tick_delay)
+
+    @callback
+    def async_request_tick(self, delay: float) -> None:
+        """Bring the next tick forward to at most ``delay`` seconds from now."""
+        if self._next_tick is not None and (
+            self._next_tick <= self.hass.loop.time() + delay
+        ):
+            return
+        if self._unsub_tick is None:
+            # A tick is running and schedules the next one when it finishes
+            return
+        self._async_schedule_tick(delay)
+
+    def _tick_interval(self) -> float:
+        """Return the seconds until any zone or forecast needs the next tick."""
+        interval = min(
+            (zone.tick_interval for zone in self.zones), default=TICK_MAX_INTERVAL
+        )
+        for manager in self.forecasts.values():
+            interval = min(interval, max(manager.refresh_due_in(), TICK_MIN_INTERVAL))
+        return interval
+
+    async def _async_update_data(self) -> None:
+        """Refresh the forecasts and run a control pass for every zone."""
+        await asyncio.gather(
+            *(manager.async_refresh() for manager in self.forecasts.values())
+        )
+        now = dt_util.utcnow().timestamp()
+        for fusion in self.outside_fusions.values():
+            fusion.refresh_states(self.hass.states.get, now)
+        zones = list(self.zones)
+        results = await asyncio.gather(
+            *(zone.async_control_heating() for zone in zones),
+            return_exceptions=True,
+        )
+        for zone, result in zip(zones, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Control pass failed for %s: %s", zone, result)
+        self._tick_delay = self._tick_interval()
+
+    async def async_shutdown(self) -> None:
+        """Stop the ticks and stop listening for state changes."""
+        self._stopped = True
+        self._async_cancel_tick()
+        await super().async_shutdown()
+        if self._unsub_state_changes is not None:
+            self._unsub_state_changes()
+            self._unsub_state_changes = None
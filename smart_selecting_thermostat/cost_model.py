@@ -0,0 +1,215 @@
+"""Cost of delivered heat for the mini-split and the pellet stove."""
+from __future__ import annotations
+
+import math
+from typing import Any, Callable, Optional, Sequence
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    BTU_PER_KWH,
+    DEFAULT_COP_CURVE,
+    PELLET_BTU_PER_LB,
+    PRICE_PROFILE_SMOOTHING,
+    SOURCE_MIN_RUN_TIME,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+)
+
+
+def parse_cop_curve(text: str) -> list[tuple[float, float]]:
+    """Parse a COP curve written as ``"temp:cop, temp:cop, ..."``.
+
+    Raises:
+        ValueError: If the text is not a list of at least two points
+    """
+    points = []
+    for item in text.split(","):
+        temperature, cop = item.split(":")
+        points.append((float(temperature), float(cop)))
+    if len(points) < 2:
+        raise ValueError("A COP curve needs at least two points")
+    return sorted(points)
+
+
+class CopCurve:
+    """Heat pump COP versus outside temperature.
+
+    The curve is linearly interpolated into a table with one entry per
+    degree once, so a lookup is an index operation.
+    """
+
+    __slots__ = ("_low", "_table")
+
+    def __init__(
+        self, points: Optional[Sequence[tuple[float, float]]] = None
+    ) -> None:
+        """Initialize the curve from (outside temperature, COP) points."""
+        points = sorted(points or parse_cop_curve(DEFAULT_COP_CURVE))
+        self._low = math.floor(points[0][0])
+        high = math.ceil(points[-1][0])
+        self._table = []
+        index = 0
+        for temperature in range(self._low, high + 1):
+            while index < len(points) - 2 and temperature > points[index + 1][0]:
+                index += 1
+            (t0, c0), (t1, c1) = points[index], points[index + 1]
+            fraction = min(max((temperature - t0) / (t1 - t0), 0.0), 1.0)
+            self._table.append(c0 + (c1 - c0) * fraction)
+
+    def cop(self, outside_temp: float) -> float:
+        """Return the COP at ``outside_temp``, clamped to the curve ends."""
+        index = int(round(outside_temp)) - self._low
+        return self._table[min(max(index, 0), len(self._table) - 1)]
+
+
+class PriceProfile:
+    """Electricity price per hour of the day.
+
+    Each observed price updates an exponentially smoothed value for its
+    hour, so a time-of-use tariff is learned from the price entity itself
+    and the price of any future hour is a single lookup.
+    """
+
+    __slots__ = ("_hours", "_smoothing")
+
+    def __init__(self, smoothing: float = PRICE_PROFILE_SMOOTHING) -> None:
+        """Initialize an empty profile."""
+        self._hours: list[Optional[float]] = [None] * 24
+        self._smoothing = smoothing
+
+    @staticmethod
+    def _hour(timestamp: float) -> int:
+        """Return the local hour of the day of ``timestamp``."""
+        return dt_util.as_local(dt_util.utc_from_timestamp(timestamp)).hour
+
+    def observe(self, timestamp: float, price: float) -> None:
+        """Record the price valid at ``timestamp``."""
+        hour = self._hour(timestamp)
+        previous = self._hours[hour]
+        if previous is None:
+            self._hours[hour] = price
+        else:
+            self._hours[hour] = previous + self._smoothing * (price - previous)
+
+    def price_at(self, timestamp: float, default: float) -> float:
+        """Return the expected price at ``timestamp``, or ``default``."""
+        price = self._hours[self._hour(timestamp)]
+        return default if price is None else price
+
+    def as_list(self) -> list[Optional[float]]:
+        """Return the hourly prices for storage."""
+        return list(self._hours)
+
+    def load(self, hours: Sequence[Optional[float]]) -> None:
+        """Restore the hourly prices from storage."""
+        if len(hours) == 24:
+            self._hours = list(hours)
+
+
+class CostModel:
+    """Cost per million delivered BTU of each source."""
+
+    def __init__(
+        self,
+        cop_curve: CopCurve,
+        pellet_price_per_lb: float,
+        pellet_efficiency: float,
+    ) -> None:
+        """Initialize the cost model.
+
+        Args:
+            cop_curve: Mini-split COP curve
+            pellet_price_per_lb: Pellet price per pound
+            pellet_efficiency: Fraction of the pellet energy delivered
+        """
+        self.cop_curve = cop_curve
+        self.pellet_cost = (
+            pellet_price_per_lb / (PELLET_BTU_PER_LB * pellet_efficiency) * 1e6
+        )
+
+    def minisplit_cost(self, outside_temp: float, electricity_price: float) -> float:
+        """Return the mini-split cost per million BTU."""
+        cop = self.cop_curve.cop(outside_temp)
+        return electricity_price / (cop * BTU_PER_KWH) * 1e6
+
+    def cheaper_source(self, outside_temp: float, electricity_price: float) -> str:
+        """Return the source with the lower cost per delivered BTU."""
+        if self.minisplit_cost(outside_temp, electricity_price) <= self.pellet_cost:
+            return SOURCE_MINISPLIT
+        return SOURCE_PELLET
+
+    def plan(
+        self,
+        start: float,
+        hours: int,
+        outside_at: Callable[[float], float],
+        price_at: Callable[[float], float],
+        min_run_time: float = SOURCE_MIN_RUN_TIME,
+    ) -> CostPlan:
+        """Plan the cheaper source for each hour from ``start``.
+
+        Args:
+            start: Start of the plan, the current time
+            hours: Number of hours to plan
+            outside_at: Expected outside temperature at a timestamp
+            price_at: Expected electricity price at a timestamp
+            min_run_time: Shortest stove run worth an ignition
+        """
+        sources = [
+            self.cheaper_source(
+                outside_at(start + hour * 3600), price_at(start + hour * 3600)
+            )
+            for hour in range(hours)
+        ]
+        return CostPlan(start, sources, min_run_time)
+
+    def as_dict(self, outside_temp: float, electricity_price: float) -> dict[str, Any]:
+        """Return the current costs for the state attributes."""
+        return {
+            SOURCE_MINISPLIT: round(
+                self.minisplit_cost(outside_temp, electricity_price), 2
+            ),
+            SOURCE_PELLET: round(self.pellet_cost, 2),
+        }
+
+
+class CostPlan:
+    """Hourly cheapest source with the stove limited to worthwhile runs.
+
+    The length of the stove run starting at each hour is precomputed, so
+    looking up the preferred source for a point in time is O(1).
+    """
+
+    __slots__ = ("start", "_sources", "_pellet_runs", "_min_run_hours")
+
+    def __init__(
+        self, start: float, sources: Sequence[str], min_run_time: float
+    ) -> None:
+        """Initialize the plan."""
+        self.start = start
+        self._sources = list(sources)
+        self._min_run_hours = min_run_time / 3600
+        self._pellet_runs = [0] * (len(self._sources) + 1)
+        for hour in range(len(self._sources) - 1, -1, -1):
+            if self._sources[hour] == SOURCE_PELLET:
+                self._pellet_runs[hour] = self._pellet_runs[hour + 1] + 1
+
+    def source_at(self, timestamp: float, active_source: str) -> Optional[str]:
+        """Return the preferred source at ``timestamp``, None past the plan.
+
+        Switching to the stove is only preferred when it stays cheaper for
+        at least the minimum run time; a running stove is kept until the
+        mini-split is cheaper.
+        """
+        hour = int((timestamp - self.start) // 3600)
+        if not 0 <= hour < len(self._sources):
+            return None
+        source = self._sources[hour]
+        if (
+            source == SOURCE_PELLET
+            and active_source != SOURCE_PELLET
+            and self._pellet_runs[hour] < self._min_run_hours
+        ):
+            return SOURCE_MINISPLIT
+        return source
@@ -0,0 +1,21 @@
+"""Diagnostics support for the smart thermostat."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_STATS, DATA_TELEMETRY
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the configuration, control loop statistics and rollups."""
+    runtime_data = hass.data[DOMAIN][config_entry.entry_id]
+    return {
+        "config": {**config_entry.data, **config_entry.options},
+        "control_loop": runtime_data[DATA_STATS].as_dict(),
+        "telemetry": runtime_data[DATA_TELEMETRY].as_dict(),
+    }
@@ -0,0 +1,728 @@
+"""Flight recorder for the control inputs and decisions of a thermostat zone.
+
+Every input event (temperatures, device states, target and mode changes) and
+every decision (selected source and reason, PID terms, stove level, service
+calls) is appended to a ring of fixed-width records in a memory-mapped file.
+A write is a single ``struct.pack_into`` into the page cache, so recording
+costs microseconds and never waits for the disk. The log survives restarts;
+once it is full the oldest records are overwritten.
+
+A log can be replayed through the current decision code, which diffs the
+recorded source selections and stove levels against the replayed ones::
+
+    python -m smart_selecting_thermostat.flight_recorder \
+        .storage/smart_thermostat.<entry_id>.flight --kp 1.5
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Sequence
+
+from .const import (
+    AUTOTUNE_ABORTED,
+    AUTOTUNE_FINISHED,
+    AUTOTUNE_RUNNING,
+    DEFAULT_MIN_OUTSIDE_TEMP,
+    DEFAULT_PID_KD,
+    DEFAULT_PID_KI,
+    DEFAULT_PID_KP,
+    FLIGHT_RECORDER_CAPACITY,
+    MODE_MPC,
+    MODE_ON_OFF,
+    MODE_PID,
+    REASON_AUTOTUNE,
+    REASON_MANUAL,
+    REASON_MINISPLIT_ADEQUATE,
+    REASON_MINISPLIT_CHEAPER,
+    REASON_NOT_REACHING_TARGET,
+    REASON_OPTIMAL_START,
+    REASON_PELLET_CHEAPER,
+    REASON_TEMP_DECREASING,
+    REASON_TEMP_TOO_LOW,
+    REASON_WEATHER_FORECAST,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    TARGET_TIMEOUT,
+    TEMP_HISTORY_CAPACITY,
+    TEMP_TREND_PERIOD,
+)
+from .pid_controller import PelletStovePIDController, on_off_level
+from .source_selector import SourceSelector
+from .temperature_history import TemperatureHistory
+
+# File layout: a header in the first record slot, then ``capacity`` records
+MAGIC = b"SSTFLREC"
+VERSION = 1
+HEADER = struct.Struct("<8sHHI")  # magic, version, record size, capacity
+# seq, timestamp, kind, two small codes, four values
+RECORD = struct.Struct("<QdBBB5x4d")
+
+# Record kinds and the meaning of their codes (a, b) and values (x, y, z, w)
+RECORD_CONFIG = 1  # a mode; x min outside temp, y target timeout
+RECORD_GAINS = 2  # x kp, y ki, z kd
+RECORD_INSIDE = 3  # x fused estimate (NaN if rejected), y sensor reading
+RECORD_OUTSIDE = 4  # x fused outside temperature
+RECORD_TARGET = 5  # x target temperature
+RECORD_HVAC_MODE = 6  # a 1 when heating
+RECORD_DEVICE = 7  # a entity, b 1 when on; x setpoint, y 1 if it drifted
+RECORD_PASS = 8  # a active source, b forecast source; x inside, y target,
+# z outside, w seconds since the target changed
+RECORD_PASS_CONTEXT = 9  # a cost source, b preheat source; x, y mini-split
+# and stove time to target, z seconds in the active source
+RECORD_SOURCE = 10  # a selected source, b reason; x applied source
+RECORD_PID = 11  # x proportional, y integral, z derivative, w output
+RECORD_LEVEL = 12  # a requested level, b commanded level
+RECORD_CALL = 13  # a service, b entity; x value, y 1 if it succeeded
+RECORD_AUTOTUNE = 14  # a autotune state; x inside, y target, z stove level
+
+KIND_NAMES = {
+    RECORD_CONFIG: "config",
+    RECORD_GAINS: "gains",
+    RECORD_INSIDE: "inside",
+    RECORD_OUTSIDE: "outside",
+    RECORD_TARGET: "target",
+    RECORD_HVAC_MODE: "hvac_mode",
+    RECORD_DEVICE: "device",
+    RECORD_PASS: "pass",
+    RECORD_PASS_CONTEXT: "pass_context",
+    RECORD_SOURCE: "source",
+    RECORD_PID: "pid",
+    RECORD_LEVEL: "level",
+    RECORD_CALL: "call",
+    RECORD_AUTOTUNE: "autotune",
+}
+
+# Code tables; only ever append to them so old logs stay readable
+MODES: tuple[Optional[str], ...] = (None, MODE_PID, MODE_ON_OFF, MODE_MPC)
+SOURCES: tuple[Optional[str], ...] = (None, SOURCE_MINISPLIT, SOURCE_PELLET)
+REASONS: tuple[Optional[str], ...] = (
+    None,
+    REASON_TEMP_TOO_LOW,
+    REASON_TEMP_DECREASING,
+    REASON_NOT_REACHING_TARGET,
+    REASON_WEATHER_FORECAST,
+    REASON_MANUAL,
+    REASON_MINISPLIT_ADEQUATE,
+    REASON_PELLET_CHEAPER,
+    REASON_MINISPLIT_CHEAPER,
+    REASON_OPTIMAL_START,
+    REASON_AUTOTUNE,
+)
+SERVICES: tuple[Optional[str], ...] = (None, "turn_on", "turn_off", "set_temperature")
+AUTOTUNE_STATES: tuple[Optional[str], ...] = (
+    None,
+    AUTOTUNE_RUNNING,
+    AUTOTUNE_FINISHED,
+    AUTOTUNE_ABORTED,
+)
+UNKNOWN = 255
+
+NAN = math.nan
+
+
+def _encode(table: Sequence[Optional[str]], value: Optional[str]) -> int:
+    """Return the code of ``value`` in ``table``."""
+    try:
+        return table.index(value)
+    except ValueError:
+        return UNKNOWN
+
+
+def _decode(table: Sequence[Optional[str]], code: int) -> Optional[str]:
+    """Return the value of ``code`` in ``table``."""
+    return table[code] if code < len(table) else f"unknown({code})"
+
+
+def _value(value: Optional[float]) -> float:
+    """Return ``value`` as a float, with NaN for None."""
+    return NAN if value is None else float(value)
+
+
+def _optional(value: float) -> Optional[float]:
+    """Return ``value``, with None for NaN."""
+    return None if math.isnan(value) else value
+
+
+class FlightRecord(NamedTuple):
+    """One decoded record of the flight recorder."""
+
+    seq: int
+    timestamp: float
+    kind: int
+    a: int
+    b: int
+    x: float
+    y: float
+    z: float
+    w: float
+
+    def describe(self) -> str:
+        """Return a one-line description of the record.
+
+        Entities are shown by their index in the thermostat's list of
+        actuated entities: the mini-split, the stove power switch and the
+        level switches in order.
+        """
+        kind = self.kind
+        if kind == RECORD_CONFIG:
+            fields = (
+                f"mode={_decode(MODES, self.a)} min_outside={self.x} "
+                f"target_timeout={self.y}"
+            )
+        elif kind == RECORD_GAINS:
+            fields = f"kp={self.x} ki={self.y} kd={self.z}"
+        elif kind == RECORD_INSIDE:
+            fields = f"estimate={_optional(self.x)} reading={_optional(self.y)}"
+        elif kind in (RECORD_OUTSIDE, RECORD_TARGET):
+            fields = f"{self.x}"
+        elif kind == RECORD_HVAC_MODE:
+            fields = "heat" if self.a else "off"
+        elif kind == RECORD_DEVICE:
+            fields = (
+                f"entity={self.a} {'on' if self.b else 'off'} "
+                f"setpoint={_optional(self.x)} drifted={bool(self.y)}"
+            )
+        elif kind == RECORD_PASS:
+            fields = (
+                f"active={_decode(SOURCES, self.a)} "
+                f"forecast={_decode(SOURCES, self.b)} inside={self.x} "
+                f"target={self.y} outside={_optional(self.z)} "
+                f"since_target_change={self.w:.0f}"
+            )
+        elif kind == RECORD_PASS_CONTEXT:
+            fields = (
+                f"cost={_decode(SOURCES, self.a)} "
+                f"preheat={_decode(SOURCES, self.b)} "
+                f"minisplit_time={_optional(self.x)} "
+                f"pellet_time={_optional(self.y)} in_source={self.z:.0f}"
+            )
+        elif kind == RECORD_SOURCE:
+            fields = (
+                f"selected={_decode(SOURCES, self.a)} "
+                f"reason={_decode(REASONS, self.b)} "
+                f"applied={_decode(SOURCES, int(self.x))}"
+            )
+        elif kind == RECORD_PID:
+            fields = (
+                f"p={self.x:.3f} i={self.y:.3f} d={self.z:.3f} output={self.w:.3f}"
+            )
+        elif kind == RECORD_LEVEL:
+            fields = f"requested={self.a} commanded={self.b}"
+        elif kind == RECORD_CALL:
+            fields = (
+                f"{_decode(SERVICES, self.a)} entity={self.b} "
+                f"value={_optional(self.x)} "
+                f"ok={bool(self.y)}"
+            )
+        elif kind == RECORD_AUTOTUNE:
+            fields = (
+                f"{_decode(AUTOTUNE_STATES, self.a)} inside={self.x} "
+                f"target={self.y} level={_optional(self.z)}"
+            )
+        else:
+            fields = f"a={self.a} b={self.b} values={self.x, self.y, self.z, self.w}"
+        when = datetime.fromtimestamp(self.timestamp, timezone.utc).isoformat()
+        return f"{self.seq} {when} {KIND_NAMES.get(kind, kind)} {fields}"
+
+
+class FlightRecorder:
+    """Append-only ring of fixed-width records in a memory-mapped file.
+
+    ``open`` and ``close`` do file I/O and belong in the executor; recording
+    only writes to the mapping and is a no-op while the log is closed.
+    Entities are stored as their index in ``entities``.
+    """
+
+    __slots__ = ("path", "capacity", "_entities", "_time_fn", "_file", "_map", "_seq")
+
+    def __init__(
+        self,
+        path: str,
+        entities: Sequence[str] = (),
+        capacity: int = FLIGHT_RECORDER_CAPACITY,
+        time_fn: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize the recorder.
+
+        Args:
+            path: Log file, created on open
+            entities: Actuated entities, recorded by index
+            capacity: Number of records kept
+            time_fn: Clock returning epoch seconds
+        """
+        self.path = path
+        self.capacity = capacity
+        self._entities = {entity_id: index for index, entity_id in enumerate(entities)}
+        self._time_fn = time_fn
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._seq = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Return True if records are being written."""
+        return self._map is not None
+
+    @property
+    def seq(self) -> int:
+        """Return the sequence number of the last record."""
+        return self._seq
+
+    def open(self) -> None:
+        """Open or create the log and continue after its last record.
+
+        A log with a different layout or capacity is started afresh.
+        """
+        size = RECORD.size * (self.capacity + 1)
+        header = HEADER.pack(MAGIC, VERSION, RECORD.size, self.capacity)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+        try:
+            if (
+                file.read(HEADER.size) != header
+                or os.fstat(file.fileno()).st_size != size
+            ):
+                file.truncate(0)
+                file.truncate(size)
+                file.seek(0)
+                file.write(header)
+                file.flush()
+            self._map = mmap.mmap(file.fileno(), size)
+        except BaseException:
+            file.close()
+            raise
+        self._file = file
+        self._seq = max(
+            (
+                seq
+                for seq, *_ in RECORD.iter_unpack(
+                    memoryview(self._map)[RECORD.size :]
+                )
+            ),
+            default=0,
+        )
+
+    def close(self) -> None:
+        """Flush and close the log."""
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(
+        self,
+        kind: int,
+        a: int = 0,
+        b: int = 0,
+        x: float = NAN,
+        y: float = NAN,
+        z: float = NAN,
+        w: float = NAN,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        """Append a record, overwriting the oldest one once the log is full."""
+        if self._map is None:
+            return
+        self._seq += 1
+        RECORD.pack_into(
+            self._map,
+            RECORD.size * (1 + (self._seq - 1) % self.capacity),
+            self._seq,
+            self._time_fn() if timestamp is None else timestamp,
+            kind,
+            a,
+            b,
+            x,
+            y,
+            z,
+            w,
+        )
+
+    def _entity(self, entity_id: str) -> int:
+        """Return the index of an actuated entity."""
+        return self._entities.get(entity_id, UNKNOWN)
+
+    def config(
+        self,
+        control_mode: str,
+        min_outside_temp: float,
+        target_timeout: float,
+        gains: Optional[tuple[float, float, float]] = None,
+    ) -> None:
+        """Record the configuration the decisions are made with."""
+        self.record(
+            RECORD_CONFIG,
+            _encode(MODES, control_mode),
+            x=min_outside_temp,
+            y=target_timeout,
+        )
+        if gains is not None:
+            self.record(RECORD_GAINS, x=gains[0], y=gains[1], z=gains[2])
+
+    def inside(
+        self, timestamp: float, estimate: Optional[float], reading: Optional[float]
+    ) -> None:
+        """Record an inside sensor reading and the fused estimate."""
+        self.record(
+            RECORD_INSIDE, x=_value(estimate), y=_value(reading), timestamp=timestamp
+        )
+
+    def outside(self, temperature: float) -> None:
+        """Record a new fused outside temperature."""
+        self.record(RECORD_OUTSIDE, x=temperature)
+
+    def target(self, temperature: float) -> None:
+        """Record a target temperature change."""
+        self.record(RECORD_TARGET, x=temperature)
+
+    def hvac_mode(self, heating: bool) -> None:
+        """Record the thermostat being turned on or off."""
+        self.record(RECORD_HVAC_MODE, int(heating))
+
+    def device(
+        self, entity_id: str, on: bool, setpoint: Optional[float], drifted: bool
+    ) -> None:
+        """Record a state change of an actuated entity."""
+        self.record(
+            RECORD_DEVICE,
+            self._entity(entity_id),
+            int(on),
+            x=_value(setpoint),
+            y=float(drifted),
+        )
+
+    def control_pass(
+        self,
+        active_source: str,
+        current_temp: float,
+        target_temp: float,
+        outside_temp: Optional[float],
+        seconds_since_target_change: float,
+        forecast_source: Optional[str],
+        time_to_target: Optional[dict[str, Optional[float]]],
+        seconds_in_source: float,
+        cost_source: Optional[str],
+        preheat_source: Optional[str] = None,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        """Record the inputs of a source selection.
+
+        ``timestamp`` is the time the trend history was trimmed to, so the
+        replay trims it the same way.
+        """
+        predicted = time_to_target or {}
+        self.record(
+            RECORD_PASS,
+            _encode(SOURCES, active_source),
+            _encode(SOURCES, forecast_source),
+            x=current_temp,
+            y=target_temp,
+            z=_value(outside_temp),
+            w=seconds_since_target_change,
+            timestamp=timestamp,
+        )
+        self.record(
+            RECORD_PASS_CONTEXT,
+            _encode(SOURCES, cost_source),
+            _encode(SOURCES, preheat_source),
+            x=_value(predicted.get(SOURCE_MINISPLIT)),
+            y=_value(predicted.get(SOURCE_PELLET)),
+            z=seconds_in_source,
+        )
+
+    def source(self, selected: str, reason: Optional[str], applied: str) -> None:
+        """Record the selected source and the source applied after hold-backs."""
+        self.record(
+            RECORD_SOURCE,
+            _encode(SOURCES, selected),
+            _encode(REASONS, reason),
+            x=_encode(SOURCES, applied),
+        )
+
+    def pid(
+        self, components: tuple[float, float, float], output: Optional[float]
+    ) -> None:
+        """Record the PID terms and output."""
+        proportional, integral, derivative = components
+        self.record(
+            RECORD_PID, x=proportional, y=integral, z=derivative, w=_value(output)
+        )
+
+    def level(self, requested: int, commanded: Optional[int]) -> None:
+        """Record a requested stove level and the level commanded."""
+        self.record(RECORD_LEVEL, requested, commanded or 0)
+
+    def call(
+        self,
+        service: str,
+        entity_ids: Iterable[str],
+        value: Optional[float],
+        succeeded: bool,
+    ) -> None:
+        """Record a service call, one record per entity."""
+        code = _encode(SERVICES, service)
+        for entity_id in entity_ids:
+            self.record(
+                RECORD_CALL,
+                code,
+                self._entity(entity_id),
+                x=_value(value),
+                y=float(succeeded),
+            )
+
+    def autotune(
+        self,
+        state: str,
+        current_temp: float,
+        target_temp: float,
+        level: Optional[int],
+    ) -> None:
+        """Record the start or end of an autotune experiment."""
+        self.record(
+            RECORD_AUTOTUNE,
+            _encode(AUTOTUNE_STATES, state),
+            x=current_temp,
+            y=target_temp,
+            z=_value(level),
+        )
+
+
+def read_log(path: str) -> list[FlightRecord]:
+    """Return the records of a log in the order they were written."""
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, record_size, _ = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a flight recorder log")
+    records = [
+        FlightRecord._make(fields)
+        for fields in RECORD.iter_unpack(memoryview(data)[RECORD.size :])
+        if fields[0]
+    ]
+    records.sort()
+    return records
+
+
+@dataclass
+class ReplayDiff:
+    """A decision that the replayed code made differently."""
+
+    timestamp: float
+    field: str
+    recorded: Any
+    replayed: Any
+
+    def __str__(self) -> str:
+        """Return the difference as a line of the replay report."""
+        when = datetime.fromtimestamp(self.timestamp, timezone.utc).isoformat()
+        return (
+            f"{when} {self.field}: recorded {self.recorded}, "
+            f"replayed {self.replayed}"
+        )
+
+
+@dataclass
+class ReplayReport:
+    """Summary of a replay."""
+
+    passes: int = 0
+    levels: int = 0
+    diffs: list[ReplayDiff] = field(default_factory=list)
+
+
+class FlightReplay:
+    """Feed a recorded log through the current decision code.
+
+    Every recorded source selection is repeated with the recorded inputs and
+    the trend history rebuilt from the recorded inside temperatures, and
+    every stove level request is repeated with the PID controller or the
+    on/off rule. The comparison is made per pass, from the recorded active
+    source, so one difference does not cascade. MPC levels depend on the
+    learned stove model, which is not logged, and are not compared; neither
+    are the levels of an autotune experiment.
+
+    Settings left as None are taken from the log's config records; so is
+    each of the three gains, so one gain can be changed on its own.
+    """
+
+    def __init__(
+        self,
+        control_mode: Optional[str] = None,
+        min_outside_temp: Optional[float] = None,
+        target_timeout: Optional[float] = None,
+        gains: Optional[
+            tuple[Optional[float], Optional[float], Optional[float]]
+        ] = None,
+    ) -> None:
+        """Initialize the replay with settings overriding the recorded ones."""
+        self._overrides = {
+            "control_mode": control_mode,
+            "min_outside_temp": min_outside_temp,
+            "target_timeout": target_timeout,
+            "gains": gains,
+        }
+        self.now = 0.0
+        self.control_mode = control_mode or MODE_PID
+        self.selector = SourceSelector(
+            DEFAULT_MIN_OUTSIDE_TEMP if min_outside_temp is None else min_outside_temp,
+            TARGET_TIMEOUT if target_timeout is None else target_timeout,
+        )
+        self.pid = PelletStovePIDController(
+            *self._gains((DEFAULT_PID_KP, DEFAULT_PID_KI, DEFAULT_PID_KD)),
+            time_fn=lambda: self.now,
+        )
+        self.history = TemperatureHistory(TEMP_TREND_PERIOD, TEMP_HISTORY_CAPACITY)
+
+    def _gains(self, recorded: tuple[float, float, float]) -> list[float]:
+        """Return the ``recorded`` gains with the overridden ones replaced."""
+        overrides = self._overrides["gains"] or (None, None, None)
+        return [
+            gain if override is None else override
+            for gain, override in zip(recorded, overrides)
+        ]
+
+    def _configure(self, record: FlightRecord) -> None:
+        """Apply a recorded configuration unless it is overridden."""
+        overrides = self._overrides
+        if record.kind == RECORD_GAINS:
+            self.pid.set_tunings(*self._gains((record.x, record.y, record.z)))
+            return
+        if overrides["control_mode"] is None and 0 < record.a < len(MODES):
+            self.control_mode = MODES[record.a]
+        if overrides["min_outside_temp"] is None:
+            self.selector.min_outside_temp = record.x
+        if overrides["target_timeout"] is None:
+            self.selector.target_timeout = record.y
+
+    def run(self, records: Iterable[FlightRecord]) -> ReplayReport:
+        """Replay ``records`` and return the differences."""
+        report = ReplayReport()
+        inputs: Optional[FlightRecord] = None
+        context: Optional[FlightRecord] = None
+        replayed: Optional[tuple[Optional[str], Optional[str]]] = None
+        level: Optional[int] = None
+
+        for record in records:
+            self.now = record.timestamp
+            kind = record.kind
+            if kind in (RECORD_CONFIG, RECORD_GAINS):
+                self._configure(record)
+            elif kind == RECORD_INSIDE:
+                if not math.isnan(record.x):
+                    self.history.append(record.timestamp, record.x)
+            elif kind == RECORD_HVAC_MODE:
+                if not record.a:
+                    level = None
+            elif kind == RECORD_PASS:
+                inputs = record
+            elif kind == RECORD_AUTOTUNE:
+                # Passes of the experiment bypass the source selection
+                inputs = context = replayed = None
+                if not math.isnan(record.z):
+                    level = int(record.z)
+                    if self.control_mode == MODE_PID:
+                        self.pid.transfer(record.x, record.y, record.z)
+            elif kind == RECORD_PASS_CONTEXT and inputs is not None:
+                context = record
+                time_to_target = {
+                    SOURCE_MINISPLIT: _optional(record.x),
+                    SOURCE_PELLET: _optional(record.y),
+                }
+                self.history.trim(inputs.timestamp)
+                replayed = self.selector.select(
+                    _decode(SOURCES, inputs.a),
+                    inputs.x,
+                    inputs.y,
+                    _optional(inputs.z),
+                    self.history,
+                    inputs.w,
+                    _decode(SOURCES, inputs.b),
+                    time_to_target
+                    if any(value is not None for value in time_to_target.values())
+                    else None,
+                    record.z,
+                    _decode(SOURCES, record.a),
+                    _decode(SOURCES, record.b),
+                )
+            elif kind == RECORD_SOURCE and replayed is not None:
+                report.passes += 1
+                recorded = (_decode(SOURCES, record.a), _decode(REASONS, record.b))
+                if replayed[0] != recorded[0]:
+                    report.diffs.append(
+                        ReplayDiff(record.timestamp, "source", recorded[0], replayed[0])
+                    )
+                elif replayed[1] != recorded[1]:
+                    report.diffs.append(
+                        ReplayDiff(record.timestamp, "reason", recorded[1], replayed[1])
+                    )
+                applied = _decode(SOURCES, int(record.x))
+                if applied != _decode(SOURCES, inputs.a):
+                    if applied == SOURCE_PELLET and self.control_mode == MODE_PID:
+                        # Bumpless transfer, as in the climate entity
+                        self.pid.transfer(inputs.x, inputs.y)
+                    if applied != SOURCE_PELLET:
+                        level = None
+                replayed = None
+            elif kind == RECORD_LEVEL and inputs is not None and context is not None:
+                requested = None
+                if self.control_mode == MODE_PID:
+                    requested = self.pid.compute_level(inputs.x, inputs.y)
+                elif self.control_mode == MODE_ON_OFF:
+                    requested = on_off_level(inputs.x, inputs.y, level)
+                if requested is not None:
+                    report.levels += 1
+                    if requested != record.a:
+                        report.diffs.append(
+                            ReplayDiff(record.timestamp, "level", record.a, requested)
+                        )
+                level = record.b or None
+        return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Replay or dump a flight recorder log from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="Flight recorder log to replay")
+    parser.add_argument(
+        "--dump", action="store_true", help="Print the records instead of replaying"
+    )
+    parser.add_argument("--mode", choices=[MODE_PID, MODE_ON_OFF, MODE_MPC])
+    parser.add_argument("--kp", type=float)
+    parser.add_argument("--ki", type=float)
+    parser.add_argument("--kd", type=float)
+    parser.add_argument("--min-outside-temp", type=float)
+    parser.add_argument("--target-timeout", type=float)
+    args = parser.parse_args(argv)
+
+    records = read_log(args.path)
+    if args.dump:
+        for record in records:
+            print(record.describe())
+        return
+
+    report = FlightReplay(
+        control_mode=args.mode,
+        min_outside_temp=args.min_outside_temp,
+        target_timeout=args.target_timeout,
+        gains=(args.kp, args.ki, args.kd),
+    ).run(records)
+    print(f"records: {len(records)}")
+    print(f"passes: {report.passes}")
+    print(f"levels: {report.levels}")
+    print(f"differences: {len(report.diffs)}")
+    for diff in report.diffs:
+        print(diff)
+
+
+if __name__ == "__main__":
+    main()
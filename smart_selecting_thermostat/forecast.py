@@ -0,0 +1,194 @@
+"""Weather forecast based heating source scheduling."""
+from __future__ import annotations
+
+import logging
+import time
+from bisect import bisect_right
+from typing import Any, Optional, Sequence
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    FORECAST_HORIZON,
+    FORECAST_UPDATE_INTERVAL,
+    SOURCE_PELLET,
+    STOVE_WARMUP_TIME,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ForecastSchedule:
+    """Interpolated hourly forecast with a precomputed source schedule.
+
+    The schedule is a sorted list of boundaries, so looking up the source for
+    a point in time is a single bisect.
+    """
+
+    __slots__ = ("times", "temperatures", "_boundaries", "_sources")
+
+    def __init__(
+        self,
+        times: Sequence[float],
+        temperatures: Sequence[float],
+        min_outside_temp: float,
+        min_forecast_hours: float,
+        preheat: float = STOVE_WARMUP_TIME,
+    ) -> None:
+        """Initialize the schedule.
+
+        Args:
+            times: Sorted forecast timestamps in epoch seconds
+            temperatures: Forecast outside temperatures
+            min_outside_temp: Outside temperature below which the stove is used
+            min_forecast_hours: Shortest cold spell that starts the stove
+            preheat: Seconds to light the stove ahead of a cold spell
+        """
+        self.times = list(times)
+        self.temperatures = list(temperatures)
+        self._boundaries: list[float] = []
+        self._sources: list[Optional[str]] = []
+
+        min_duration = min_forecast_hours * 3600
+        spell_start: Optional[float] = None
+        for timestamp, temperature in zip(self.times, self.temperatures):
+            if temperature < min_outside_temp:
+                if spell_start is None:
+                    spell_start = timestamp
+            elif spell_start is not None:
+                if timestamp - spell_start >= min_duration:
+                    self._add(spell_start - preheat, timestamp)
+                spell_start = None
+        if spell_start is not None:
+            end = self.times[-1] + 3600
+            if end - spell_start >= min_duration:
+                self._add(spell_start - preheat, end)
+
+    def _add(self, start: float, end: float) -> None:
+        """Schedule the stove between ``start`` and ``end``."""
+        if self._boundaries and start <= self._boundaries[-1]:
+            # Merge with the previous window when preheat makes them overlap
+            self._boundaries[-1] = end
+            return
+        self._boundaries.extend((start, end))
+        self._sources.extend((SOURCE_PELLET, None))
+
+    def temperature_at(self, timestamp: float) -> Optional[float]:
+        """Return the interpolated forecast temperature at ``timestamp``."""
+        if not self.times:
+            return None
+        index = bisect_right(self.times, timestamp)
+        if index == 0:
+            return self.temperatures[0]
+        if index == len(self.times):
+            return self.temperatures[-1]
+        t0, t1 = self.times[index - 1], self.times[index]
+        y0, y1 = self.temperatures[index - 1], self.temperatures[index]
+        return y0 + (y1 - y0) * (timestamp - t0) / (t1 - t0)
+
+    def source_at(self, timestamp: float) -> Optional[str]:
+        """Return the scheduled source at ``timestamp``, or None if any will do."""
+        index = bisect_right(self._boundaries, timestamp)
+        if index == 0:
+            return None
+        return self._sources[index - 1]
+
+    def next_change_after(self, timestamp: float) -> Optional[float]:
+        """Return the first schedule boundary after ``timestamp``, if any."""
+        index = bisect_right(self._boundaries, timestamp)
+        if index == len(self._boundaries):
+            return None
+        return self._boundaries[index]
+
+
+class ForecastManager:
+    """Fetch the hourly forecast of one weather entity for all zones.
+
+    The forecast is fetched at most once per update interval, and a schedule
+    is built once per distinct set of zone thresholds.
+    """
+
+    def __init__(self, hass: HomeAssistant, weather_entity: str) -> None:
+        """Initialize the forecast manager."""
+        self.hass = hass
+        self.weather_entity = weather_entity
+        self.times: list[float] = []
+        self.temperatures: list[float] = []
+        self._schedules: dict[tuple[float, float], ForecastSchedule] = {}
+        self._last_fetch: Optional[float] = None
+
+    def refresh_due_in(self) -> float:
+        """Return the seconds until the cached forecast expires."""
+        if self._last_fetch is None:
+            return 0.0
+        return self._last_fetch + FORECAST_UPDATE_INTERVAL - time.monotonic()
+
+    async def async_refresh(self, force: bool = False) -> None:
+        """Fetch the forecast if the cache expired."""
+        now = time.monotonic()
+        if (
+            not force
+            and self._last_fetch is not None
+            and now - self._last_fetch < FORECAST_UPDATE_INTERVAL
+        ):
+            return
+        self._last_fetch = now
+
+        try:
+            response = await self.hass.services.async_call(
+                "weather",
+                "get_forecasts",
+                {"entity_id": self.weather_entity, "type": "hourly"},
+                blocking=True,
+                return_response=True,
+            )
+        except HomeAssistantError as err:
+            _LOGGER.warning(
+                "Unable to fetch forecast for %s: %s", self.weather_entity, err
+            )
+            return
+
+        forecast = (response or {}).get(self.weather_entity, {}).get("forecast", [])
+        self._store_forecast(forecast)
+
+    def _store_forecast(self, forecast: list[dict[str, Any]]) -> None:
+        """Keep the forecast entries within the horizon and drop old schedules."""
+        horizon = time.time() + FORECAST_HORIZON * 3600
+        self.times = []
+        self.temperatures = []
+        for entry in forecast:
+            when = dt_util.parse_datetime(str(entry.get("datetime")))
+            temperature = entry.get("temperature")
+            if when is None or temperature is None:
+                continue
+            timestamp = when.timestamp()
+            if timestamp > horizon:
+                break
+            self.times.append(timestamp)
+            self.temperatures.append(float(temperature))
+        self._schedules.clear()
+
+    def schedule(
+        self, min_outside_temp: float, min_forecast_hours: float
+    ) -> Optional[ForecastSchedule]:
+        """Return the schedule for the given thresholds, or None if no forecast."""
+        if not self.times:
+            return None
+        key = (min_outside_temp, min_forecast_hours)
+        schedule = self._schedules.get(key)
+        if schedule is None:
+            schedule = self._schedules[key] = ForecastSchedule(
+                self.times, self.temperatures, min_outside_temp, min_forecast_hours
+            )
+        return schedule
+
+    def source_at(
+        self, timestamp: float, min_outside_temp: float, min_forecast_hours: float
+    ) -> Optional[str]:
+        """Return the scheduled source at ``timestamp``, or None if any will do."""
+        schedule = self.schedule(min_outside_temp, min_forecast_hours)
+        if schedule is None:
+            return None
+        return schedule.source_at(timestamp)
@@ -0,0 +1,190 @@
+"""Online models of how fast each heating source warms the house."""
+from __future__ import annotations
+
+import math
+from typing import Any, Optional
+
+from .const import (
+    MODEL_FORGETTING_FACTOR,
+    MODEL_MIN_SAMPLES,
+    MODEL_UPDATE_INTERVAL,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    STOVE_WARMUP_TIME,
+    TEMP_CHANGE_THRESHOLD,
+)
+from .temperature_history import TemperatureHistory
+
+# Initial covariance of the parameter estimates
+_INITIAL_COVARIANCE = 1000.0
+
+
+class HeatingRateModel:
+    """Recursive least squares fit of the heating rate of one source.
+
+    The inside temperature rate in °F per hour is modelled as::
+
+        rate = a + b * outside + c * (inside - outside)
+
+    which covers a source whose output depends on the outside temperature
+    and a house that loses heat in proportion to the temperature difference.
+    """
+
+    __slots__ = ("theta", "covariance", "samples", "forgetting")
+
+    def __init__(self, forgetting: float = MODEL_FORGETTING_FACTOR) -> None:
+        """Initialize an untrained model."""
+        self.theta = [0.0, 0.0, 0.0]
+        self.covariance = [
+            [_INITIAL_COVARIANCE if i == j else 0.0 for j in range(3)]
+            for i in range(3)
+        ]
+        self.samples = 0
+        self.forgetting = forgetting
+
+    @staticmethod
+    def _features(inside: float, outside: float) -> tuple[float, float, float]:
+        """Return the regressor vector."""
+        return 1.0, outside, inside - outside
+
+    @property
+    def trained(self) -> bool:
+        """Return True once the model has seen enough samples."""
+        return self.samples >= MODEL_MIN_SAMPLES
+
+    def update(self, inside: float, outside: float, rate: float) -> None:
+        """Add an observed heating rate in °F per hour."""
+        self._fit(self._features(inside, outside), rate)
+
+    def _fit(self, x: tuple[float, float, float], rate: float) -> None:
+        """Update the estimates with one regressor vector and its rate."""
+        p = self.covariance
+        px = [sum(p[i][j] * x[j] for j in range(3)) for i in range(3)]
+        denominator = self.forgetting + sum(x[i] * px[i] for i in range(3))
+        gain = [value / denominator for value in px]
+        error = rate - sum(self.theta[i] * x[i] for i in range(3))
+        self.theta = [self.theta[i] + gain[i] * error for i in range(3)]
+        self.covariance = [
+            [(p[i][j] - gain[i] * px[j]) / self.forgetting for j in range(3)]
+            for i in range(3)
+        ]
+        self.samples += 1
+
+    def rate(self, inside: float, outside: float) -> float:
+        """Return the predicted heating rate in °F per hour."""
+        x = self._features(inside, outside)
+        return sum(self.theta[i] * x[i] for i in range(3))
+
+    def time_to_target(self, inside: float, outside: float, target: float) -> float:
+        """Return the predicted seconds to reach ``target``, or inf if never.
+
+        With a constant outside temperature the model is a linear ODE in the
+        inside temperature, which is solved in closed form.
+        """
+        a, b, c = self.theta
+        k = a + b * outside - c * outside  # rate = k + c * inside
+        if c < 0:
+            equilibrium = -k / c
+            if equilibrium <= target:
+                return math.inf
+            if inside >= target:
+                return 0.0
+            hours = math.log((equilibrium - inside) / (equilibrium - target)) / -c
+            return hours * 3600
+        if inside >= target:
+            return 0.0
+        rate = k + c * inside
+        if rate <= 0:
+            return math.inf
+        return (target - inside) / rate * 3600
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the model state for storage."""
+        return {
+            "theta": self.theta,
+            "covariance": self.covariance,
+            "samples": self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> HeatingRateModel:
+        """Restore a model from storage."""
+        model = cls()
+        model.theta = [float(value) for value in data["theta"]]
+        model.covariance = [[float(v) for v in row] for row in data["covariance"]]
+        model.samples = int(data["samples"])
+        return model
+
+
+class SourceRateModels:
+    """Heating rate models for both sources, fed from the temperature history."""
+
+    def __init__(self) -> None:
+        """Initialize untrained models."""
+        self.models = {
+            SOURCE_MINISPLIT: HeatingRateModel(),
+            SOURCE_PELLET: HeatingRateModel(),
+        }
+        self._last_update: Optional[float] = None
+
+    def observe(
+        self,
+        source: str,
+        active_since: float,
+        now: float,
+        outside: Optional[float],
+        target: float,
+        history: TemperatureHistory,
+    ) -> bool:
+        """Feed the current trend to the model of the active source.
+
+        Samples are taken at most every MODEL_UPDATE_INTERVAL seconds, only
+        once the source has been active for half the history window (plus
+        the stove warm-up time for the stove), and only while the house is
+        below the target so the source is working rather than holding.
+
+        Returns:
+            bool: True if a sample was added
+        """
+        if outside is None or (
+            self._last_update is not None
+            and now - self._last_update < MODEL_UPDATE_INTERVAL
+        ):
+            return False
+        settle = history.window / 2
+        if source == SOURCE_PELLET:
+            settle += STOVE_WARMUP_TIME
+        slope = history.slope
+        if (
+            now - active_since < settle
+            or slope is None
+            or history.span < history.window / 2
+            or history.latest > target - TEMP_CHANGE_THRESHOLD
+        ):
+            return False
+        self.models[source].update(history.mean, outside, slope * 3600)
+        self._last_update = now
+        return True
+
+    def time_to_target(
+        self, inside: Optional[float], outside: Optional[float], target: float
+    ) -> dict[str, Optional[float]]:
+        """Return predicted seconds to target per source, None if untrained."""
+        if inside is None or outside is None:
+            return {source: None for source in self.models}
+        return {
+            source: model.time_to_target(inside, outside, target)
+            if model.trained
+            else None
+            for source, model in self.models.items()
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of all models for storage."""
+        return {source: model.as_dict() for source, model in self.models.items()}
+
+    def load(self, data: dict[str, Any]) -> None:
+        """Restore the models from storage."""
+        for source, model_data in data.items():
+            if source in self.models:
+                self.models[source] = HeatingRateModel.from_dict(model_data)
@@ -0,0 +1,175 @@
+"""Control loop instrumentation for the smart thermostat."""
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import time
+from bisect import bisect_left
+from typing import Any, Optional
+
+# Upper bounds of the latency buckets in milliseconds
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram."""
+
+    __slots__ = ("counts", "count", "total", "maximum")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Record one latency sample."""
+        millis = seconds * 1000
+        self.counts[bisect_left(LATENCY_BUCKETS, millis)] += 1
+        self.count += 1
+        self.total += millis
+        if millis > self.maximum:
+            self.maximum = millis
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Return the mean latency in milliseconds."""
+        return self.total / self.count if self.count else None
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Return the upper bound of the bucket holding the given percentile.
+
+        The bound is capped at the largest recorded sample.
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                if index < len(LATENCY_BUCKETS):
+                    return min(float(LATENCY_BUCKETS[index]), self.maximum)
+                return self.maximum
+        return self.maximum
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram for diagnostics."""
+        return {
+            "count": self.count,
+            "mean_ms": self.mean,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.maximum,
+            "buckets_ms": dict(
+                zip([*map(str, LATENCY_BUCKETS), "inf"], self.counts)
+            ),
+        }
+
+
+class ControlLoopStats:
+    """Counters, latency histograms and an optional sampling profiler."""
+
+    def __init__(self, profile_every: int = 0) -> None:
+        """Initialize the statistics.
+
+        Args:
+            profile_every: Profile one in this many control passes, 0 to
+                disable profiling
+        """
+        self.started = time.monotonic()
+        self.control_pass = LatencyHistogram()
+        self.source_selection = LatencyHistogram()
+        self.mpc_solve = LatencyHistogram()
+        self.service_calls: dict[str, LatencyHistogram] = {}
+        self.passes = 0
+        self.triggers = 0
+        self.dropped_events = 0
+        self.sent_calls = 0
+        self.skipped_calls = 0
+        self.failed_calls = 0
+        self.relay_toggles = 0
+        self.relay_actuations: dict[str, int] = {}
+        self.ignitions = 0
+        self.level_changes = 0
+        self.deferred_changes = 0
+        self.mpc_offloads = 0
+        self.profile_every = profile_every
+        self._profile = pstats.Stats() if profile_every else None
+        self._profiled_passes = 0
+
+    @property
+    def coalesced_events(self) -> int:
+        """Return how many control requests were folded into other passes."""
+        return max(self.triggers - self.passes, 0)
+
+    @property
+    def passes_per_hour(self) -> float:
+        """Return the average number of control passes per hour."""
+        hours = max(time.monotonic() - self.started, 1.0) / 3600
+        return self.passes / hours
+
+    def record_call(self, entity_ids: list[str], seconds: float, toggles: int) -> None:
+        """Record a completed service call."""
+        self.sent_calls += 1
+        self.relay_toggles += toggles
+        for entity_id in entity_ids:
+            if toggles:
+                self.relay_actuations[entity_id] = (
+                    self.relay_actuations.get(entity_id, 0) + 1
+                )
+            histogram = self.service_calls.get(entity_id)
+            if histogram is None:
+                histogram = self.service_calls[entity_id] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def profiler(self) -> Optional[cProfile.Profile]:
+        """Return a profiler if the next control pass should be sampled."""
+        if self._profile is None or self.passes % self.profile_every:
+            return None
+        return cProfile.Profile()
+
+    def add_profile(self, profiler: cProfile.Profile) -> None:
+        """Merge a finished profiler run into the aggregated profile."""
+        self._profile.add(profiler)
+        self._profiled_passes += 1
+
+    def profile_report(self, limit: int = 25) -> Optional[str]:
+        """Return the aggregated profile sorted by cumulative time."""
+        if not self._profiled_passes:
+            return None
+        stream = io.StringIO()
+        self._profile.stream = stream
+        self._profile.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all statistics for diagnostics."""
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "passes": self.passes,
+            "passes_per_hour": self.passes_per_hour,
+            "triggers": self.triggers,
+            "coalesced_events": self.coalesced_events,
+            "dropped_events": self.dropped_events,
+            "sent_calls": self.sent_calls,
+            "skipped_calls": self.skipped_calls,
+            "failed_calls": self.failed_calls,
+            "relay_toggles": self.relay_toggles,
+            "relay_actuations": self.relay_actuations,
+            "ignitions": self.ignitions,
+            "level_changes": self.level_changes,
+            "deferred_changes": self.deferred_changes,
+            "control_pass": self.control_pass.as_dict(),
+            "source_selection": self.source_selection.as_dict(),
+            "mpc_solve": self.mpc_solve.as_dict(),
+            "mpc_offloads": self.mpc_offloads,
+            "service_calls": {
+                entity_id: histogram.as_dict()
+                for entity_id, histogram in self.service_calls.items()
+            },
+            "profiled_passes": self._profiled_passes,
+            "profile": self.profile_report(),
+        }
@@ -0,0 +1,427 @@
+"""Model-predictive control of the pellet stove level."""
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Callable, NamedTuple, Optional, Sequence
+
+from .const import (
+    MODEL_UPDATE_INTERVAL,
+    MPC_BLOCK_STEPS,
+    MPC_COMFORT_WEIGHT,
+    MPC_FORGETTING_FACTOR,
+    MPC_FUEL_WEIGHT,
+    MPC_HORIZON_BLOCKS,
+    MPC_MAX_COVARIANCE,
+    MPC_MIN_STOVE_GAIN,
+    MPC_MODEL_PRIOR,
+    MPC_OVERSHOOT_WEIGHT,
+    MPC_PRIOR_COVARIANCE,
+    MPC_STEP,
+    MPC_SWITCH_WEIGHT,
+    MPC_TIME_BUDGET,
+    PID_OUTPUT_LIMITS,
+    STOVE_WARMUP_TIME,
+)
+from .heating_model import HeatingRateModel
+from .temperature_history import TemperatureHistory
+
+
+def _prior_covariance() -> list[list[float]]:
+    """Return the covariance of the prior stove model."""
+    return [
+        [MPC_PRIOR_COVARIANCE if i == j else 0.0 for j in range(3)]
+        for i in range(3)
+    ]
+
+
+class StoveThermalModel(HeatingRateModel):
+    """Recursive least squares fit of the house response to the stove.
+
+    The inside temperature rate in °F per hour is modelled as::
+
+        rate = a + b * heat + c * (inside - outside)
+
+    where ``heat`` is the stove level passed through a first-order lag for
+    the warm-up of the stove. The model starts from a prior for a typical
+    house so the controller is usable before it has seen any data. The
+    stove mostly runs near steady state, so past samples are forgotten more
+    slowly than in the source models to keep the estimates from winding up.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, forgetting: float = MPC_FORGETTING_FACTOR) -> None:
+        """Initialize the model at the prior."""
+        super().__init__(forgetting)
+        self.theta = list(MPC_MODEL_PRIOR)
+        self.covariance = _prior_covariance()
+
+    def observe(self, inside: float, outside: float, heat: float, rate: float) -> bool:
+        """Add an observed rate in °F per hour at a lagged stove level.
+
+        An update that would leave the stove warming the house less than
+        MPC_MIN_STOVE_GAIN per level, or the house not losing heat to the
+        outside, is rejected: steady operation carries little information
+        and a planner on such a model would let the house cool.
+
+        Returns:
+            bool: True if the sample was accepted
+        """
+        theta, covariance, samples = self.theta, self.covariance, self.samples
+        self._fit((1.0, heat, inside - outside), rate)
+        if self.theta[1] < MPC_MIN_STOVE_GAIN or self.theta[2] >= 0:
+            self.theta, self.covariance, self.samples = theta, covariance, samples
+            return False
+        # In steady operation the stove output and the temperature difference
+        # move together, which makes the update numerically fragile: keep
+        # the covariance symmetric, start it over if it stops being positive,
+        # and bound its trace so forgetting cannot wind up the gain
+        p = self.covariance
+        p = [[(p[i][j] + p[j][i]) / 2 for j in range(3)] for i in range(3)]
+        trace = sum(p[i][i] for i in range(3))
+        if min(p[i][i] for i in range(3)) <= 0:
+            p = _prior_covariance()
+        elif trace > MPC_MAX_COVARIANCE:
+            p = [[value * MPC_MAX_COVARIANCE / trace for value in row] for row in p]
+        self.covariance = p
+        return True
+
+
+class MpcProblem(NamedTuple):
+    """Snapshot of the controller state a solve starts from."""
+
+    theta: tuple[float, float, float]  # stove model parameters
+    heat: float  # lagged stove output
+    held: int  # level the plan starts from
+
+
+class MpcResult(NamedTuple):
+    """Outcome of a solve."""
+
+    level: int  # level for the first block of the best plan
+    solve_time: float  # seconds the search took
+    complete: bool  # False if the deadline cut the search short
+
+
+class MpcController:
+    """Plan the stove level over a short horizon and apply the first move.
+
+    The horizon is split into blocks in which the level is held, and a
+    depth-first branch-and-bound search over levels per block finds the
+    plan with the lowest cost of comfort error, overshoot, fuel and level
+    changes. A branch is cut as soon as its cost plus a lower bound on the
+    cost of the remaining blocks exceeds the best plan found so far, and
+    trying the held level first finds a good plan early.
+
+    A solve on the event loop stops at a deadline and returns the best plan
+    found so far; ``over_budget`` then tells the caller to run the next
+    solve in the executor without a deadline. For that, a solve is split in
+    three: ``problem`` snapshots the state on the event loop, ``search``
+    only reads the snapshot and the fixed settings so it can run in any
+    thread, and ``apply`` records the result back on the event loop.
+    """
+
+    __slots__ = (
+        "model",
+        "step",
+        "block_steps",
+        "blocks",
+        "budget",
+        "heat",
+        "level",
+        "planned_level",
+        "last_solve_time",
+        "over_budget",
+        "_low",
+        "_high",
+        "_warmup",
+        "_tracked_at",
+        "_level_since",
+        "_planned_at",
+        "_planned_target",
+        "_last_update",
+        "_timer",
+    )
+
+    def __init__(
+        self,
+        step: float = MPC_STEP,
+        block_steps: int = MPC_BLOCK_STEPS,
+        blocks: int = MPC_HORIZON_BLOCKS,
+        budget: float = MPC_TIME_BUDGET,
+        levels: tuple[int, int] = PID_OUTPUT_LIMITS,
+        warmup: float = STOVE_WARMUP_TIME,
+        timer: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        """Initialize the controller.
+
+        Args:
+            step: Seconds per prediction step
+            block_steps: Steps the level is held within a plan
+            blocks: Blocks in the prediction horizon
+            budget: Seconds a solve may take on the event loop
+            levels: Lowest and highest stove level
+            warmup: Time constant of the stove output in seconds
+            timer: Clock used to enforce the time budget
+        """
+        self.model = StoveThermalModel()
+        self.step = step
+        self.block_steps = block_steps
+        self.blocks = blocks
+        self.budget = budget
+        self._low, self._high = levels
+        self._warmup = warmup
+        self._timer = timer
+        self.heat = 0.0
+        self.level = 0
+        self.planned_level: Optional[int] = None
+        self.last_solve_time = 0.0
+        self.over_budget = False
+        self._tracked_at: Optional[float] = None
+        self._level_since = -math.inf
+        self._planned_at = -math.inf
+        self._planned_target: Optional[float] = None
+        self._last_update: Optional[float] = None
+
+    @property
+    def horizon_steps(self) -> int:
+        """Return the number of prediction steps."""
+        return self.block_steps * self.blocks
+
+    def track(self, level: int, now: float) -> None:
+        """Advance the lagged stove output and record the applied level.
+
+        Args:
+            level: Level applied from now on, 0 while the stove is off
+            now: Current timestamp in seconds
+        """
+        if self._tracked_at is not None and now > self._tracked_at:
+            decay = math.exp(-(now - self._tracked_at) / self._warmup)
+            self.heat = self.level + (self.heat - self.level) * decay
+        self._tracked_at = now
+        if level != self.level:
+            self.level = level
+            self._level_since = now
+            if not level:
+                self.planned_level = None
+
+    def observe(
+        self, now: float, outside: Optional[float], history: TemperatureHistory
+    ) -> bool:
+        """Feed the current trend to the stove model.
+
+        Samples are taken at most every MODEL_UPDATE_INTERVAL seconds, and
+        only while the stove has held its level for the whole history window.
+
+        Returns:
+            bool: True if a sample was added
+        """
+        if (
+            outside is None
+            or not self.level
+            or (
+                self._last_update is not None
+                and now - self._last_update < MODEL_UPDATE_INTERVAL
+            )
+        ):
+            return False
+        slope = history.slope
+        if (
+            slope is None
+            or history.span < history.window / 2
+            or now - self._level_since < history.window
+        ):
+            return False
+        # The trend is centred on the middle of the window; with the level
+        # held over the window the lagged output there is known exactly
+        self.track(self.level, now)
+        heat = self.level + (self.heat - self.level) * math.exp(
+            history.window / 2 / self._warmup
+        )
+        self._last_update = now
+        return self.model.observe(history.mean, outside, heat, slope * 3600)
+
+    @property
+    def next_plan_at(self) -> float:
+        """Return when the current plan goes stale."""
+        return self._planned_at + self.step
+
+    def due(self, now: float, target: float) -> bool:
+        """Return True if the plan is stale and should be solved again."""
+        return (
+            self.planned_level is None
+            or target != self._planned_target
+            or now - self._planned_at >= self.step
+        )
+
+    def problem(self, now: float) -> MpcProblem:
+        """Advance the stove output to ``now`` and snapshot the solve state."""
+        self.track(self.level, now)
+        a, b, c = self.model.theta
+        held = self.planned_level or min(max(self.level, self._low), self._high)
+        return MpcProblem((a, b, c), self.heat, held)
+
+    def search(
+        self,
+        problem: MpcProblem,
+        inside: float,
+        target: float,
+        outside: Sequence[float],
+        budget: Optional[float] = None,
+    ) -> MpcResult:
+        """Find the best plan for ``problem`` without changing the controller.
+
+        Args:
+            problem: State snapshot from ``problem``
+            inside: Current inside temperature
+            target: Target temperature
+            outside: Expected outside temperature for each prediction step
+            budget: Seconds the search may take, or None to run to completion
+
+        Returns:
+            MpcResult: The level for the first block and how the search went
+        """
+        started = self._timer()
+        deadline = None if budget is None else started + budget
+
+        a, b, c = problem.theta
+        start_heat = problem.heat
+        held = problem.held
+        hours = self.step / 3600
+        decay = math.exp(-self.step / self._warmup)
+        comfort = MPC_COMFORT_WEIGHT * hours
+        overshoot = (MPC_COMFORT_WEIGHT + MPC_OVERSHOOT_WEIGHT) * hours
+        block_steps = self.block_steps
+        blocks = self.blocks
+        block_fuel = MPC_FUEL_WEIGHT * block_steps * hours
+        levels = range(self._low, self._high + 1)
+        # Try the held level first, then its neighbours
+        orders = {
+            previous: sorted(levels, key=lambda level: abs(level - previous))
+            for previous in levels
+        }
+        timer = self._timer
+
+        # The inside temperature is monotonic in the stove level, so every
+        # plan stays between holding the lowest and the highest level. The
+        # least error cost within that envelope, plus the least fuel, bounds
+        # the cost of the remaining blocks of any branch.
+        steps = blocks * block_steps
+        step_bounds = [0.0] * steps
+        if 1 + hours * c > 0:
+            envelope = []
+            for level in (self._low, self._high):
+                t, h, temps = inside, start_heat, []
+                for k in range(steps):
+                    h = level + (h - level) * decay
+                    t += hours * (a + b * h + c * (t - outside[k]))
+                    temps.append(t)
+                envelope.append(temps)
+            for k, (first, second) in enumerate(zip(*envelope)):
+                low, high = min(first, second), max(first, second)
+                if high < target:
+                    step_bounds[k] = (target - high) ** 2 * comfort
+                elif low > target:
+                    step_bounds[k] = (low - target) ** 2 * overshoot
+        remaining = [0.0] * (blocks + 1)
+        for block in range(blocks - 1, -1, -1):
+            remaining[block] = (
+                remaining[block + 1]
+                + self._low * block_fuel
+                + sum(step_bounds[block * block_steps : (block + 1) * block_steps])
+            )
+
+        best_cost = math.inf
+        best_level = held
+        complete = True
+
+        def search(
+            block: int, temp: float, heat: float, previous: int, cost: float, first: int
+        ) -> None:
+            nonlocal best_cost, best_level, complete
+            if cost + remaining[block] >= best_cost:
+                return
+            if block == blocks:
+                best_cost = cost
+                best_level = first
+                return
+            if deadline is not None and timer() > deadline:
+                complete = False
+                return
+            start = block * block_steps
+            for level in orders[previous]:
+                block_cost = level * block_fuel
+                if level != previous:
+                    block_cost += MPC_SWITCH_WEIGHT
+                t, h = temp, heat
+                for k in range(start, start + block_steps):
+                    h = level + (h - level) * decay
+                    t += hours * (a + b * h + c * (t - outside[k]))
+                    error = t - target
+                    block_cost += error * error * (overshoot if error > 0 else comfort)
+                search(block + 1, t, h, level, cost + block_cost, first or level)
+                if not complete:
+                    return
+
+        # Start from the best plan holding one level for the whole horizon
+        for level in levels:
+            cost = blocks * level * block_fuel
+            if level != held:
+                cost += MPC_SWITCH_WEIGHT
+            t, h = inside, start_heat
+            for k in range(steps):
+                h = level + (h - level) * decay
+                t += hours * (a + b * h + c * (t - outside[k]))
+                error = t - target
+                cost += error * error * (overshoot if error > 0 else comfort)
+            if cost < best_cost:
+                best_cost = cost
+                best_level = level
+
+        search(0, inside, start_heat, held, 0.0, 0)
+        return MpcResult(best_level, self._timer() - started, complete)
+
+    def apply(self, now: float, target: float, result: MpcResult) -> int:
+        """Record the result of a search as the current plan.
+
+        Returns:
+            int: Stove level to apply now
+        """
+        self.last_solve_time = result.solve_time
+        self.over_budget = not result.complete or result.solve_time > self.budget
+        self.planned_level = result.level
+        self._planned_at = now
+        self._planned_target = target
+        return result.level
+
+    def solve(
+        self,
+        now: float,
+        inside: float,
+        target: float,
+        outside: Sequence[float],
+        budget: Optional[float] = None,
+    ) -> int:
+        """Plan the stove level and return the level to apply now.
+
+        Args:
+            now: Current timestamp in seconds
+            inside: Current inside temperature
+            target: Target temperature
+            outside: Expected outside temperature for each prediction step
+            budget: Seconds the solve may take, or None to run to completion
+
+        Returns:
+            int: Stove level for the first block of the best plan
+        """
+        result = self.search(self.problem(now), inside, target, outside, budget)
+        return self.apply(now, target, result)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the learned stove model for storage."""
+        return self.model.as_dict()
+
+    def load(self, data: dict[str, Any]) -> None:
+        """Restore the learned stove model from storage."""
+        self.model = StoveThermalModel.from_dict(data)
@@ -1,29 +1,113 @@
 """PID controller for pellet stove power level control."""
-from datetime import datetime
-from simple_pid import PID
+import math
+import time
+from typing import Any, Callable, Optional
+
+from .const import (
+    ON_OFF_HYSTERESIS,
+    PID_LEVEL_HYSTERESIS,
+    PID_OUTPUT_LIMITS,
+    PID_SAMPLE_JITTER,
+    PID_SAMPLE_TIME,
+)
+
+
+def on_off_level(
+    current_temp: float, target_temp: float, level: Optional[int]
+) -> int:
+    """Return the stove level of the on/off control mode.
+
+    The stove runs at medium power below the hysteresis band around the
+    target and at low power above it; within the band the current level is
+    kept.
+
+    Args:
+        current_temp: Current temperature reading
+        target_temp: Target temperature setpoint
+        level: Current stove level, None if the stove was off
+    """
+    if current_temp <= target_temp - ON_OFF_HYSTERESIS:
+        return 3  # Medium power
+    if current_temp >= target_temp + ON_OFF_HYSTERESIS:
+        return 1  # Low power
+    if level is None:
+        return 3 if current_temp < target_temp else 1
+    return level
 
 
 class PelletStovePIDController:
-    """PID controller specifically tuned for pellet stove control."""
+    """PID controller specifically tuned for pellet stove control.
+
+    The integral term is only accumulated while the output is not saturated
+    in the direction of the error (conditional integration), and the
+    derivative acts on the measurement so setpoint changes do not kick the
+    output. The clock is injectable so the controller can be stepped by the
+    simulator and tests.
+    """
+
+    __slots__ = (
+        "kp",
+        "ki",
+        "kd",
+        "_low",
+        "_high",
+        "_sample_time",
+        "_hysteresis",
+        "_time_fn",
+        "_integral",
+        "_last_input",
+        "_last_time",
+        "_output",
+        "_level",
+        "_proportional",
+        "_derivative",
+    )
 
-    def __init__(self, kp: float, ki: float, kd: float) -> None:
+    def __init__(
+        self,
+        kp: float,
+        ki: float,
+        kd: float,
+        output_limits: tuple[float, float] = PID_OUTPUT_LIMITS,
+        sample_time: float = PID_SAMPLE_TIME,
+        hysteresis: float = PID_LEVEL_HYSTERESIS,
+        time_fn: Callable[[], float] = time.monotonic,
+    ) -> None:
         """Initialize the PID controller.
 
         Args:
             kp: Proportional gain
             ki: Integral gain
             kd: Derivative gain
+            output_limits: Lowest and highest output (stove levels)
+            sample_time: Minimum seconds between updates
+            hysteresis: Extra output margin needed to change the level
+            time_fn: Clock returning seconds, replaceable for simulation
         """
-        self._pid = PID(
-            Kp=kp,
-            Ki=ki,
-            Kd=kd,
-            setpoint=0,
-            output_limits=(1, 5),  # Pellet stove levels 1-5
-            sample_time=60,  # Update every 60 seconds
-            auto_mode=True,
-        )
-        self._last_compute = datetime.now()
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self._low, self._high = output_limits
+        self._sample_time = sample_time
+        self._hysteresis = hysteresis
+        self._time_fn = time_fn
+        self.reset()
+
+    @property
+    def output(self) -> Optional[float]:
+        """Return the last computed output."""
+        return self._output
+
+    @property
+    def components(self) -> tuple[float, float, float]:
+        """Return the last proportional, integral and derivative terms."""
+        return self._proportional, self._integral, self._derivative
+
+    def set_tunings(self, kp: float, ki: float, kd: float) -> None:
+        """Change the gains without resetting the controller state."""
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
 
     def compute(self, current_temp: float, target_temp: float) -> float:
         """Compute the output power level based on current and target temperatures.
@@ -35,19 +119,110 @@ class PelletStovePIDController:
         Returns:
             float: Recommended power level (1-5)
         """
-        # Update setpoint if changed
-        if self._pid.setpoint != target_temp:
-            self._pid.setpoint = target_temp
+        now = self._time_fn()
+        if self._output is not None:
+            dt = now - self._last_time
+            # Control passes run on multiples of the sample time, so a pass
+            # a hair early must not skip a whole sample
+            if dt < self._sample_time - PID_SAMPLE_JITTER:
+                return self._output
+        else:
+            dt = 0.0
+
+        error = target_temp - current_temp
+        proportional = self.kp * error
+        derivative = 0.0
+        if dt > 0 and self._last_input is not None:
+            derivative = -self.kd * (current_temp - self._last_input) / dt
+
+        # Conditional integration: stop integrating while saturated in the
+        # direction the error would push the output
+        integral = self._integral + self.ki * error * dt
+        unclamped = proportional + integral + derivative
+        if not (
+            (unclamped > self._high and error > 0)
+            or (unclamped < self._low and error < 0)
+        ):
+            self._integral = min(max(integral, self._low), self._high)
+
+        output = proportional + self._integral + derivative
+        output = min(max(output, self._low), self._high)
+
+        self._proportional = proportional
+        self._derivative = derivative
+        self._last_input = current_temp
+        self._last_time = now
+        self._output = output
+        return output
+
+    def compute_level(self, current_temp: float, target_temp: float) -> int:
+        """Compute the discrete stove level with hysteresis between levels.
+
+        The level only changes once the output moves more than half a level
+        plus the hysteresis margin away from the current level.
+        """
+        output = self.compute(current_temp, target_temp)
+        level = self._level
+        if (
+            level is None
+            or output >= level + 0.5 + self._hysteresis
+            or output <= level - 0.5 - self._hysteresis
+        ):
+            level = int(math.floor(output + 0.5))
+            self._level = level
+        return level
 
-        # Calculate time since last compute
-        now = datetime.now()
-        dt = (now - self._last_compute).total_seconds()
-        self._last_compute = now
+    def transfer(
+        self, current_temp: float, target_temp: float, output: Optional[float] = None
+    ) -> None:
+        """Take over control without a bump in the output.
 
-        # Only update if enough time has passed
-        if dt >= self._pid.sample_time:
-            return self._pid(current_temp)
-        return self._pid._last_output
+        The integral is back-calculated so that the next output equals
+        ``output`` (by default the last output, or the lowest level).
+
+        Args:
+            current_temp: Current temperature reading
+            target_temp: Target temperature setpoint
+            output: Output the controller should continue from
+        """
+        if output is None:
+            output = self._output if self._output is not None else self._low
+        output = min(max(output, self._low), self._high)
+        self._proportional = self.kp * (target_temp - current_temp)
+        self._integral = min(max(output - self._proportional, self._low), self._high)
+        self._derivative = 0.0
+        self._last_input = current_temp
+        self._last_time = self._time_fn()
+        self._output = output
+        self._level = int(math.floor(output + 0.5))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the controller state for storage."""
+        return {
+            "integral": self._integral,
+            "last_input": self._last_input,
+            "output": self._output,
+            "level": self._level,
+        }
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """Restore the controller state saved by ``as_dict``.
+
+        The restored output is held for one sample time, as if it had just
+        been computed.
+        """
+        self._integral = float(data["integral"])
+        self._last_input = data["last_input"]
+        self._output = data["output"]
+        self._level = data["level"]
+        self._last_time = self._time_fn()
 
     def reset(self) -> None:
-        """Reset the controller."""
\ No newline at end of file
+        """Reset the controller."""
+        self._integral = 0.0
+        self._proportional = 0.0
+        self._derivative = 0.0
+        self._last_input = None
+        self._last_time = 0.0
+        self._output = None
+        self._level = None
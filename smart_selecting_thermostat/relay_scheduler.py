@@ -0,0 +1,179 @@
+"""Short-cycle protection for the heating sources and stove level relays."""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from .const import (
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    LEVEL_MIN_DWELL,
+    MAX_LEVEL_CHANGES_PER_HOUR,
+    MINISPLIT_MIN_RUN_TIME,
+    SOURCE_MIN_RUN_TIME,
+    STOVE_MIN_OFF_TIME,
+)
+from .instrumentation import ControlLoopStats
+
+
+class RelayScheduler:
+    """Hold back source and level changes that would short-cycle the relays.
+
+    A requested change that is not allowed yet is kept as pending; a newer
+    request replaces it, so the latest wish is applied as soon as the dwell
+    times and the hourly change budget allow. The scheduler holds no Home
+    Assistant state and its clock is injectable.
+    """
+
+    def __init__(
+        self,
+        level_min_dwell: float = LEVEL_MIN_DWELL,
+        max_level_changes: int = MAX_LEVEL_CHANGES_PER_HOUR,
+        min_run_times: Optional[dict[str, float]] = None,
+        stove_min_off_time: float = STOVE_MIN_OFF_TIME,
+        stats: Optional[ControlLoopStats] = None,
+        time_fn: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            level_min_dwell: Minimum seconds between stove level changes
+            max_level_changes: Maximum stove level changes per hour
+            min_run_times: Minimum seconds each source runs once selected
+            stove_min_off_time: Minimum seconds between stove ignitions
+            stats: Statistics receiving ignition and level change counts
+            time_fn: Clock returning seconds
+        """
+        self.level_min_dwell = level_min_dwell
+        self.max_level_changes = max_level_changes
+        self.min_run_times = min_run_times or {
+            SOURCE_MINISPLIT: MINISPLIT_MIN_RUN_TIME,
+            SOURCE_PELLET: SOURCE_MIN_RUN_TIME,
+        }
+        self.stove_min_off_time = stove_min_off_time
+        self.stats = stats if stats is not None else ControlLoopStats()
+        self._time_fn = time_fn
+
+        self.source: Optional[str] = None
+        self.level: Optional[int] = None
+        self.pending_source: Optional[str] = None
+        self.pending_level: Optional[int] = None
+        self._source_since = -float("inf")
+        self._level_since = -float("inf")
+        self._stove_off_since = -float("inf")
+        self._level_changes: deque[float] = deque()
+
+    def _source_allowed_at(self, source: str) -> float:
+        """Return the earliest time the active source may change to ``source``."""
+        allowed = self._source_since + self.min_run_times.get(self.source, 0.0)
+        if source == SOURCE_PELLET:
+            allowed = max(allowed, self._stove_off_since + self.stove_min_off_time)
+        return allowed
+
+    def _level_allowed_at(self) -> float:
+        """Return the earliest time the stove level may change."""
+        allowed = self._level_since + self.level_min_dwell
+        if len(self._level_changes) >= self.max_level_changes:
+            allowed = max(allowed, self._level_changes[0] + 3600)
+        return allowed
+
+    def restore(
+        self,
+        source: Optional[str],
+        source_age: float,
+        level: Optional[int] = None,
+        level_age: float = 0.0,
+    ) -> None:
+        """Restore the active source and stove level after a restart.
+
+        Args:
+            source: Source that was active, or None if all were off
+            source_age: Seconds the source has been active
+            level: Stove level in use, or None if not known
+            level_age: Seconds the stove level has been held
+        """
+        now = self._time_fn()
+        self.source = source
+        self._source_since = now - source_age
+        if source == SOURCE_PELLET and level is not None:
+            self.level = level
+            self._level_since = now - level_age
+
+    def level_age(self) -> Optional[float]:
+        """Return the seconds the current stove level has been held, if any."""
+        if self.level is None:
+            return None
+        return self._time_fn() - self._level_since
+
+    def request_source(self, source: str) -> str:
+        """Request a source and return the source to use now."""
+        now = self._time_fn()
+        if source == self.source:
+            self.pending_source = None
+        elif now >= self._source_allowed_at(source):
+            self._switch_source(source, now)
+        else:
+            if self.source is None:
+                # Heating resumed before the stove may be lit again: bridge
+                # with the mini-split
+                self._switch_source(SOURCE_MINISPLIT, now)
+            self.pending_source = source
+            self.stats.deferred_changes += 1
+        return self.source
+
+    def _switch_source(self, source: str, now: float) -> None:
+        """Make ``source`` the active source."""
+        if self.source == SOURCE_PELLET:
+            self._stove_stopped(now)
+        elif source == SOURCE_PELLET:
+            self.stats.ignitions += 1
+        self.source = source
+        self.pending_source = None
+        self._source_since = now
+
+    def request_level(self, level: int) -> int:
+        """Request a stove level and return the level to use now."""
+        now = self._time_fn()
+        while self._level_changes and now - self._level_changes[0] >= 3600:
+            self._level_changes.popleft()
+
+        if self.level is None:
+            # First level after ignition
+            self.level = level
+            self._level_since = now
+        elif level == self.level:
+            self.pending_level = None
+        elif now >= self._level_allowed_at():
+            self.level = level
+            self.pending_level = None
+            self._level_since = now
+            self._level_changes.append(now)
+            self.stats.level_changes += 1
+        else:
+            self.pending_level = level
+            self.stats.deferred_changes += 1
+        return self.level
+
+    def stop(self) -> None:
+        """Record that all sources were turned off."""
+        if self.source == SOURCE_PELLET:
+            self._stove_stopped(self._time_fn())
+        self.source = None
+        self.pending_source = None
+        self._source_since = -float("inf")
+
+    def _stove_stopped(self, now: float) -> None:
+        """Record that the stove went out."""
+        self._stove_off_since = now
+        self.level = None
+        self.pending_level = None
+
+    def next_change_at(self) -> Optional[float]:
+        """Return when the earliest pending request can be applied, if any."""
+        times = []
+        if self.pending_source is not None:
+            times.append(self._source_allowed_at(self.pending_source))
+        if self.pending_level is not None:
+            times.append(self._level_allowed_at())
+        return min(times, default=None)
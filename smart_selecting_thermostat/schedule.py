@@ -0,0 +1,282 @@
+"""Weekly comfort schedules with optimal start."""
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Callable, NamedTuple, Optional
+
+from .const import (
+    PREHEAT_DEFAULT_LEAD,
+    PREHEAT_MARGIN,
+    PREHEAT_MAX_LEAD,
+    SCHEDULE_HORIZON,
+    SCHEDULE_REPLAN_INTERVAL,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    STOVE_WARMUP_TIME,
+)
+from .heating_model import SourceRateModels
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def _parse_days(text: str) -> list[int]:
+    """Parse days written as ``"mon-fri"``, ``"sat,sun"`` or ``"daily"``."""
+    if text == "daily":
+        return list(range(7))
+    days = []
+    for part in text.split(","):
+        if "-" in part:
+            first, last = (DAYS.index(day) for day in part.split("-"))
+            span = (last - first) % 7 + 1
+            days.extend((first + offset) % 7 for offset in range(span))
+        else:
+            days.append(DAYS.index(part))
+    return days
+
+
+def parse_schedule(text: str) -> list[tuple[int, int, float]]:
+    """Parse a weekly schedule written as ``"mon-fri 06:30=68 22:00=62; ..."``.
+
+    Each block lists days (``mon-fri``, ``sat,sun`` or ``daily``) followed by
+    ``HH:MM=temperature`` setpoints in local time, which hold until the next
+    setpoint of the week.
+
+    Returns:
+        The (weekday, minute of the day, target) steps, sorted
+
+    Raises:
+        ValueError: If the text is not a valid schedule
+    """
+    steps: dict[tuple[int, int], float] = {}
+    for block in text.lower().split(";"):
+        if not block.strip():
+            continue
+        days, *setpoints = block.split()
+        if not setpoints:
+            raise ValueError(f"No setpoints for {days}")
+        for setpoint in setpoints:
+            clock, target = setpoint.split("=")
+            hours, minutes = clock.split(":")
+            minute = int(hours) * 60 + int(minutes)
+            if not 0 <= minute < 24 * 60 or not 0 <= int(minutes) < 60:
+                raise ValueError(f"Invalid time {clock}")
+            for day in _parse_days(days):
+                if (day, minute) in steps:
+                    raise ValueError(f"Two setpoints on {DAYS[day]} at {clock}")
+                steps[(day, minute)] = float(target)
+    if not steps:
+        raise ValueError("A schedule needs at least one setpoint")
+    return sorted((day, minute, target) for (day, minute), target in steps.items())
+
+
+class ComfortSchedule:
+    """Weekly setpoint steps in local time."""
+
+    __slots__ = ("timezone", "_days")
+
+    def __init__(self, steps: list[tuple[int, int, float]], timezone: tzinfo) -> None:
+        """Initialize the schedule.
+
+        Args:
+            steps: (weekday, minute of the day, target) steps, see
+                ``parse_schedule``
+            timezone: Time zone the schedule is written in
+        """
+        self.timezone = timezone
+        self._days: list[list[tuple[int, float]]] = [[] for _ in DAYS]
+        for day, minute, target in sorted(steps):
+            self._days[day].append((minute, target))
+
+    def _steps_on(self, day: date) -> list[tuple[float, float]]:
+        """Return the (timestamp, target) steps on a local date."""
+        return [
+            (
+                datetime.combine(
+                    day, time(minute // 60, minute % 60), self.timezone
+                ).timestamp(),
+                target,
+            )
+            for minute, target in self._days[day.weekday()]
+        ]
+
+    def steps_between(self, start: float, end: float) -> list[tuple[float, float]]:
+        """Return the (timestamp, target) steps after ``start`` up to ``end``."""
+        day = datetime.fromtimestamp(start, self.timezone).date()
+        last = datetime.fromtimestamp(end, self.timezone).date()
+        steps = []
+        while day <= last:
+            steps.extend(
+                step for step in self._steps_on(day) if start < step[0] <= end
+            )
+            day += timedelta(days=1)
+        return steps
+
+    def target_at(self, timestamp: float) -> float:
+        """Return the setpoint in force at ``timestamp``."""
+        return self.steps_between(timestamp - 7 * 86400, timestamp)[-1][1]
+
+
+class ScheduleEvent(NamedTuple):
+    """A setpoint step and when to apply it so it is reached on time."""
+
+    start: float  # when the new setpoint is applied
+    at: float  # when the schedule wants the setpoint reached
+    target: float
+    source: Optional[str]  # source planned to preheat, None for any
+
+
+class OptimalStartPlanner:
+    """Precompute when each setpoint step of a schedule has to start.
+
+    For every warming step within the horizon the learned heating rate of
+    each source and the outside temperature forecast at the step give the
+    warm-up time from the previous setpoint. The mini-split is planned if
+    it makes it within the longest preheat, otherwise the stove, including
+    its warm-up; setbacks apply on time. The events are kept sorted by start
+    with a cursor, so each tick is a single bisect for the next due event.
+    Plans are refreshed every replan interval as the models and the
+    forecast change.
+    """
+
+    __slots__ = (
+        "schedule",
+        "min_outside_temp",
+        "horizon",
+        "replan_interval",
+        "max_lead",
+        "default_lead",
+        "margin",
+        "planned_at",
+        "applied",
+        "_events",
+        "_starts",
+        "_cursor",
+    )
+
+    def __init__(
+        self,
+        schedule: ComfortSchedule,
+        min_outside_temp: float,
+        horizon: float = SCHEDULE_HORIZON,
+        replan_interval: float = SCHEDULE_REPLAN_INTERVAL,
+        max_lead: float = PREHEAT_MAX_LEAD,
+        default_lead: float = PREHEAT_DEFAULT_LEAD,
+        margin: float = PREHEAT_MARGIN,
+    ) -> None:
+        """Initialize the planner.
+
+        Args:
+            schedule: Comfort schedule to follow
+            min_outside_temp: Outside temperature below which the stove is used
+            horizon: Seconds of setpoint steps planned ahead
+            replan_interval: Seconds between plans
+            max_lead: Longest preheat in seconds
+            default_lead: Preheat in seconds while the models are untrained
+            margin: Factor applied to the predicted warm-up times
+        """
+        self.schedule = schedule
+        self.min_outside_temp = min_outside_temp
+        self.horizon = horizon
+        self.replan_interval = replan_interval
+        self.max_lead = max_lead
+        self.default_lead = default_lead
+        self.margin = margin
+        self.planned_at: Optional[float] = None
+        self.applied: Optional[ScheduleEvent] = None
+        self._events: list[ScheduleEvent] = []
+        self._starts: list[float] = []
+        self._cursor = 0
+
+    def needs_plan(self, now: float) -> bool:
+        """Return True if the plan is missing or due for a refresh."""
+        return self.planned_at is None or now - self.planned_at >= self.replan_interval
+
+    @property
+    def next_event(self) -> Optional[ScheduleEvent]:
+        """Return the next event to apply, if any is planned."""
+        if self._cursor < len(self._events):
+            return self._events[self._cursor]
+        return None
+
+    def plan(
+        self,
+        now: float,
+        current_temp: Optional[float],
+        models: SourceRateModels,
+        outside_at: Callable[[float], Optional[float]],
+    ) -> None:
+        """Plan the setpoint steps of the horizon.
+
+        Args:
+            now: Current timestamp
+            current_temp: Current inside temperature, None if unknown
+            models: Learned heating rate models of both sources
+            outside_at: Forecast outside temperature at a timestamp
+        """
+        # Steps that fell due since the last plan are planned again, so a
+        # replan just after a step does not drop it before it is applied
+        since = now if self.planned_at is None else min(self.planned_at, now)
+        previous = self.schedule.target_at(since)
+        previous_at = since
+        inside = previous if current_temp is None else min(current_temp, previous)
+        events = []
+        for at, target in self.schedule.steps_between(since, now + self.horizon):
+            if target > previous:
+                start, source = self._preheat(at, inside, target, models, outside_at)
+                start = max(start, previous_at)
+            else:
+                start, source = at, None
+            events.append(ScheduleEvent(start, at, target, source))
+            # The next step warms up from this setpoint
+            previous = inside = target
+            previous_at = at
+
+        self._events = events
+        self._starts = [event.start for event in events]
+        # Steps already applied are not applied again; a step whose start
+        # moved into the past is due at once
+        applied_at = self.applied.at if self.applied is not None else -math.inf
+        self._cursor = bisect_right(events, applied_at, key=lambda event: event.at)
+        self.planned_at = now
+
+    def _preheat(
+        self,
+        at: float,
+        inside: float,
+        target: float,
+        models: SourceRateModels,
+        outside_at: Callable[[float], Optional[float]],
+    ) -> tuple[float, Optional[str]]:
+        """Return when and with which source to start warming up."""
+        outside = outside_at(at)
+        predicted = models.time_to_target(inside, outside, target)
+        minisplit_time = predicted[SOURCE_MINISPLIT]
+        pellet_time = predicted[SOURCE_PELLET]
+        cold = outside is not None and outside < self.min_outside_temp
+        if (
+            not cold
+            and minisplit_time is not None
+            and minisplit_time * self.margin <= self.max_lead
+        ):
+            return at - minisplit_time * self.margin, SOURCE_MINISPLIT
+        if pellet_time is not None:
+            lead = (pellet_time + STOVE_WARMUP_TIME) * self.margin
+            return at - min(lead, self.max_lead), SOURCE_PELLET
+        return at - self.default_lead, None
+
+    def due(self, now: float) -> Optional[ScheduleEvent]:
+        """Return the latest event that became due since the last call."""
+        index = bisect_right(self._starts, now)
+        if index <= self._cursor:
+            return None
+        self._cursor = index
+        self.applied = self._events[index - 1]
+        return self.applied
+
+    def preheating(self, now: float) -> Optional[ScheduleEvent]:
+        """Return the applied event while its setpoint is being warmed up to."""
+        if self.applied is not None and self.applied.start <= now < self.applied.at:
+            return self.applied
+        return None
@@ -0,0 +1,177 @@
+"""Diagnostic sensors for the smart thermostat control loop and relays."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Optional
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import (
+    DOMAIN,
+    CONF_PELLET_POWER_SWITCH,
+    CONF_PELLET_LEVEL_SWITCHES,
+    DATA_STATS,
+    DIAGNOSTICS_SCAN_INTERVAL,
+)
+from .instrumentation import ControlLoopStats
+
+SCAN_INTERVAL = timedelta(seconds=DIAGNOSTICS_SCAN_INTERVAL)
+
+
+@dataclass(frozen=True, kw_only=True)
+class ControlLoopSensorDescription(SensorEntityDescription):
+    """Describe a control loop statistic."""
+
+    value_fn: Callable[[ControlLoopStats], Optional[float]]
+    attributes_fn: Optional[Callable[[ControlLoopStats], dict[str, Any]]] = None
+
+
+SENSORS: tuple[ControlLoopSensorDescription, ...] = (
+    ControlLoopSensorDescription(
+        key="control_pass_p95",
+        name="Control pass latency p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda stats: stats.control_pass.percentile(0.95),
+        attributes_fn=lambda stats: {
+            "mean": stats.control_pass.mean,
+            "max": stats.control_pass.maximum,
+        },
+    ),
+    ControlLoopSensorDescription(
+        key="service_call_p95",
+        name="Service call latency p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda stats: max(
+            (
+                histogram.percentile(0.95)
+                for histogram in stats.service_calls.values()
+            ),
+            default=None,
+        ),
+        attributes_fn=lambda stats: {
+            entity_id: histogram.percentile(0.95)
+            for entity_id, histogram in stats.service_calls.items()
+        },
+    ),
+    ControlLoopSensorDescription(
+        key="control_passes",
+        name="Control passes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda stats: stats.passes,
+        attributes_fn=lambda stats: {"per_hour": round(stats.passes_per_hour, 1)},
+    ),
+    ControlLoopSensorDescription(
+        key="coalesced_events",
+        name="Coalesced events",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda stats: stats.coalesced_events,
+        attributes_fn=lambda stats: {"dropped": stats.dropped_events},
+    ),
+    ControlLoopSensorDescription(
+        key="skipped_calls",
+        name="Skipped service calls",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda stats: stats.skipped_calls,
+        attributes_fn=lambda stats: {
+            "sent": stats.sent_calls,
+            "failed": stats.failed_calls,
+        },
+    ),
+    ControlLoopSensorDescription(
+        key="relay_toggles",
+        name="Relay toggles",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda stats: stats.relay_toggles,
+    ),
+    ControlLoopSensorDescription(
+        key="stove_ignitions",
+        name="Stove ignitions",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.ignitions,
+    ),
+    ControlLoopSensorDescription(
+        key="stove_level_changes",
+        name="Stove level changes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.level_changes,
+        attributes_fn=lambda stats: {"deferred": stats.deferred_changes},
+    ),
+)
+
+
+def _relay_description(entity_id: str) -> ControlLoopSensorDescription:
+    """Describe the actuation count of one relay."""
+    return ControlLoopSensorDescription(
+        key=f"relay_actuations_{entity_id}",
+        name=f"Relay actuations {entity_id}",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.relay_actuations.get(entity_id, 0),
+    )
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback
+) -> None:
+    """Set up the control loop diagnostic sensors."""
+    stats = hass.data[DOMAIN][config_entry.entry_id][DATA_STATS]
+    # The options override the data entered at setup
+    config = {**config_entry.data, **config_entry.options}
+    relays = [
+        config[CONF_PELLET_POWER_SWITCH],
+        *config[CONF_PELLET_LEVEL_SWITCHES],
+    ]
+    async_add_entities(
+        ControlLoopSensor(config_entry, stats, description)
+        for description in (*SENSORS, *map(_relay_description, relays))
+    )
+
+
+class ControlLoopSensor(SensorEntity):
+    """Expose one control loop statistic."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    entity_description: ControlLoopSensorDescription
+
+    def __init__(
+        self,
+        config_entry: ConfigEntry,
+        stats: ControlLoopStats,
+        description: ControlLoopSensorDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._stats = stats
+        self._attr_name = f"Smart Thermostat {description.name}"
+        self._attr_unique_id = f"{config_entry.entry_id}_{description.key}"
+
+    @property
+    def native_value(self) -> Optional[float]:
+        """Return the current value of the statistic."""
+        return self.entity_description.value_fn(self._stats)
+
+    @property
+    def extra_state_attributes(self) -> Optional[dict[str, Any]]:
+        """Return supporting values for the statistic."""
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self._stats)
@@ -0,0 +1,288 @@
+"""Fusion of redundant temperature sensors with fault detection."""
+from __future__ import annotations
+
+import math
+from statistics import median
+from typing import Any, Callable, Iterable, Optional
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import State
+
+from .const import (
+    FUSION_GATE,
+    FUSION_HEALTH_SMOOTHING,
+    FUSION_MAX_AGE,
+    FUSION_MAX_DEVIATION,
+    FUSION_MEASUREMENT_NOISE,
+    FUSION_PROCESS_NOISE,
+    FUSION_STEP_CONFIRM,
+    SENSOR_FAULT_HEALTH,
+)
+
+
+def parse_temperature(state: Optional[State]) -> Optional[float]:
+    """Return the temperature of a sensor or weather state, or None.
+
+    Weather entities report the temperature as an attribute.
+    """
+    if state is None or state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+        return None
+    value = state.state
+    if state.domain == "weather":
+        value = state.attributes.get("temperature")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _reported(state: State) -> Optional[float]:
+    """Return when a state was last reported, None before Home Assistant 2024.4.
+
+    A report of an unchanged value moves ``last_reported`` but not
+    ``last_updated``.
+    """
+    reported = getattr(state, "last_reported", None)
+    return None if reported is None else reported.timestamp()
+
+
+class SensorTrack:
+    """Scalar Kalman filter following one sensor.
+
+    The temperature is modelled as a random walk. A reading whose innovation
+    is outside the gate is rejected as a spike, unless the readings keep
+    disagreeing for FUSION_STEP_CONFIRM seconds, in which case the change
+    is real and the filter restarts at the new value.
+    """
+
+    __slots__ = (
+        "value",
+        "variance",
+        "updated",
+        "reading",
+        "reported",
+        "available",
+        "acceptance",
+        "rejected_since",
+        "rejections",
+    )
+
+    def __init__(self) -> None:
+        """Initialize a track without readings."""
+        self.value: Optional[float] = None
+        self.variance = FUSION_MEASUREMENT_NOISE
+        self.updated = -math.inf
+        self.reading: Optional[float] = None
+        self.reported = -math.inf
+        self.available = False
+        self.acceptance = 1.0
+        self.rejected_since: Optional[float] = None
+        self.rejections = 0
+
+    def update(self, reading: Optional[float], timestamp: float) -> bool:
+        """Add a reading, None if the sensor is unavailable.
+
+        Returns:
+            bool: True if the reading was accepted
+        """
+        accepted = self._update(reading, timestamp)
+        if reading is not None:
+            self.reading = reading
+            self.reported = max(self.reported, timestamp)
+            self.acceptance += FUSION_HEALTH_SMOOTHING * (accepted - self.acceptance)
+            self.rejections += not accepted
+        return accepted
+
+    def _update(self, reading: Optional[float], timestamp: float) -> bool:
+        """Run the filter step for one reading."""
+        if reading is None:
+            self.available = False
+            return False
+        if self.value is None or not self.available:
+            self._restart(reading, timestamp)
+            return True
+
+        variance = self.variance + FUSION_PROCESS_NOISE * max(
+            timestamp - self.updated, 0.0
+        )
+        innovation = reading - self.value
+        spread = variance + FUSION_MEASUREMENT_NOISE
+        if innovation * innovation > FUSION_GATE * FUSION_GATE * spread:
+            if self.rejected_since is None:
+                self.rejected_since = timestamp
+            elif timestamp - self.rejected_since >= FUSION_STEP_CONFIRM:
+                self._restart(reading, timestamp)
+                return True
+            return False
+
+        gain = variance / spread
+        self.value += gain * innovation
+        self.variance = (1 - gain) * variance
+        self.updated = timestamp
+        self.rejected_since = None
+        return True
+
+    def _restart(self, reading: float, timestamp: float) -> None:
+        """Restart the filter at ``reading``."""
+        self.value = reading
+        self.variance = FUSION_MEASUREMENT_NOISE
+        self.updated = timestamp
+        self.available = True
+        self.rejected_since = None
+
+    def hold(self, timestamp: float) -> None:
+        """Note that the sensor still showed its last reading at ``timestamp``.
+
+        A held reading keeps the track fresh, and a rejected step that is
+        held for FUSION_STEP_CONFIRM seconds is taken as real.
+        """
+        if not self.available or self.reading is None:
+            return
+        if (
+            self.rejected_since is not None
+            and timestamp - self.rejected_since >= FUSION_STEP_CONFIRM
+        ):
+            self.update(self.reading, timestamp)
+        self.reported = max(self.reported, timestamp)
+
+    def fresh(self, now: float) -> bool:
+        """Return True if the track has a recent, available reading."""
+        return self.available and now - self.reported <= FUSION_MAX_AGE
+
+
+class SensorFusion:
+    """Fuse the sensors of one role (inside or outside) into one estimate.
+
+    Every sensor is followed by its own ``SensorTrack``, so a reading costs
+    one filter step. The estimate is the mean of the fresh tracks within
+    FUSION_MAX_DEVIATION of their median; with three or more sensors a
+    sensor stuck at or drifting to a wrong value is thereby outvoted and
+    reported as faulty. Stale sensors are left out unless no sensor is
+    fresh, in which case the last values are used.
+    """
+
+    def __init__(self, entity_ids: Iterable[str]) -> None:
+        """Initialize the fusion for ``entity_ids``."""
+        self.tracks = {entity_id: SensorTrack() for entity_id in entity_ids}
+        self.estimate: Optional[float] = None
+        self._outliers: set[str] = set()
+
+    def __contains__(self, entity_id: str) -> bool:
+        """Return True if ``entity_id`` is one of the fused sensors."""
+        return entity_id in self.tracks
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the fused sensors."""
+        return list(self.tracks)
+
+    def update(
+        self, entity_id: str, reading: Optional[float], timestamp: float
+    ) -> Optional[float]:
+        """Add a reading of one sensor and return the new estimate."""
+        if self.tracks[entity_id].update(reading, timestamp) or reading is None:
+            self.refresh(timestamp)
+        return self.estimate
+
+    def update_state(
+        self, entity_id: str, state: Optional[State], now: float
+    ) -> Optional[float]:
+        """Add the reading of a sensor state, None if the sensor is gone."""
+        if state is None:
+            timestamp = now
+        elif (timestamp := _reported(state)) is None:
+            timestamp = state.last_updated.timestamp()
+        return self.update(entity_id, parse_temperature(state), timestamp)
+
+    def refresh_states(
+        self, get_state: Callable[[str], Optional[State]], now: float
+    ) -> Optional[float]:
+        """Recompute the estimate after looking at the current sensor states.
+
+        Home Assistant sends no state change for a reading equal to the last
+        one, so a sensor whose state still shows its last reading is holding
+        steady rather than silent. Without ``last_reported`` it is taken to
+        hold it now.
+        """
+        for entity_id, track in self.tracks.items():
+            state = get_state(entity_id)
+            if state is None or parse_temperature(state) != track.reading:
+                continue
+            reported = _reported(state)
+            track.hold(now if reported is None else reported)
+        return self.refresh(now)
+
+    def refresh(self, now: float) -> Optional[float]:
+        """Recompute the estimate, dropping sensors that went stale."""
+        values = {
+            entity_id: track.value
+            for entity_id, track in self.tracks.items()
+            if track.fresh(now)
+        }
+        if not values:
+            values = {
+                entity_id: track.value
+                for entity_id, track in self.tracks.items()
+                if track.value is not None
+            }
+        if not values:
+            self.estimate = None
+            return None
+        middle = median(values.values())
+        self._outliers = {
+            entity_id
+            for entity_id, value in values.items()
+            if abs(value - middle) > FUSION_MAX_DEVIATION
+        }
+        if len(values) < 3:
+            # Two sensors that disagree cannot be told apart
+            self._outliers.clear()
+        inliers = [
+            value
+            for entity_id, value in values.items()
+            if entity_id not in self._outliers
+        ]
+        self.estimate = sum(inliers) / len(inliers)
+        return self.estimate
+
+    def sensor_health(self, entity_id: str, now: float) -> float:
+        """Return the health of one sensor between 0 and 1.
+
+        The health is the smoothed fraction of accepted readings, and 0 for
+        a stale, unavailable or outvoted sensor.
+        """
+        track = self.tracks[entity_id]
+        if not track.fresh(now) or entity_id in self._outliers:
+            return 0.0
+        return track.acceptance
+
+    def health(self, now: float) -> float:
+        """Return the mean health of the sensors."""
+        return sum(
+            self.sensor_health(entity_id, now) for entity_id in self.tracks
+        ) / len(self.tracks)
+
+    def faulty_sensors(self, now: float) -> list[str]:
+        """Return the sensors whose health is below SENSOR_FAULT_HEALTH."""
+        return [
+            entity_id
+            for entity_id in self.tracks
+            if self.sensor_health(entity_id, now) < SENSOR_FAULT_HEALTH
+        ]
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        """Return the estimate and the state of every sensor."""
+        return {
+            "estimate": self.estimate,
+            "health": self.health(now),
+            "sensors": {
+                entity_id: {
+                    "value": track.value,
+                    "age_s": now - track.reported if track.value is not None else None,
+                    "available": track.available,
+                    "health": self.sensor_health(entity_id, now),
+                    "rejections": track.rejections,
+                }
+                for entity_id, track in self.tracks.items()
+            },
+        }
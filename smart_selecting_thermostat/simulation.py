@@ -0,0 +1,505 @@
+"""Offline simulation of the smart thermostat control logic.
+
+The simulator runs the real source selection and PID code against a simple
+thermal model of the house on a virtual clock, so a whole heating season can
+be replayed in seconds without a running Home Assistant instance.
+
+Usage::
+
+    python -m smart_selecting_thermostat.simulation history.csv --target 68
+
+The input file needs a ``timestamp`` column (epoch seconds or ISO 8601) and an
+``outside_temp`` column. Optional ``inside_temp`` and ``target_temp`` columns
+replay recorded inside temperatures and setpoint changes.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+from bisect import bisect_right
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Optional, Sequence, Union
+
+from .const import (
+    DEFAULT_MIN_OUTSIDE_TEMP,
+    DEFAULT_PID_KD,
+    DEFAULT_PID_KI,
+    DEFAULT_PID_KP,
+    MODE_MPC,
+    MODE_ON_OFF,
+    MODE_PID,
+    MONITOR_INTERVAL,
+    SOURCE_MINISPLIT,
+    TARGET_TIMEOUT,
+    TEMP_HISTORY_CAPACITY,
+    TEMP_TREND_PERIOD,
+)
+from .heating_model import SourceRateModels
+from .mpc import MpcController
+from .pid_controller import PelletStovePIDController, on_off_level
+from .relay_scheduler import RelayScheduler
+from .source_selector import SourceSelector
+from .temperature_history import TemperatureHistory
+
+# Temperature at which mini-split capacity is rated
+MINISPLIT_RATING_TEMP = 47.0  # °F
+
+
+@dataclass
+class HouseModel:
+    """Lumped-capacitance thermal model of the house and both heat sources."""
+
+    heat_loss: float = 450.0  # BTU/h per °F inside-outside difference
+    thermal_mass: float = 6000.0  # BTU per °F
+    minisplit_capacity: float = 24000.0  # BTU/h at MINISPLIT_RATING_TEMP
+    minisplit_min_capacity: float = 0.4  # fraction of capacity at cutoff
+    minisplit_cutoff_temp: float = -13.0  # °F, no output below
+    minisplit_band: float = 1.0  # °F proportional band around setpoint
+    stove_output_per_level: float = 8000.0  # BTU/h
+    stove_warmup: float = 1800.0  # seconds
+    pellet_btu_per_lb: float = 6400.0  # delivered BTU per lb of pellets
+
+    def minisplit_output(self, inside: float, outside: float, setpoint: float) -> float:
+        """Return the mini-split heat output in BTU/h."""
+        if outside < self.minisplit_cutoff_temp:
+            return 0.0
+        span = MINISPLIT_RATING_TEMP - self.minisplit_cutoff_temp
+        derate = min((outside - self.minisplit_cutoff_temp) / span, 1.0)
+        capacity = self.minisplit_capacity * (
+            self.minisplit_min_capacity + (1 - self.minisplit_min_capacity) * derate
+        )
+        demand = (setpoint - inside) / self.minisplit_band + 0.5
+        return capacity * min(max(demand, 0.0), 1.0)
+
+    def stove_output(self, current: float, level: int, dt: float) -> float:
+        """Return the stove heat output in BTU/h after ``dt`` seconds."""
+        target = self.stove_output_per_level * level
+        return target + (current - target) * math.exp(-dt / self.stove_warmup)
+
+    def step(self, inside: float, outside: float, heat: float, dt: float) -> float:
+        """Return the inside temperature after ``dt`` seconds of ``heat`` BTU/h."""
+        equilibrium = outside + heat / self.heat_loss
+        decay = math.exp(-self.heat_loss * dt / 3600 / self.thermal_mass)
+        return equilibrium + (inside - equilibrium) * decay
+
+
+class TemperatureSeries:
+    """Timestamped series with linear interpolation for forward replay."""
+
+    __slots__ = ("times", "values", "_cursor")
+
+    def __init__(self, times: Sequence[float], values: Sequence[float]) -> None:
+        """Initialize the series from sorted timestamps and values."""
+        if not times or len(times) != len(values):
+            raise ValueError("Series needs matching, non-empty times and values")
+        self.times = list(times)
+        self.values = list(values)
+        self._cursor = 0
+
+    @property
+    def start(self) -> float:
+        """Return the first timestamp."""
+        return self.times[0]
+
+    @property
+    def end(self) -> float:
+        """Return the last timestamp."""
+        return self.times[-1]
+
+    def at(self, timestamp: float) -> float:
+        """Return the interpolated value at ``timestamp``.
+
+        Lookups are expected in increasing time order; the cursor only moves
+        forward, so a full replay costs O(n) overall.
+        """
+        times = self.times
+        if timestamp < times[self._cursor]:
+            self._cursor = 0
+        last = len(times) - 1
+        while self._cursor < last and times[self._cursor + 1] <= timestamp:
+            self._cursor += 1
+        index = self._cursor
+        if index == last or timestamp <= times[index]:
+            return self.values[index]
+        fraction = (timestamp - times[index]) / (times[index + 1] - times[index])
+        return self.values[index] + fraction * (
+            self.values[index + 1] - self.values[index]
+        )
+
+    def lookup(self, timestamp: float) -> float:
+        """Return the interpolated value at ``timestamp`` without the cursor.
+
+        Used for look-ahead, so forward replay keeps its cursor.
+        """
+        times = self.times
+        index = bisect_right(times, timestamp) - 1
+        if index < 0:
+            return self.values[0]
+        if index == len(times) - 1:
+            return self.values[index]
+        fraction = (timestamp - times[index]) / (times[index + 1] - times[index])
+        return self.values[index] + fraction * (
+            self.values[index + 1] - self.values[index]
+        )
+
+
+def _parse_timestamp(value: str) -> float:
+    """Parse an epoch or ISO 8601 timestamp into epoch seconds."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def load_series(path: str) -> dict[str, TemperatureSeries]:
+    """Load recorded temperature columns from a CSV or Parquet file.
+
+    Returns:
+        dict: One series per temperature column, keyed by column name
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd  # pylint: disable=import-outside-toplevel
+        except ImportError as err:
+            raise RuntimeError("Reading Parquet files requires pandas") from err
+        frame = pd.read_parquet(path)
+        rows = frame.astype(str).to_dict("records")
+    else:
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+
+    columns: dict[str, tuple[list[float], list[float]]] = {}
+    for row in sorted(rows, key=lambda row: _parse_timestamp(row["timestamp"])):
+        timestamp = _parse_timestamp(row["timestamp"])
+        for column in ("outside_temp", "inside_temp", "target_temp"):
+            value = row.get(column)
+            if value in (None, "", "nan", "unknown", "unavailable"):
+                continue
+            times, values = columns.setdefault(column, ([], []))
+            times.append(timestamp)
+            values.append(float(value))
+
+    if "outside_temp" not in columns:
+        raise ValueError(f"{path} has no outside_temp column")
+    return {name: TemperatureSeries(*data) for name, data in columns.items()}
+
+
+def synthetic_season(
+    days: int = 150,
+    mean: float = 30.0,
+    daily_swing: float = 10.0,
+    seasonal_swing: float = 15.0,
+    start: float = 0.0,
+) -> TemperatureSeries:
+    """Return an hourly outside temperature series for a synthetic winter."""
+    times = []
+    values = []
+    for hour in range(days * 24 + 1):
+        times.append(start + hour * 3600)
+        values.append(
+            mean
+            - seasonal_swing * math.sin(math.pi * hour / (days * 24))
+            - daily_swing * math.cos(2 * math.pi * (hour % 24 - 3) / 24)
+        )
+    return TemperatureSeries(times, values)
+
+
+@dataclass
+class SimulationReport:
+    """Summary of a simulation run."""
+
+    duration: float  # seconds
+    steps: int
+    source_switches: int
+    relay_actuations: int
+    service_calls: int
+    time_to_target: Optional[float]  # mean seconds, None if never reached
+    overshoot: float  # maximum °F above target after reaching it
+    comfort_error: float  # mean absolute °F error
+    pellet_lbs: float
+    minisplit_btu: float
+    stove_btu: float
+    switches: list[tuple[float, str, Optional[str]]] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        """Return the report as a plain dictionary."""
+        return asdict(self)
+
+
+class Simulator:
+    """Run the thermostat decision and PID code against a thermal model.
+
+    Source and level changes go through the same relay scheduler as in the
+    climate entity, so relay actuations match what the entity would do.
+    """
+
+    def __init__(
+        self,
+        outside: TemperatureSeries,
+        target: Union[float, TemperatureSeries] = 68.0,
+        model: Optional[HouseModel] = None,
+        control_mode: str = MODE_PID,
+        kp: float = DEFAULT_PID_KP,
+        ki: float = DEFAULT_PID_KI,
+        kd: float = DEFAULT_PID_KD,
+        min_outside_temp: float = DEFAULT_MIN_OUTSIDE_TEMP,
+        target_timeout: float = TARGET_TIMEOUT,
+        step: float = MONITOR_INTERVAL,
+        inside: Optional[TemperatureSeries] = None,
+        initial_temp: Optional[float] = None,
+        learn: bool = True,
+    ) -> None:
+        """Initialize the simulator.
+
+        Args:
+            outside: Outside temperature series
+            target: Constant target temperature or a setpoint series
+            model: Thermal model, defaults to HouseModel()
+            control_mode: Pellet stove control mode (pid, on_off or mpc)
+            kp: Proportional gain
+            ki: Integral gain
+            kd: Derivative gain
+            min_outside_temp: Outside temperature below which the stove is used
+            target_timeout: Seconds the mini-split gets to reach the target
+            step: Control tick length in seconds
+            inside: Recorded inside temperatures to replay open loop instead
+                of using the thermal model
+            initial_temp: Starting inside temperature
+            learn: Learn heating rates and use them for source selection
+        """
+        self.outside = outside
+        self.target = target
+        self.model = model or HouseModel()
+        self.control_mode = control_mode
+        self.step = step
+        self.inside = inside
+        self.now = outside.start
+        self.selector = SourceSelector(min_outside_temp, target_timeout)
+        self.pid = PelletStovePIDController(kp, ki, kd, time_fn=lambda: self.now)
+        self.mpc = MpcController() if control_mode == MODE_MPC else None
+        # Short-cycle protection on the simulator clock, as in the entity
+        self.relays = RelayScheduler(time_fn=lambda: self.now)
+        self.history = TemperatureHistory(TEMP_TREND_PERIOD, TEMP_HISTORY_CAPACITY)
+        self.rate_models = SourceRateModels() if learn else None
+        if initial_temp is None:
+            initial_temp = inside.at(self.now) if inside else self._target_at(self.now)
+        self.inside_temp = initial_temp
+
+    def _target_at(self, timestamp: float) -> float:
+        """Return the target temperature at ``timestamp``."""
+        if isinstance(self.target, TemperatureSeries):
+            return self.target.at(timestamp)
+        return self.target
+
+    def _pellet_level(self, current_temp: float, target_temp: float) -> int:
+        """Return the stove level the climate entity would command."""
+        if self.control_mode == MODE_PID:
+            return self.pid.compute_level(current_temp, target_temp)
+        if self.mpc is not None:
+            return self._mpc_level(current_temp, target_temp)
+        return on_off_level(current_temp, target_temp, self.relays.level)
+
+    def _mpc_level(self, current_temp: float, target_temp: float) -> int:
+        """Return the stove level planned with a perfect outside forecast."""
+        mpc = self.mpc
+        mpc.observe(self.now, self.outside.at(self.now), self.history)
+        if mpc.due(self.now, target_temp):
+            outside = [
+                self.outside.lookup(self.now + (k + 1) * mpc.step)
+                for k in range(mpc.horizon_steps)
+            ]
+            mpc.solve(self.now, current_temp, target_temp, outside)
+        return mpc.planned_level
+
+    def run(self, until: Optional[float] = None) -> SimulationReport:
+        """Run the simulation until ``until`` or the end of the outside series."""
+        model = self.model
+        end = self.outside.end if until is None else until
+        step = self.step
+
+        active_source = SOURCE_MINISPLIT
+        minisplit_setpoint: Optional[float] = None
+        level = 0
+        stove_heat = 0.0
+        target = self._target_at(self.now)
+        last_target_change = self.now
+        reached_at: Optional[float] = None
+        reach_times: list[float] = []
+        overshoot = 0.0
+        abs_error = 0.0
+        minisplit_btu = 0.0
+        stove_btu = 0.0
+        source_switches = 0
+        relay_actuations = 0
+        service_calls = 0
+        switches: list[tuple[float, str, Optional[str]]] = []
+        steps = 0
+        start = self.now
+        source_since = self.now
+
+        while self.now <= end:
+            outside_temp = self.outside.at(self.now)
+            if self.inside is not None:
+                self.inside_temp = self.inside.at(self.now)
+            current = self.inside_temp
+            self.history.append(self.now, current)
+
+            new_target = self._target_at(self.now)
+            if new_target != target:
+                target = new_target
+                last_target_change = self.now
+                reached_at = None
+
+            # Source selection, as in SmartThermostat._async_select_heating_source
+            predicted = None
+            if self.rate_models is not None:
+                self.rate_models.observe(
+                    active_source, source_since, self.now, outside_temp, target, self.history
+                )
+                predicted = self.rate_models.time_to_target(current, outside_temp, target)
+            selected, reason = self.selector.select(
+                active_source,
+                current,
+                target,
+                outside_temp,
+                self.history,
+                self.now - last_target_change,
+                time_to_target=predicted,
+                seconds_in_source=self.now - source_since,
+            )
+            # Hold back switches that would short-cycle a source
+            source = self.relays.request_source(selected)
+            if source != active_source:
+                source_since = self.now
+                if source != SOURCE_MINISPLIT and self.control_mode == MODE_PID:
+                    self.pid.transfer(current, target)
+                active_source = source
+                source_switches += 1
+                switches.append((self.now, source, reason))
+
+            # Actuation, counting only calls the actuator layer would send
+            if active_source == SOURCE_MINISPLIT:
+                if minisplit_setpoint != target:
+                    minisplit_setpoint = target
+                    service_calls += 1
+                if level:
+                    # Stove level and power switches off in one call
+                    level = 0
+                    service_calls += 1
+                    relay_actuations += 1
+                    if self.mpc is not None:
+                        self.mpc.track(0, self.now)
+            else:
+                new_level = self.relays.request_level(
+                    self._pellet_level(current, target)
+                )
+                if new_level != level:
+                    if level:
+                        service_calls += 1
+                        relay_actuations += 1
+                    service_calls += 1
+                    relay_actuations += 1
+                    level = new_level
+                    if self.mpc is not None:
+                        self.mpc.track(level, self.now)
+
+            # Comfort metrics
+            error = current - target
+            abs_error += abs(error)
+            if reached_at is None and error >= 0:
+                reached_at = self.now
+                reach_times.append(self.now - last_target_change)
+            if reached_at is not None:
+                overshoot = max(overshoot, error)
+
+            # Plant update
+            minisplit_heat = (
+                model.minisplit_output(current, outside_temp, minisplit_setpoint)
+                if minisplit_setpoint is not None
+                else 0.0
+            )
+            stove_heat = model.stove_output(stove_heat, level, step)
+            minisplit_btu += minisplit_heat * step / 3600
+            stove_btu += stove_heat * step / 3600
+            if self.inside is None:
+                self.inside_temp = model.step(
+                    current, outside_temp, minisplit_heat + stove_heat, step
+                )
+
+            self.now += step
+            steps += 1
+
+        return SimulationReport(
+            duration=self.now - start,
+            steps=steps,
+            source_switches=source_switches,
+            relay_actuations=relay_actuations,
+            service_calls=service_calls,
+            time_to_target=(
+                sum(reach_times) / len(reach_times) if reach_times else None
+            ),
+            overshoot=overshoot,
+            comfort_error=abs_error / steps if steps else 0.0,
+            pellet_lbs=stove_btu / model.pellet_btu_per_lb,
+            minisplit_btu=minisplit_btu,
+            stove_btu=stove_btu,
+            switches=switches,
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Run a simulation from the command line and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", nargs="?", help="CSV or Parquet file to replay")
+    parser.add_argument("--days", type=int, default=150, help="Synthetic season length")
+    parser.add_argument("--target", type=float, default=68.0)
+    parser.add_argument(
+        "--mode", choices=[MODE_PID, MODE_ON_OFF, MODE_MPC], default=MODE_PID
+    )
+    parser.add_argument("--kp", type=float, default=DEFAULT_PID_KP)
+    parser.add_argument("--ki", type=float, default=DEFAULT_PID_KI)
+    parser.add_argument("--kd", type=float, default=DEFAULT_PID_KD)
+    parser.add_argument("--min-outside-temp", type=float, default=DEFAULT_MIN_OUTSIDE_TEMP)
+    parser.add_argument("--target-timeout", type=float, default=TARGET_TIMEOUT)
+    parser.add_argument("--step", type=float, default=MONITOR_INTERVAL)
+    parser.add_argument(
+        "--no-learning",
+        action="store_true",
+        help="Select sources with the fixed heuristics only",
+    )
+    parser.add_argument(
+        "--open-loop",
+        action="store_true",
+        help="Replay the recorded inside_temp column instead of the thermal model",
+    )
+    args = parser.parse_args(argv)
+
+    if args.path:
+        series = load_series(args.path)
+    else:
+        series = {"outside_temp": synthetic_season(args.days)}
+    simulator = Simulator(
+        series["outside_temp"],
+        target=series.get("target_temp", args.target),
+        control_mode=args.mode,
+        kp=args.kp,
+        ki=args.ki,
+        kd=args.kd,
+        min_outside_temp=args.min_outside_temp,
+        target_timeout=args.target_timeout,
+        step=args.step,
+        inside=series.get("inside_temp") if args.open_loop else None,
+        learn=not args.no_learning,
+    )
+    report = simulator.run()
+    for key, value in report.as_dict().items():
+        if key != "switches":
+            print(f"{key}: {value}")
+    for timestamp, source, reason in report.switches:
+        print(f"switch at {timestamp:.0f}: {source} ({reason})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Heating source selection logic for the smart thermostat."""
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+from .const import (
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    REASON_TEMP_TOO_LOW,
+    REASON_TEMP_DECREASING,
+    REASON_NOT_REACHING_TARGET,
+    REASON_WEATHER_FORECAST,
+    REASON_MINISPLIT_ADEQUATE,
+    REASON_PELLET_CHEAPER,
+    REASON_MINISPLIT_CHEAPER,
+    REASON_OPTIMAL_START,
+    SOURCE_MIN_RUN_TIME,
+    TARGET_TIMEOUT,
+    TEMP_TREND_SAMPLES,
+    TEMP_TREND_MIN_RATE,
+)
+from .temperature_history import TemperatureHistory
+
+
+class SourceSelector:
+    """Choose between the mini-split and the pellet stove.
+
+    The selector holds no Home Assistant state, so the same decision code is
+    used by the climate entity and by the offline simulator.
+    """
+
+    def __init__(
+        self, min_outside_temp: float, target_timeout: float = TARGET_TIMEOUT
+    ) -> None:
+        """Initialize the selector.
+
+        Args:
+            min_outside_temp: Outside temperature below which the stove is used
+            target_timeout: Seconds the mini-split gets to reach the target
+        """
+        self.min_outside_temp = min_outside_temp
+        self.target_timeout = target_timeout
+
+    def select(
+        self,
+        active_source: str,
+        current_temp: Optional[float],
+        target_temp: float,
+        outside_temp: Optional[float],
+        history: TemperatureHistory,
+        seconds_since_target_change: float,
+        forecast_source: Optional[str] = None,
+        time_to_target: Optional[dict[str, Optional[float]]] = None,
+        seconds_in_source: float = math.inf,
+        cost_source: Optional[str] = None,
+        preheat_source: Optional[str] = None,
+    ) -> tuple[str, Optional[str]]:
+        """Select the heating source.
+
+        Args:
+            active_source: Currently active heating source
+            current_temp: Current inside temperature
+            target_temp: Target temperature setpoint
+            outside_temp: Current outside temperature, None if unknown
+            history: Recent inside temperature history
+            seconds_since_target_change: Seconds since the target last changed
+            forecast_source: Source scheduled from the weather forecast, if any
+            time_to_target: Predicted seconds to reach the target per source,
+                None for sources without a trained model
+            seconds_in_source: Seconds since the active source was selected
+            cost_source: Source with the lower heat cost, None if unknown
+            preheat_source: Source planned to warm up to a scheduled setpoint
+                on time, None outside of a preheat
+
+        Returns:
+            tuple: The selected source and the reason for a switch, or None
+            as the reason if the active source is kept
+        """
+        # Check outside temperature
+        if outside_temp is not None and outside_temp < self.min_outside_temp:
+            if active_source != SOURCE_PELLET:
+                return SOURCE_PELLET, REASON_TEMP_TOO_LOW
+
+        # Follow the forecast schedule, e.g. to pre-light the stove
+        if forecast_source is not None and forecast_source != active_source:
+            return forecast_source, REASON_WEATHER_FORECAST
+
+        # Light the stove early enough to reach a scheduled setpoint on time
+        if preheat_source == SOURCE_PELLET and active_source != SOURCE_PELLET:
+            return SOURCE_PELLET, REASON_OPTIMAL_START
+
+        predicted = time_to_target or {}
+        minisplit_time = predicted.get(SOURCE_MINISPLIT)
+        pellet_time = predicted.get(SOURCE_PELLET)
+
+        # Prefer the cheaper source; the mini-split only takes over again
+        # once the stove has run its minimum time and the mini-split copes
+        if cost_source == SOURCE_PELLET and active_source != SOURCE_PELLET:
+            return SOURCE_PELLET, REASON_PELLET_CHEAPER
+        if (
+            cost_source == SOURCE_MINISPLIT
+            and active_source != SOURCE_MINISPLIT
+            and forecast_source is None
+            and preheat_source is None
+            and outside_temp is not None
+            and outside_temp >= self.min_outside_temp
+            and (minisplit_time is None or minisplit_time <= self.target_timeout)
+            and seconds_in_source >= SOURCE_MIN_RUN_TIME
+        ):
+            return SOURCE_MINISPLIT, REASON_MINISPLIT_CHEAPER
+
+        if active_source != SOURCE_MINISPLIT:
+            # Switch back once the mini-split is predicted to cope again,
+            # with a margin so the decision does not flap
+            if (
+                minisplit_time is not None
+                and forecast_source is None
+                and preheat_source is None
+                and cost_source != SOURCE_PELLET
+                and outside_temp is not None
+                and outside_temp >= self.min_outside_temp
+                and minisplit_time <= self.target_timeout / 2
+                and seconds_in_source >= SOURCE_MIN_RUN_TIME
+            ):
+                return SOURCE_MINISPLIT, REASON_MINISPLIT_ADEQUATE
+            return active_source, None
+
+        # Check temperature trend while using the mini-split and below target
+        slope = history.slope
+        if (
+            current_temp < target_temp
+            and seconds_in_source >= history.window
+            and len(history) >= TEMP_TREND_SAMPLES
+            and history.span >= history.window / 2
+            and slope is not None
+            and slope * 3600 < -TEMP_TREND_MIN_RATE
+        ):
+            return SOURCE_PELLET, REASON_TEMP_DECREASING
+
+        # Use the learned models when available: stay on the cheaper
+        # mini-split unless it is too slow and the stove would be faster
+        if minisplit_time is not None:
+            if minisplit_time > self.target_timeout and (
+                pellet_time is None or pellet_time < minisplit_time
+            ):
+                return SOURCE_PELLET, REASON_NOT_REACHING_TARGET
+            return active_source, None
+
+        # Check if target temperature is being reached
+        if (
+            seconds_since_target_change > self.target_timeout
+            and current_temp < target_temp
+        ):
+            return SOURCE_PELLET, REASON_NOT_REACHING_TARGET
+
+        return active_source, None
@@ -0,0 +1,267 @@
+"""Multi-resolution rollups of the control loop for long-term statistics."""
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Any, Iterator, NamedTuple, Optional, Sequence
+
+from .const import (
+    DOMAIN,
+    TELEMETRY_DAYS,
+    TELEMETRY_HOURS,
+    TELEMETRY_MAX_GAP,
+    TELEMETRY_MINUTES,
+)
+
+
+class Channel(NamedTuple):
+    """A quantity of the control loop that is rolled up."""
+
+    key: str
+    name: str
+    unit: Optional[str]
+
+
+CHANNELS = (
+    Channel("inside_temperature", "inside temperature", "°F"),
+    Channel("outside_temperature", "outside temperature", "°F"),
+    # A temperature difference: with a °F unit the statistics would convert
+    # it like an absolute temperature
+    Channel("setpoint_error", "setpoint error (°F)", None),
+    Channel("stove_level", "stove level", None),
+    Channel("pellet_stove_duty", "pellet stove duty cycle", "%"),
+    Channel("minisplit_duty", "mini-split duty cycle", "%"),
+)
+
+
+class Rollup(NamedTuple):
+    """Time-weighted mean, min and max of each channel over one period."""
+
+    start: float
+    values: dict[str, tuple[float, float, float]]  # channel: mean, min, max
+
+
+class RollupRing:
+    """Fixed-size circular buffer of rollups at one resolution.
+
+    Each period maps to a slot by its number modulo the capacity, so adding
+    to the current period is O(1) and a slot is reused once its period is
+    older than the capacity. The sums, weights and extremes of all channels
+    live in flat arrays of doubles, so the memory is fixed at construction.
+    """
+
+    __slots__ = (
+        "resolution",
+        "capacity",
+        "latest",
+        "_starts",
+        "_weights",
+        "_sums",
+        "_mins",
+        "_maxs",
+    )
+
+    def __init__(self, resolution: float, capacity: int) -> None:
+        """Initialize an empty ring.
+
+        Args:
+            resolution: Seconds per rollup, periods are aligned to the epoch
+            capacity: Number of rollups kept
+        """
+        size = capacity * len(CHANNELS)
+        self.resolution = resolution
+        self.capacity = capacity
+        self.latest: Optional[float] = None
+        self._starts = array("d", [math.nan]) * capacity
+        self._weights = array("d", bytes(8 * size))
+        self._sums = array("d", bytes(8 * size))
+        self._mins = array("d", bytes(8 * size))
+        self._maxs = array("d", bytes(8 * size))
+
+    def _slot(self, start: float) -> int:
+        """Return the slot of the period starting at ``start``, claiming it."""
+        slot = int(start // self.resolution) % self.capacity
+        if self._starts[slot] != start:
+            self._starts[slot] = start
+            base = slot * len(CHANNELS)
+            for index in range(base, base + len(CHANNELS)):
+                self._weights[index] = 0.0
+                self._sums[index] = 0.0
+        if self.latest is None or start > self.latest:
+            self.latest = start
+        return slot
+
+    def add(
+        self, start: float, end: float, values: Sequence[Optional[float]]
+    ) -> None:
+        """Add ``values``, held from ``start`` to ``end``, split per period.
+
+        Args:
+            start: Timestamp the values were read
+            end: Timestamp they were replaced
+            values: Value of each channel, None where it is unknown
+        """
+        while start < end:
+            period = start - start % self.resolution
+            stop = min(end, period + self.resolution)
+            weight = stop - start
+            base = self._slot(period) * len(CHANNELS)
+            for index, value in enumerate(values, base):
+                if value is None:
+                    continue
+                if self._weights[index] == 0.0:
+                    self._mins[index] = self._maxs[index] = value
+                else:
+                    self._mins[index] = min(self._mins[index], value)
+                    self._maxs[index] = max(self._maxs[index], value)
+                self._weights[index] += weight
+                self._sums[index] += value * weight
+            start = stop
+
+    def rollup(self, start: float) -> Optional[Rollup]:
+        """Return the rollup of the period starting at ``start``, if kept."""
+        slot = int(start // self.resolution) % self.capacity
+        if self._starts[slot] != start:
+            return None
+        base = slot * len(CHANNELS)
+        values = {}
+        for index, channel in enumerate(CHANNELS, base):
+            if (weight := self._weights[index]) > 0.0:
+                values[channel.key] = (
+                    self._sums[index] / weight,
+                    self._mins[index],
+                    self._maxs[index],
+                )
+        return Rollup(start, values)
+
+    def rollups(
+        self, since: float = -math.inf, until: float = math.inf
+    ) -> Iterator[Rollup]:
+        """Yield the kept rollups starting in [since, until), oldest first."""
+        if self.latest is None:
+            return
+        first = self.latest - (self.capacity - 1) * self.resolution
+        for offset in range(self.capacity):
+            start = first + offset * self.resolution
+            if since <= start < until and (rollup := self.rollup(start)) is not None:
+                yield rollup
+
+
+class ControlTelemetry:
+    """Per-minute, per-hour and per-day rollups of one zone.
+
+    Each reading of the zone is held until the next one and added to all
+    three rings weighted by how long it was held, so the means are time
+    weighted however irregular the control passes are. A reading held
+    longer than the maximum gap, for example across a restart, is dropped
+    rather than stretched. Hours are handed out once they are complete, for
+    the long-term statistics.
+    """
+
+    __slots__ = (
+        "minutes",
+        "hours",
+        "days",
+        "max_gap",
+        "_last_time",
+        "_last_values",
+        "_published_until",
+    )
+
+    def __init__(
+        self,
+        minutes: int = TELEMETRY_MINUTES,
+        hours: int = TELEMETRY_HOURS,
+        days: int = TELEMETRY_DAYS,
+        max_gap: float = TELEMETRY_MAX_GAP,
+    ) -> None:
+        """Initialize empty rollups.
+
+        Args:
+            minutes: Per-minute rollups kept
+            hours: Per-hour rollups kept
+            days: Per-day rollups kept
+            max_gap: Longest seconds a reading is held
+        """
+        self.minutes = RollupRing(60, minutes)
+        self.hours = RollupRing(3600, hours)
+        self.days = RollupRing(86400, days)
+        self.max_gap = max_gap
+        self._last_time: Optional[float] = None
+        self._last_values: Sequence[Optional[float]] = ()
+        self._published_until: Optional[float] = None
+
+    def observe(self, now: float, values: Sequence[Optional[float]]) -> list[Rollup]:
+        """Add a reading and return the hours completed since the last one.
+
+        Args:
+            now: Timestamp of the reading
+            values: Value of each channel in CHANNELS order, None if unknown
+
+        Returns:
+            The rollups of the hours that ended, oldest first
+        """
+        last = self._last_time
+        if last is not None and 0.0 < now - last <= self.max_gap:
+            for ring in (self.minutes, self.hours, self.days):
+                ring.add(last, now, self._last_values)
+        if last is None or now > last:
+            self._last_time = now
+            self._last_values = tuple(values)
+
+        hour = now - now % 3600
+        if self._published_until is None:
+            self._published_until = hour
+        if hour <= self._published_until:
+            return []
+        completed = list(self.hours.rollups(self._published_until, hour))
+        self._published_until = hour
+        return [rollup for rollup in completed if rollup.values]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all kept rollups for the diagnostics."""
+        return {
+            name: [
+                {"start": rollup.start, **rollup.values}
+                for rollup in ring.rollups()
+                if rollup.values
+            ]
+            for name, ring in (
+                ("minute", self.minutes),
+                ("hour", self.hours),
+                ("day", self.days),
+            )
+        }
+
+
+def statistics(
+    object_id: str, name: str, rollups: Sequence[Rollup]
+) -> Iterator[tuple[dict[str, Any], list[dict[str, Any]]]]:
+    """Yield the metadata and hourly rows of each channel for the recorder.
+
+    The rows are ready for ``async_add_external_statistics`` once their
+    ``start`` timestamps are turned into datetimes.
+
+    Args:
+        object_id: Object id of the zone's climate entity
+        name: Name of the zone
+        rollups: Hourly rollups
+    """
+    for channel in CHANNELS:
+        rows = []
+        for rollup in rollups:
+            if (stats := rollup.values.get(channel.key)) is not None:
+                mean, low, high = stats
+                rows.append(
+                    {"start": rollup.start, "mean": mean, "min": low, "max": high}
+                )
+        if rows:
+            metadata = {
+                "has_mean": True,
+                "has_sum": False,
+                "name": f"{name} {channel.name}",
+                "source": DOMAIN,
+                "statistic_id": f"{DOMAIN}:{object_id}_{channel.key}",
+                "unit_of_measurement": channel.unit,
+            }
+            yield metadata, rows
@@ -0,0 +1,218 @@
+"""Time-windowed temperature history with running trend statistics."""
+from __future__ import annotations
+
+import base64
+from array import array
+from typing import Iterator, Optional
+
+
+class TemperatureHistory:
+    """Fixed-capacity ring buffer of timestamped temperature samples.
+
+    Samples older than ``window`` seconds are evicted as new ones arrive or
+    when the history is trimmed to the current time, and running sums are
+    kept so that the mean, variance and least-squares slope are available in
+    O(1) without rescanning the buffer.
+    """
+
+    __slots__ = (
+        "_window",
+        "_capacity",
+        "_times",
+        "_values",
+        "_head",
+        "_count",
+        "_origin",
+        "_sum_t",
+        "_sum_y",
+        "_sum_tt",
+        "_sum_ty",
+        "_sum_yy",
+    )
+
+    def __init__(self, window: float, capacity: int) -> None:
+        """Initialize the history.
+
+        Args:
+            window: Length of the history window in seconds
+            capacity: Maximum number of samples kept
+        """
+        self._window = float(window)
+        self._capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._head = 0
+        self._count = 0
+        self._origin = 0.0
+        self._reset_sums()
+
+    def _reset_sums(self) -> None:
+        """Zero the running sums."""
+        self._sum_t = 0.0
+        self._sum_y = 0.0
+        self._sum_tt = 0.0
+        self._sum_ty = 0.0
+        self._sum_yy = 0.0
+
+    def _add(self, t: float, y: float) -> None:
+        """Add a sample, relative to the origin, to the running sums."""
+        self._sum_t += t
+        self._sum_y += y
+        self._sum_tt += t * t
+        self._sum_ty += t * y
+        self._sum_yy += y * y
+
+    def _remove(self, t: float, y: float) -> None:
+        """Remove a sample, relative to the origin, from the running sums."""
+        self._sum_t -= t
+        self._sum_y -= y
+        self._sum_tt -= t * t
+        self._sum_ty -= t * y
+        self._sum_yy -= y * y
+
+    def _evict_oldest(self) -> None:
+        """Drop the oldest sample."""
+        self._remove(self._times[self._head], self._values[self._head])
+        self._head = (self._head + 1) % self._capacity
+        self._count -= 1
+
+    def _rebase(self, origin: float) -> None:
+        """Move the time origin and recompute the sums from the buffer.
+
+        Keeping timestamps small relative to the origin bounds the rounding
+        error of the running sums. This runs at most once per window, so the
+        amortized cost per sample stays O(1).
+        """
+        shift = origin - self._origin
+        self._origin = origin
+        self._reset_sums()
+        for offset in range(self._count):
+            index = (self._head + offset) % self._capacity
+            self._times[index] -= shift
+            self._add(self._times[index], self._values[index])
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Add a sample and evict samples that fell out of the window."""
+        if self._count == 0:
+            self._origin = timestamp
+            self._reset_sums()
+        elif timestamp - self._origin > 2 * self._window:
+            self._rebase(timestamp - self._window)
+
+        t = timestamp - self._origin
+        if self._count == self._capacity:
+            self._evict_oldest()
+        index = (self._head + self._count) % self._capacity
+        self._times[index] = t
+        self._values[index] = value
+        self._count += 1
+        self._add(t, value)
+
+        cutoff = t - self._window
+        while self._count > 1 and self._times[self._head] < cutoff:
+            self._evict_oldest()
+
+    def trim(self, now: float) -> None:
+        """Evict samples that fell out of the window before ``now``.
+
+        Home Assistant only reports a sensor when its value changes, so a
+        quiet sensor appends nothing and the window would otherwise still
+        describe readings from long ago. The newest sample is kept: it is
+        still the current value, but on its own it has no trend.
+        """
+        if self._count == 0:
+            return
+        cutoff = now - self._origin - self._window
+        while self._count > 1 and self._times[self._head] < cutoff:
+            self._evict_oldest()
+
+    def pack(self) -> str:
+        """Return the samples as base64 encoded (timestamp, value) doubles."""
+        samples = array("d")
+        for timestamp, value in self:
+            samples.extend((timestamp, value))
+        return base64.b64encode(samples.tobytes()).decode("ascii")
+
+    def unpack(self, data: str, now: Optional[float] = None) -> None:
+        """Append samples returned by ``pack``.
+
+        Args:
+            data: Packed samples
+            now: Current time; samples older than the window are skipped
+        """
+        samples = array("d", base64.b64decode(data))
+        for index in range(0, len(samples) - 1, 2):
+            timestamp = samples[index]
+            if now is None or now - timestamp <= self._window:
+                self.append(timestamp, samples[index + 1])
+
+    def clear(self) -> None:
+        """Remove all samples."""
+        self._head = 0
+        self._count = 0
+        self._reset_sums()
+
+    def __len__(self) -> int:
+        """Return the number of samples in the window."""
+        return self._count
+
+    def __iter__(self) -> Iterator[tuple[float, float]]:
+        """Iterate over (timestamp, value) pairs from oldest to newest."""
+        for offset in range(self._count):
+            index = (self._head + offset) % self._capacity
+            yield self._times[index] + self._origin, self._values[index]
+
+    @property
+    def window(self) -> float:
+        """Return the window length in seconds."""
+        return self._window
+
+    @property
+    def latest(self) -> Optional[float]:
+        """Return the newest value."""
+        if self._count == 0:
+            return None
+        return self._values[(self._head + self._count - 1) % self._capacity]
+
+    @property
+    def latest_time(self) -> Optional[float]:
+        """Return the timestamp of the newest sample."""
+        if self._count == 0:
+            return None
+        newest = (self._head + self._count - 1) % self._capacity
+        return self._times[newest] + self._origin
+
+    @property
+    def span(self) -> float:
+        """Return the seconds between the oldest and newest sample."""
+        if self._count < 2:
+            return 0.0
+        newest = (self._head + self._count - 1) % self._capacity
+        return self._times[newest] - self._times[self._head]
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Return the mean value in the window."""
+        if self._count == 0:
+            return None
+        return self._sum_y / self._count
+
+    @property
+    def variance(self) -> Optional[float]:
+        """Return the population variance of the values in the window."""
+        if self._count == 0:
+            return None
+        mean = self._sum_y / self._count
+        return max(self._sum_yy / self._count - mean * mean, 0.0)
+
+    @property
+    def slope(self) -> Optional[float]:
+        """Return the least-squares slope in degrees per second."""
+        if self._count < 2:
+            return None
+        n = self._count
+        s_tt = self._sum_tt - self._sum_t * self._sum_t / n
+        if s_tt <= 0:
+            return None
+        s_ty = self._sum_ty - self._sum_t * self._sum_y / n
+        return s_ty / s_tt
@@ -0,0 +1,119 @@
+"""Adaptive control tick interval for the smart thermostat."""
+from __future__ import annotations
+
+import math
+from typing import Iterable, Optional
+
+from .const import (
+    PID_SAMPLE_TIME,
+    TICK_FLAT_RATE,
+    TICK_MAX_INTERVAL,
+    TICK_MIN_INTERVAL,
+    TICK_SETTLED_BAND,
+)
+
+
+class TickScheduler:
+    """Choose the delay until the next periodic control pass of a zone.
+
+    The zone is ticked at the minimum interval during transitions and while
+    it is outside the settled band around the target. Once settled, the
+    interval is the time the current trend needs to carry the temperature
+    out of the band, halved for margin, and grows by at most a factor of two
+    per pass so it backs off gradually. Intervals are whole multiples of the
+    PID sample time, so every tick finds a new PID output due, and known
+    deadlines (a forecast boundary, a timeout) are never slept through.
+
+    Sensor changes still trigger passes right away; the ticks only cover
+    decisions that depend on time passing. The scheduler holds no Home
+    Assistant state.
+    """
+
+    __slots__ = (
+        "min_interval",
+        "max_interval",
+        "quantum",
+        "settled_band",
+        "flat_rate",
+        "interval",
+    )
+
+    def __init__(
+        self,
+        min_interval: float = TICK_MIN_INTERVAL,
+        max_interval: float = TICK_MAX_INTERVAL,
+        quantum: float = PID_SAMPLE_TIME,
+        settled_band: float = TICK_SETTLED_BAND,
+        flat_rate: float = TICK_FLAT_RATE,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            min_interval: Seconds between ticks during transitions
+            max_interval: Longest seconds between ticks once settled
+            quantum: Intervals are multiples of this, e.g. the PID sample time
+            settled_band: °F around the target within which the zone is settled
+            flat_rate: °F per hour below which the trend counts as flat
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.quantum = quantum
+        self.settled_band = settled_band
+        self.flat_rate = flat_rate
+        self.interval = min_interval
+
+    def _quantize(self, interval: float) -> float:
+        """Round an interval down to a whole number of quanta."""
+        if self.quantum <= 0:
+            return interval
+        return max(math.floor(interval / self.quantum), 1) * self.quantum
+
+    def next_interval(
+        self,
+        error: Optional[float],
+        slope: Optional[float],
+        transition: bool = False,
+        deadlines: Iterable[float] = (),
+        max_interval: Optional[float] = None,
+    ) -> float:
+        """Return the seconds until the next tick and remember them.
+
+        Args:
+            error: Inside minus target temperature, None if unknown
+            slope: Inside temperature trend in °F per second, None if unknown
+            transition: True during a source switch, stove ignition or a
+                held back relay change
+            deadlines: Seconds until decisions that are due at a known time
+            max_interval: Longest interval for this pass, e.g. the sample
+                time of a controller that must run at its own rate
+        """
+        if transition or error is None:
+            interval = self.min_interval
+        else:
+            margin = self.settled_band - abs(error)
+            if margin <= 0:
+                # Approaching or correcting towards the target
+                interval = self.min_interval
+            else:
+                rate = max(abs(slope or 0.0), self.flat_rate / 3600)
+                interval = min(
+                    margin / rate / 2,
+                    self.interval * 2,
+                    self.max_interval if max_interval is None else max_interval,
+                )
+                interval = self._quantize(max(interval, self.min_interval))
+
+        for deadline in deadlines:
+            if deadline > 0:
+                # Wake just after the deadline so the decision is due
+                interval = min(
+                    interval, max(math.ceil(deadline) + 1, self.min_interval)
+                )
+
+        self.interval = interval
+        return interval
+
+    def idle(self) -> float:
+        """Return the interval while the zone is off, and remember it."""
+        self.interval = self.max_interval
+        return self.interval
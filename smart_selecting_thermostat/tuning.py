@@ -0,0 +1,357 @@
+"""Batch parameter sweep for PID gains and source switching thresholds.
+
+Every parameter combination is simulated at once with NumPy arrays, one
+element per combination, using the same thermal model, selection rules and
+PID update as the simulation module (without the learned heating rate
+models, so thresholds are compared on their own). Stove level changes keep
+the relay scheduler's minimum dwell and hourly budget. The grid is split
+across a process pool and the results are ranked by comfort error, pellet
+consumption and relay cycles.
+
+Usage::
+
+    python -m smart_selecting_thermostat.tuning history.csv --target 68
+
+Requires NumPy, which is not needed by the integration itself.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .const import (
+    CONF_MIN_OUTSIDE_TEMP,
+    CONF_PID_KD,
+    CONF_PID_KI,
+    CONF_PID_KP,
+    CONF_TARGET_TIMEOUT,
+    LEVEL_MIN_DWELL,
+    MAX_LEVEL_CHANGES_PER_HOUR,
+    MINISPLIT_MIN_RUN_TIME,
+    MODE_ON_OFF,
+    MODE_PID,
+    MONITOR_INTERVAL,
+    ON_OFF_HYSTERESIS,
+    PID_LEVEL_HYSTERESIS,
+    PID_OUTPUT_LIMITS,
+    PID_SAMPLE_TIME,
+    TEMP_TREND_MIN_RATE,
+    TEMP_TREND_PERIOD,
+    TEMP_TREND_SAMPLES,
+)
+from .simulation import MINISPLIT_RATING_TEMP, HouseModel, load_series, synthetic_season
+
+PARAMETERS = ("kp", "ki", "kd", "min_outside_temp", "target_timeout")
+METRICS = ("comfort_error", "pellet_lbs", "relay_cycles")
+
+# Default search ranges
+DEFAULT_GRID = {
+    "kp": (0.25, 0.5, 1.0, 2.0, 4.0),
+    "ki": (0.0, 0.01, 0.05, 0.1, 0.2),
+    "kd": (0.0, 0.05, 0.5, 2.0),
+    "min_outside_temp": (20.0, 25.0, 30.0, 35.0, 40.0),
+    "target_timeout": (900.0, 1800.0, 3600.0),
+}
+
+
+def build_grid(ranges: dict[str, Sequence[float]]) -> dict[str, np.ndarray]:
+    """Return the cartesian product of parameter ranges as flat arrays."""
+    combos = np.array(list(itertools.product(*(ranges[p] for p in PARAMETERS))))
+    return {name: combos[:, i].astype(float) for i, name in enumerate(PARAMETERS)}
+
+
+def evaluate(
+    outside: np.ndarray,
+    target: float,
+    params: dict[str, np.ndarray],
+    model: Optional[HouseModel] = None,
+    step: float = MONITOR_INTERVAL,
+    control_mode: str = MODE_PID,
+) -> dict[str, np.ndarray]:
+    """Simulate all parameter combinations against one outside series.
+
+    Args:
+        outside: Outside temperature sampled every ``step`` seconds
+        target: Target temperature
+        params: One array per entry of PARAMETERS
+        model: Thermal model, defaults to HouseModel()
+        step: Control tick length in seconds
+        control_mode: Pellet stove control mode (pid or on_off)
+
+    Returns:
+        dict: One array per metric, plus source switch counts
+    """
+    model = model or HouseModel()
+    kp = params["kp"]
+    ki = params["ki"]
+    kd = params["kd"]
+    min_outside_temp = params["min_outside_temp"]
+    target_timeout = params["target_timeout"]
+    count = len(kp)
+    low, high = PID_OUTPUT_LIMITS
+
+    inside = np.full(count, float(target))
+    pellet = np.zeros(count, dtype=bool)
+    minisplit_on = np.zeros(count, dtype=bool)
+    level = np.zeros(count, dtype=np.int64)
+    stove_heat = np.zeros(count)
+    integral = np.zeros(count)
+    last_input = np.full(count, np.nan)
+    last_time = np.zeros(count)
+    output = np.full(count, np.nan)
+    quantized = np.full(count, np.nan)
+    abs_error = np.zeros(count)
+    stove_btu = np.zeros(count)
+    relay_cycles = np.zeros(count, dtype=np.int64)
+    source_switches = np.zeros(count, dtype=np.int64)
+    # Relay scheduler state: last level change and the times of the last
+    # MAX_LEVEL_CHANGES_PER_HOUR changes, oldest at ``oldest``
+    rows = np.arange(count)
+    level_since = np.full(count, -np.inf)
+    level_changes = np.full((count, MAX_LEVEL_CHANGES_PER_HOUR), -np.inf)
+    oldest = np.zeros(count, dtype=np.int64)
+
+    # Trend window, mirroring TemperatureHistory with evenly spaced samples
+    window = int(TEMP_TREND_PERIOD // step) + 1
+    ring = np.zeros((window, count))
+    sum_y = np.zeros(count)
+    sum_ky = np.zeros(count)
+
+    span = MINISPLIT_RATING_TEMP - model.minisplit_cutoff_temp
+    stove_decay = np.exp(-step / model.stove_warmup)
+    house_decay = np.exp(-model.heat_loss * step / 3600 / model.thermal_mass)
+
+    for index, outside_temp in enumerate(outside):
+        now = index * step
+
+        # Trend statistics over the window
+        slot = index % window
+        if index >= window:
+            sum_y -= ring[slot]
+            sum_ky -= (index - window) * ring[slot]
+        ring[slot] = inside
+        sum_y += inside
+        sum_ky += index * inside
+        filled = min(index + 1, window)
+        first = index + 1 - filled
+        ks = np.arange(first, index + 1, dtype=float)
+        s_kk = float(np.sum(ks * ks) - ks.sum() ** 2 / filled)
+
+        # Source selection, as in SourceSelector.select without predictions
+        to_pellet = ~pellet & (outside_temp < min_outside_temp)
+        if (
+            now >= TEMP_TREND_PERIOD
+            and filled >= TEMP_TREND_SAMPLES
+            and (filled - 1) * step >= TEMP_TREND_PERIOD / 2
+            and s_kk > 0
+        ):
+            slope = (sum_ky - ks.sum() * sum_y / filled) / s_kk / step
+            to_pellet |= (
+                ~pellet & (inside < target) & (slope * 3600 < -TEMP_TREND_MIN_RATE)
+            )
+        to_pellet |= ~pellet & (now > target_timeout) & (inside < target)
+        # The mini-split keeps its minimum run time, as in RelayScheduler
+        to_pellet &= now >= MINISPLIT_MIN_RUN_TIME
+        source_switches += to_pellet
+        pellet |= to_pellet
+        minisplit_on |= ~pellet
+
+        # Pellet stove control, as in PelletStovePIDController.compute_level
+        if control_mode == MODE_PID:
+            error = target - inside
+            proportional = kp * error
+            if to_pellet.any():
+                # Bumpless transfer
+                start = np.where(np.isnan(output), low, output)
+                integral = np.where(
+                    to_pellet, np.clip(start - proportional, low, high), integral
+                )
+                last_input = np.where(to_pellet, inside, last_input)
+                last_time = np.where(to_pellet, now, last_time)
+                output = np.where(to_pellet, start, output)
+                quantized = np.where(to_pellet, np.floor(start + 0.5), quantized)
+            fresh = np.isnan(output)
+            dt = np.where(fresh, 0.0, now - last_time)
+            due = pellet & (fresh | (dt >= PID_SAMPLE_TIME))
+            safe_dt = np.where(dt > 0, dt, 1.0)
+            derivative = np.where(
+                (dt > 0) & ~np.isnan(last_input),
+                -kd * (inside - last_input) / safe_dt,
+                0.0,
+            )
+            candidate = integral + ki * error * dt
+            unclamped = proportional + candidate + derivative
+            saturated = ((unclamped > high) & (error > 0)) | (
+                (unclamped < low) & (error < 0)
+            )
+            integral = np.where(due & ~saturated, np.clip(candidate, low, high), integral)
+            output = np.where(
+                due, np.clip(proportional + integral + derivative, low, high), output
+            )
+            last_input = np.where(due, inside, last_input)
+            last_time = np.where(due, now, last_time)
+            requantize = pellet & (
+                np.isnan(quantized)
+                | (output >= quantized + 0.5 + PID_LEVEL_HYSTERESIS)
+                | (output <= quantized - 0.5 - PID_LEVEL_HYSTERESIS)
+            )
+            quantized = np.where(requantize, np.floor(output + 0.5), quantized)
+            new_level = np.nan_to_num(quantized).astype(np.int64)
+        else:
+            # As in on_off_level
+            held = np.where(level > 0, level, np.where(inside < target, 3, 1))
+            new_level = np.where(
+                inside <= target - ON_OFF_HYSTERESIS,
+                3,
+                np.where(inside >= target + ON_OFF_HYSTERESIS, 1, held),
+            )
+        # Level changes, as in RelayScheduler.request_level: the first level
+        # after ignition is free, later ones wait for the dwell and budget
+        ignition = level == 0
+        allowed = (now - level_since >= LEVEL_MIN_DWELL) & (
+            now - level_changes[rows, oldest] >= 3600
+        )
+        changed = pellet & (new_level != level) & (ignition | allowed)
+        counted = changed & ~ignition
+        level_changes[rows[counted], oldest[counted]] = now
+        oldest = np.where(counted, (oldest + 1) % MAX_LEVEL_CHANGES_PER_HOUR, oldest)
+        level_since = np.where(changed, now, level_since)
+        relay_cycles += changed * (1 + (level > 0))
+        level = np.where(changed, new_level, level)
+
+        abs_error += np.abs(inside - target)
+
+        # Plant update, as in HouseModel
+        derate = np.minimum((outside_temp - model.minisplit_cutoff_temp) / span, 1.0)
+        capacity = model.minisplit_capacity * (
+            model.minisplit_min_capacity + (1 - model.minisplit_min_capacity) * derate
+        )
+        demand = np.clip((target - inside) / model.minisplit_band + 0.5, 0.0, 1.0)
+        minisplit_heat = np.where(
+            minisplit_on & (outside_temp >= model.minisplit_cutoff_temp),
+            capacity * demand,
+            0.0,
+        )
+        stove_target = model.stove_output_per_level * level
+        stove_heat = stove_target + (stove_heat - stove_target) * stove_decay
+        stove_btu += stove_heat * step / 3600
+        equilibrium = outside_temp + (minisplit_heat + stove_heat) / model.heat_loss
+        inside = equilibrium + (inside - equilibrium) * house_decay
+
+    steps = max(len(outside), 1)
+    return {
+        "comfort_error": abs_error / steps,
+        "pellet_lbs": stove_btu / model.pellet_btu_per_lb,
+        "relay_cycles": relay_cycles,
+        "source_switches": source_switches,
+    }
+
+
+def _evaluate_chunk(args: tuple) -> dict[str, np.ndarray]:
+    """Process pool entry point for evaluate."""
+    return evaluate(*args)
+
+
+def sweep(
+    outside: np.ndarray,
+    target: float,
+    ranges: Optional[dict[str, Sequence[float]]] = None,
+    model: Optional[HouseModel] = None,
+    step: float = MONITOR_INTERVAL,
+    control_mode: str = MODE_PID,
+    workers: Optional[int] = None,
+) -> dict[str, np.ndarray]:
+    """Evaluate a parameter grid across a process pool.
+
+    Returns:
+        dict: Parameter and metric arrays, one element per combination
+    """
+    params = build_grid(ranges or DEFAULT_GRID)
+    workers = workers or os.cpu_count() or 1
+    chunks = np.array_split(np.arange(len(params["kp"])), workers)
+    jobs = [
+        (outside, target, {k: v[chunk] for k, v in params.items()}, model, step, control_mode)
+        for chunk in chunks
+        if len(chunk)
+    ]
+    if len(jobs) == 1:
+        results = [_evaluate_chunk(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+            results = list(executor.map(_evaluate_chunk, jobs))
+
+    merged = dict(params)
+    for name in results[0]:
+        merged[name] = np.concatenate([result[name] for result in results])
+    return merged
+
+
+def rank(
+    results: dict[str, np.ndarray], weights: Optional[dict[str, float]] = None
+) -> list[dict[str, float]]:
+    """Rank combinations by a weighted, median-normalized score.
+
+    Each metric is divided by its median over the grid so the weights are
+    independent of units. Lower scores are better.
+    """
+    weights = weights or {"comfort_error": 1.0, "pellet_lbs": 1.0, "relay_cycles": 0.5}
+    score = np.zeros(len(results["kp"]))
+    for metric, weight in weights.items():
+        values = results[metric].astype(float)
+        scale = np.median(values) or 1.0
+        score += weight * values / scale
+    order = np.argsort(score, kind="stable")
+    return [
+        {
+            **{name: float(results[name][i]) for name in PARAMETERS},
+            **{name: float(results[name][i]) for name in (*METRICS, "source_switches")},
+            "score": float(score[i]),
+        }
+        for i in order
+    ]
+
+
+def recommended_config(row: dict[str, float]) -> dict[str, float]:
+    """Return config entry values for a ranked result row."""
+    return {
+        CONF_PID_KP: row["kp"],
+        CONF_PID_KI: row["ki"],
+        CONF_PID_KD: row["kd"],
+        CONF_MIN_OUTSIDE_TEMP: row["min_outside_temp"],
+        CONF_TARGET_TIMEOUT: row["target_timeout"],
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Run a parameter sweep from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", nargs="?", help="CSV or Parquet file to replay")
+    parser.add_argument("--days", type=int, default=60, help="Synthetic season length")
+    parser.add_argument("--target", type=float, default=68.0)
+    parser.add_argument("--mode", choices=[MODE_PID, MODE_ON_OFF], default=MODE_PID)
+    parser.add_argument("--step", type=float, default=MONITOR_INTERVAL)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    series = load_series(args.path)["outside_temp"] if args.path else synthetic_season(args.days)
+    times = np.arange(series.start, series.end + args.step, args.step)
+    outside = np.interp(times, series.times, series.values)
+
+    results = sweep(outside, args.target, step=args.step, control_mode=args.mode, workers=args.workers)
+    ranked = rank(results)
+    columns = (*PARAMETERS, *METRICS, "score")
+    print(" ".join(f"{name:>16}" for name in columns))
+    for row in ranked[: args.top]:
+        print(" ".join(f"{row[name]:>16.4g}" for name in columns))
+    print(json.dumps(recommended_config(ranked[0]), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks for the Smart Thermostat control loop."""
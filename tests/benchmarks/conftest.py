@@ -0,0 +1,88 @@
+"""Fixtures for the Smart Thermostat benchmarks.
+
+The benchmarks are synchronous so that pytest-benchmark can time them; each
+zone gets its own event loop, driven with ``run_until_complete``, on the
+virtual clock of the test harness.
+"""
+from __future__ import annotations
+
+import asyncio
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import pytest
+from homeassistant.components.climate import HVACMode
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import restore_state
+
+from smart_selecting_thermostat.climate import SmartThermostat
+
+from ..common import ThermostatHarness, VirtualClock
+
+# Virtual time a zone runs before it is measured, so the trend history,
+# the controllers and the actuator are in their steady state
+WARM_UP = 6 * 3600
+
+
+@dataclass
+class BenchZone:
+    """A warmed up zone and the event loop it runs on."""
+
+    loop: asyncio.AbstractEventLoop
+    harness: ThermostatHarness
+    thermostat: SmartThermostat
+
+    def run(self, coro) -> Any:
+        """Run ``coro`` to completion on the zone's event loop."""
+        return self.loop.run_until_complete(coro)
+
+
+@pytest.fixture
+def make_zone(tmp_path):
+    """Return a factory for heating zones set up with the given options."""
+    clock = VirtualClock()
+    clock.start_patches()
+    loop = asyncio.new_event_loop()
+    hasses: list[HomeAssistant] = []
+
+    async def async_make(**options: Any) -> BenchZone:
+        hass = HomeAssistant(str(tmp_path / str(len(hasses))))
+        hasses.append(hass)
+        await restore_state.async_load(hass)
+        harness = ThermostatHarness(hass, clock)
+        thermostat = await harness.async_setup(platforms=["climate"], **options)
+        await thermostat.async_set_temperature(temperature=68.0)
+        await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+        await harness.async_run(WARM_UP)
+        return BenchZone(loop, harness, thermostat)
+
+    yield lambda **options: loop.run_until_complete(async_make(**options))
+
+    for hass in hasses:
+        loop.run_until_complete(hass.async_stop(force=True))
+    loop.close()
+    clock.stop_patches()
+
+
+def measure_allocations(func: Callable[[], Any], rounds: int = 50) -> dict:
+    """Return the memory ``func`` allocates per call, as benchmark extra info.
+
+    ``peak_bytes`` is the largest transient allocation of a single call and
+    ``retained_bytes`` the memory still held per call afterwards, which
+    should stay near zero once the ring buffers are full.
+    """
+    func()
+    tracemalloc.start()
+    try:
+        peak = 0
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(rounds):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes": peak, "retained_bytes": (end - start) / rounds}
@@ -0,0 +1,84 @@
+"""Benchmarks of the control pass and of sensor event handling."""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from homeassistant.const import EVENT_STATE_CHANGED  # noqa: E402
+from homeassistant.core import Event, State  # noqa: E402
+
+from smart_selecting_thermostat.const import (  # noqa: E402
+    MODE_MPC,
+    MODE_ON_OFF,
+    MODE_PID,
+)
+
+from ..common import INSIDE_SENSOR  # noqa: E402
+from .conftest import measure_allocations  # noqa: E402
+
+
+@pytest.mark.parametrize("mode", [MODE_PID, MODE_ON_OFF, MODE_MPC])
+def test_control_pass(benchmark, make_zone, mode):
+    """One control pass of a zone holding its target."""
+    zone = make_zone(control_mode=mode)
+    thermostat = zone.thermostat
+
+    def setup():
+        # Make the MPC plan due, so every pass includes a solve
+        if thermostat._mpc is not None:
+            thermostat._mpc.planned_level = None
+
+    def control_pass():
+        setup()
+        zone.run(thermostat._async_control_pass())
+
+    benchmark.extra_info.update(measure_allocations(control_pass))
+    benchmark.pedantic(
+        lambda: zone.run(thermostat._async_control_pass()),
+        setup=setup,
+        rounds=200,
+        warmup_rounds=5,
+    )
+
+
+@pytest.mark.parametrize("rate", [1, 10, 100])
+def test_state_changed_throughput(benchmark, make_zone, rate):
+    """One second of inside sensor events at ``rate`` events per second.
+
+    The events go through the coordinator's dispatch, the sensor fusion and
+    the debouncer; the virtual second then elapses, so the coalesced
+    control passes are part of the measured cost.
+    """
+    zone = make_zone()
+    harness = zone.harness
+    coordinator = zone.thermostat._coordinator
+    noise = random.Random(0)
+    events = [
+        Event(
+            EVENT_STATE_CHANGED,
+            {
+                "entity_id": INSIDE_SENSOR,
+                "old_state": None,
+                "new_state": State(
+                    INSIDE_SENSOR, f"{68.0 + noise.gauss(0.0, 0.1):.2f}"
+                ),
+            },
+        )
+        for _ in range(rate)
+    ]
+
+    async def async_one_second():
+        for event in events:
+            await coordinator._async_state_changed(event)
+        await harness.clock.async_advance(harness.hass, 1.0)
+
+    benchmark.extra_info["events"] = rate
+    benchmark.extra_info.update(
+        measure_allocations(lambda: zone.run(async_one_second()), rounds=10)
+    )
+    benchmark.pedantic(
+        lambda: zone.run(async_one_second()), rounds=100, warmup_rounds=5
+    )
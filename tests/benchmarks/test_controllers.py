@@ -0,0 +1,79 @@
+"""Benchmarks of the trend history, PID, flight recorder and telemetry."""
+from __future__ import annotations
+
+import itertools
+import math
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from smart_selecting_thermostat.const import PID_SAMPLE_TIME  # noqa: E402
+from smart_selecting_thermostat.flight_recorder import FlightRecorder  # noqa: E402
+from smart_selecting_thermostat.pid_controller import (  # noqa: E402
+    PelletStovePIDController,
+)
+from smart_selecting_thermostat.telemetry import ControlTelemetry  # noqa: E402
+from smart_selecting_thermostat.temperature_history import (  # noqa: E402
+    TemperatureHistory,
+)
+
+from .conftest import measure_allocations  # noqa: E402
+
+SAMPLE_INTERVAL = 10.0  # seconds between trend history samples
+
+
+@pytest.mark.parametrize("window", [300, 900, 3600, 6 * 3600])
+def test_trend_history_update(benchmark, window):
+    """Appending a sample to a full history and reading the trend."""
+    history = TemperatureHistory(window, int(window / SAMPLE_INTERVAL) + 1)
+    times = itertools.count(0.0, SAMPLE_INTERVAL)
+    for _ in range(history._capacity):
+        t = next(times)
+        history.append(t, 68.0 + math.sin(t / 600))
+
+    def update():
+        t = next(times)
+        history.append(t, 68.0 + math.sin(t / 600))
+        return history.slope, history.mean
+
+    benchmark.extra_info.update(measure_allocations(update, rounds=1000))
+    benchmark(update)
+
+
+def test_pid_compute(benchmark):
+    """A PID output computed every sample time."""
+    times = itertools.count(0.0, PID_SAMPLE_TIME)
+    pid = PelletStovePIDController(1.0, 0.1, 0.05, time_fn=times.__next__)
+    temps = itertools.cycle([67.2, 67.6, 68.0, 68.4, 68.8, 68.4, 68.0, 67.6])
+
+    benchmark.extra_info.update(
+        measure_allocations(lambda: pid.compute(next(temps), 68.0), rounds=1000)
+    )
+    benchmark(lambda: pid.compute(next(temps), 68.0))
+
+
+def test_flight_recorder_write(benchmark, tmp_path):
+    """One record appended to the memory-mapped flight recorder log."""
+    recorder = FlightRecorder(str(tmp_path / "zone.flight"), capacity=4096)
+    recorder.open()
+    try:
+        benchmark(recorder.pid, (1.5, 2.0, -0.1), 3.4)
+    finally:
+        recorder.close()
+
+
+def test_telemetry_observe(benchmark):
+    """A control pass reading added to the minute, hour and day rollups."""
+    telemetry = ControlTelemetry()
+    times = itertools.count(0.0, PID_SAMPLE_TIME)
+    temps = itertools.cycle([67.2, 67.6, 68.0, 68.4, 68.8, 68.4, 68.0, 67.6])
+
+    def observe():
+        temp = next(temps)
+        return telemetry.observe(
+            next(times), (temp, 30.0, temp - 68.0, 3, 100.0, 0.0)
+        )
+
+    benchmark.extra_info.update(measure_allocations(observe, rounds=1000))
+    benchmark(observe)
@@ -0,0 +1,483 @@
+"""Time-accelerated test harness for the smart thermostat.
+
+The harness runs the real integration on an in-process Home Assistant core
+with three stand-ins:
+
+- ``VirtualClock`` replaces the monotonic clock (and with it the event loop
+  time), ``utcnow`` and the wall clock, and fires due timers in order when
+  it is advanced, so ``async_track_time_interval``, the coordinator tick and
+  the PID sample time run deterministically without real waiting.
+- ``ServiceRecorder`` registers the services the thermostat calls, records
+  every call with its virtual timestamp and mirrors it to the entity state.
+- ``FakeHouse`` steps the simulator's thermal model from those states and
+  publishes the inside and outside temperature sensors.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import math
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from types import MappingProxyType
+from typing import Any, Callable, Optional
+from unittest.mock import patch
+
+from homeassistant.components.climate import HVACMode
+from homeassistant.config_entries import ConfigEntry, current_entry
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_TEMPERATURE, STATE_OFF, STATE_ON
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.data_entry_flow import FlowResult, FlowResultType
+from homeassistant.helpers import entity, entity_registry as er
+from homeassistant.helpers.entity_platform import EntityPlatform
+from homeassistant.util.unit_system import US_CUSTOMARY_SYSTEM
+
+import smart_selecting_thermostat as integration
+from smart_selecting_thermostat import climate
+from smart_selecting_thermostat.config_flow import SmartThermostatConfigFlow
+from smart_selecting_thermostat.const import (
+    CONF_CONTROL_MODE,
+    CONF_INSIDE_TEMP_SENSOR,
+    CONF_MINISPLIT_ENTITY,
+    CONF_MIN_OUTSIDE_TEMP,
+    CONF_OUTSIDE_TEMP_SENSOR,
+    CONF_PELLET_LEVEL_SWITCHES,
+    CONF_PELLET_POWER_SWITCH,
+    DOMAIN,
+    MODE_PID,
+)
+from smart_selecting_thermostat.simulation import HouseModel
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SCAN_INTERVAL = timedelta(seconds=30)
+CLOCK_TICK = 1e-6  # seconds per reading of the virtual clock
+
+# Midnight on a winter Monday
+START = datetime(2024, 1, 15, tzinfo=timezone.utc)
+
+MINISPLIT = "climate.minisplit"
+POWER_SWITCH = "switch.pellet_power"
+LEVEL_SWITCHES = [f"switch.pellet_level_{level}" for level in range(1, 6)]
+INSIDE_SENSOR = "sensor.inside_temperature"
+OUTSIDE_SENSOR = "sensor.outside_temperature"
+
+ZONE_CONFIG = {
+    CONF_MINISPLIT_ENTITY: MINISPLIT,
+    CONF_PELLET_POWER_SWITCH: POWER_SWITCH,
+    CONF_PELLET_LEVEL_SWITCHES: LEVEL_SWITCHES,
+    CONF_OUTSIDE_TEMP_SENSOR: [OUTSIDE_SENSOR],
+    CONF_INSIDE_TEMP_SENSOR: [INSIDE_SENSOR],
+    CONF_MIN_OUTSIDE_TEMP: 40,
+    CONF_CONTROL_MODE: MODE_PID,
+}
+
+
+class VirtualClock:
+    """Clock that moves only when advanced, apart from a tick per reading.
+
+    While patched in, ``time.monotonic`` (which is also the event loop
+    clock), ``time.time``, ``dt_util.utcnow`` and the thermostat's wall
+    clock all follow the virtual time, and the controllers are created on it.
+    """
+
+    def __init__(self, start: datetime = START) -> None:
+        """Initialize the clock at ``start``."""
+        self.start = start.timestamp()
+        self._monotonic_start = self._monotonic = time.monotonic()
+        self._patches = ExitStack()
+
+    @property
+    def elapsed(self) -> float:
+        """Return the seconds since the start."""
+        return self._monotonic - self._monotonic_start
+
+    def monotonic(self) -> float:
+        """Return the virtual monotonic time in seconds.
+
+        Like a real clock the time moves on by CLOCK_TICK with every
+        reading, so a timer rescheduled with no delay cannot run forever
+        at one instant.
+        """
+        self._monotonic += CLOCK_TICK
+        return self._monotonic
+
+    def timestamp(self) -> float:
+        """Return the virtual epoch time in seconds."""
+        return self.start + self.elapsed
+
+    def utcnow(self) -> datetime:
+        """Return the virtual time as an aware UTC datetime."""
+        return datetime.fromtimestamp(self.timestamp(), timezone.utc)
+
+    def start_patches(self) -> None:
+        """Route the clocks used by Home Assistant and the thermostat here."""
+        clock = self
+
+        class VirtualDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.timestamp(), tz)
+
+        # Whole seconds and no jitter keep the timers aligned the same way
+        # in every run
+        self._monotonic_start = self._monotonic = float(math.ceil(time.monotonic()))
+        for target, value in (
+            ("time.monotonic", self.monotonic),
+            ("time.time", self.timestamp),
+            ("homeassistant.util.dt.utcnow", self.utcnow),
+            ("homeassistant.helpers.update_coordinator.randint", min),
+            ("smart_selecting_thermostat.coordinator.randint", min),
+            ("homeassistant.helpers.event.randint", min),
+            ("smart_selecting_thermostat.climate.datetime", VirtualDatetime),
+            (
+                "smart_selecting_thermostat.climate.PelletStovePIDController",
+                partial(climate.PelletStovePIDController, time_fn=self.monotonic),
+            ),
+            (
+                "smart_selecting_thermostat.climate.RelayScheduler",
+                partial(climate.RelayScheduler, time_fn=self.monotonic),
+            ),
+        ):
+            self._patches.enter_context(patch(target, value))
+
+    def stop_patches(self) -> None:
+        """Restore the real clocks."""
+        self._patches.close()
+
+    async def async_settle(self, hass: HomeAssistant) -> None:
+        """Run everything that is due now until the loop is idle."""
+        loop = hass.loop
+        while True:
+            await hass.async_block_till_done()
+            now = loop.time()
+            if not loop._ready and not any(  # pylint: disable=protected-access
+                not handle.cancelled() and handle.when() <= now
+                for handle in loop._scheduled  # pylint: disable=protected-access
+            ):
+                return
+            await asyncio.sleep(0)
+
+    async def async_advance(self, hass: HomeAssistant, seconds: float) -> None:
+        """Move the clock forward, firing every timer due on the way in order.
+
+        The clock is set to the due time of each timer in turn, so timers
+        fire at the virtual time they were scheduled for.
+        """
+        end = self._monotonic + seconds
+        loop = hass.loop
+        while True:
+            await self.async_settle(hass)
+            due = min(
+                (
+                    handle.when()
+                    for handle in loop._scheduled  # pylint: disable=protected-access
+                    if not handle.cancelled()
+                ),
+                default=math.inf,
+            )
+            if due > end:
+                break
+            self._monotonic = max(self._monotonic, due)
+        self._monotonic = max(self._monotonic, end)
+        await self.async_settle(hass)
+
+
+@dataclass(frozen=True)
+class RecordedCall:
+    """A service call made by the thermostat."""
+
+    time: float
+    domain: str
+    service: str
+    data: dict[str, Any]
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the targeted entities."""
+        return list(self.data[ATTR_ENTITY_ID])
+
+
+class ServiceRecorder:
+    """Stand-in for the switch and climate services of the heating devices.
+
+    Every call is recorded with the virtual time and applied to the entity
+    state, the way a device integration would confirm it.
+    """
+
+    SERVICES = (
+        ("switch", "turn_on"),
+        ("switch", "turn_off"),
+        ("climate", "set_temperature"),
+        ("climate", "turn_off"),
+    )
+
+    def __init__(self, hass: HomeAssistant, clock: VirtualClock) -> None:
+        """Register the services."""
+        self.hass = hass
+        self.clock = clock
+        self.calls: list[RecordedCall] = []
+        for domain, service in self.SERVICES:
+            hass.services.async_register(domain, service, self._async_handle)
+
+    async def _async_handle(self, call: ServiceCall) -> None:
+        """Record a call and update the entity states."""
+        data = dict(call.data)
+        self.calls.append(
+            RecordedCall(self.clock.elapsed, call.domain, call.service, data)
+        )
+        for entity_id in data[ATTR_ENTITY_ID]:
+            state = self.hass.states.get(entity_id)
+            attributes = dict(state.attributes) if state is not None else {}
+            if call.service == "turn_on":
+                self.hass.states.async_set(entity_id, STATE_ON, attributes)
+            elif call.service == "turn_off":
+                self.hass.states.async_set(entity_id, STATE_OFF, attributes)
+            else:
+                attributes[ATTR_TEMPERATURE] = data[ATTR_TEMPERATURE]
+                self.hass.states.async_set(entity_id, HVACMode.HEAT, attributes)
+
+    def count(
+        self,
+        domain: Optional[str] = None,
+        service: Optional[str] = None,
+        since: float = 0.0,
+    ) -> int:
+        """Return the number of calls matching the filters."""
+        return sum(
+            1
+            for call in self.calls
+            if call.time >= since
+            and (domain is None or call.domain == domain)
+            and (service is None or call.service == service)
+        )
+
+
+class FakeOptionsFlows:
+    """Stand-in for the options flow manager that runs a flow in one step."""
+
+    def __init__(self, entries: FakeConfigEntries) -> None:
+        """Initialize the manager for the entries of ``entries``."""
+        self.entries = entries
+
+    async def async_init(
+        self,
+        entry_id: str,
+        *,
+        context: Optional[dict[str, Any]] = None,
+        data: Optional[dict[str, Any]] = None,
+    ) -> FlowResult:
+        """Run the options flow of an entry with ``data`` as its input."""
+        entry = self.entries.async_get_entry(entry_id)
+        flow = SmartThermostatConfigFlow.async_get_options_flow(entry)
+        flow.hass = self.entries.hass
+        flow.handler = entry_id
+        flow.flow_id = "options"
+        flow.context = context or {}
+        result = await flow.async_step_init(data)
+        if result["type"] == FlowResultType.CREATE_ENTRY:
+            self.entries.async_update_entry(entry, options=result["data"])
+        return result
+
+
+class FakeConfigEntries:
+    """Stand-in for the config entry manager that sets up platforms."""
+
+    def __init__(
+        self, hass: HomeAssistant, platforms: Optional[list[str]] = None
+    ) -> None:
+        """Initialize the manager, setting up only ``platforms`` if given."""
+        self.hass = hass
+        self.only = platforms
+        self.platforms: dict[str, list[EntityPlatform]] = {}
+        self.entries: dict[str, ConfigEntry] = {}
+        self.options = FakeOptionsFlows(self)
+
+    def async_get_entry(self, entry_id: str) -> Optional[ConfigEntry]:
+        """Return the entry with ``entry_id``."""
+        return self.entries.get(entry_id)
+
+    def async_update_entry(
+        self, entry: ConfigEntry, *, options: dict[str, Any]
+    ) -> None:
+        """Replace the options of ``entry`` and call its update listeners."""
+        object.__setattr__(entry, "options", MappingProxyType(options))
+        for listener in entry.update_listeners:
+            self.hass.async_create_task(listener(self.hass, entry))
+
+    async def async_forward_entry_setups(
+        self, entry: ConfigEntry, platforms: list[str]
+    ) -> None:
+        """Set up the integration platforms for ``entry``."""
+        for platform in platforms:
+            if self.only is not None and platform not in self.only:
+                continue
+            module = importlib.import_module(f"smart_selecting_thermostat.{platform}")
+            entity_platform = EntityPlatform(
+                hass=self.hass,
+                logger=_LOGGER,
+                domain=str(platform),
+                platform_name=DOMAIN,
+                platform=module,
+                scan_interval=getattr(module, "SCAN_INTERVAL", DEFAULT_SCAN_INTERVAL),
+                entity_namespace=None,
+            )
+            await entity_platform.async_setup_entry(entry)
+            self.platforms.setdefault(entry.entry_id, []).append(entity_platform)
+
+    async def async_unload_platforms(
+        self, entry: ConfigEntry, platforms: list[str]
+    ) -> bool:
+        """Remove the entities of ``entry``."""
+        for entity_platform in self.platforms.pop(entry.entry_id, []):
+            await entity_platform.async_reset()
+        return True
+
+
+class FakeHouse:
+    """Thermal model of the house driven by the recorded device states."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        clock: VirtualClock,
+        outside: Callable[[float], float],
+        inside: float = 62.0,
+        model: Optional[HouseModel] = None,
+    ) -> None:
+        """Initialize the house.
+
+        Args:
+            hass: Home Assistant instance holding the device states
+            clock: Virtual clock
+            outside: Outside temperature for seconds since the start
+            inside: Initial inside temperature
+            model: Thermal model, the simulator default if None
+        """
+        self.hass = hass
+        self.clock = clock
+        self.outside = outside
+        self.inside = inside
+        self.model = model or HouseModel()
+        self.stove_heat = 0.0
+        self.pellet_btu = 0.0
+
+    def stove_level(self) -> int:
+        """Return the stove level set by the switches, 0 if off."""
+        power = self.hass.states.get(POWER_SWITCH)
+        if power is None or power.state != STATE_ON:
+            return 0
+        for level, switch in enumerate(LEVEL_SWITCHES, start=1):
+            state = self.hass.states.get(switch)
+            if state is not None and state.state == STATE_ON:
+                return level
+        return 0
+
+    def minisplit_setpoint(self) -> Optional[float]:
+        """Return the mini-split setpoint, None while it is off."""
+        state = self.hass.states.get(MINISPLIT)
+        if state is None or state.state != HVACMode.HEAT:
+            return None
+        return state.attributes.get(ATTR_TEMPERATURE)
+
+    def step(self, dt: float) -> None:
+        """Advance the house by ``dt`` seconds at the current device states."""
+        outside = self.outside(self.clock.elapsed)
+        self.stove_heat = self.model.stove_output(self.stove_heat, self.stove_level(), dt)
+        heat = self.stove_heat
+        if (setpoint := self.minisplit_setpoint()) is not None:
+            heat += self.model.minisplit_output(self.inside, outside, setpoint)
+        self.inside = self.model.step(self.inside, outside, heat, dt)
+        self.pellet_btu += self.stove_heat * dt / 3600
+
+    def publish(self) -> None:
+        """Write the sensor states."""
+        self.hass.states.async_set(INSIDE_SENSOR, f"{self.inside:.1f}")
+        self.hass.states.async_set(
+            OUTSIDE_SENSOR, f"{self.outside(self.clock.elapsed):.1f}"
+        )
+
+
+class ThermostatHarness:
+    """One thermostat zone on a virtual clock with a simulated house."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        clock: VirtualClock,
+        outside: Callable[[float], float] = lambda elapsed: 30.0,
+    ) -> None:
+        """Initialize the harness and the device states."""
+        self.hass = hass
+        self.clock = clock
+        self.services = ServiceRecorder(hass, clock)
+        self.house = FakeHouse(hass, clock, outside)
+        self.entry: Optional[ConfigEntry] = None
+        self.thermostat: Optional[climate.SmartThermostat] = None
+        hass.config.units = US_CUSTOMARY_SYSTEM
+        hass.states.async_set(MINISPLIT, HVACMode.OFF)
+        for switch in (POWER_SWITCH, *LEVEL_SWITCHES):
+            hass.states.async_set(switch, STATE_OFF)
+        self.house.publish()
+
+    @property
+    def stats(self):
+        """Return the control loop statistics of the zone."""
+        return self.thermostat._stats  # pylint: disable=protected-access
+
+    async def async_setup(
+        self, platforms: Optional[list[str]] = None, **options: Any
+    ) -> climate.SmartThermostat:
+        """Set up the integration with one zone and return its thermostat.
+
+        Args:
+            platforms: Platforms to set up, all if None
+            options: Config entry data overriding ZONE_CONFIG
+        """
+        hass = self.hass
+        hass.config_entries = FakeConfigEntries(hass, platforms)
+        entity.async_setup(hass)
+        await er.async_load(hass)
+        # The integration is set up outside of any config entry
+        current_entry.set(None)
+        await integration.async_setup(hass, {})
+        self.entry = ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title="Smart Thermostat",
+            data={**ZONE_CONFIG, **options},
+            source="user",
+        )
+        hass.config_entries.entries[self.entry.entry_id] = self.entry
+        await integration.async_setup_entry(hass, self.entry)
+        await self.clock.async_settle(hass)
+        return self.find_thermostat()
+
+    def find_thermostat(self) -> climate.SmartThermostat:
+        """Return the thermostat of the zone, which is replaced on reload."""
+        self.thermostat = next(
+            entity
+            for entity_platform in self.hass.config_entries.platforms[
+                self.entry.entry_id
+            ]
+            for entity in entity_platform.entities.values()
+            if isinstance(entity, climate.SmartThermostat)
+        )
+        return self.thermostat
+
+    async def async_run(self, seconds: float, sensor_interval: float = 60.0) -> None:
+        """Run the house and thermostat for ``seconds`` of virtual time.
+
+        The house is stepped and the sensors published every
+        ``sensor_interval`` seconds, like a sensor reporting on a timer.
+        """
+        steps, rest = divmod(seconds, sensor_interval)
+        for dt in [sensor_interval] * int(steps) + ([rest] if rest else []):
+            await self.clock.async_advance(self.hass, dt)
+            self.house.step(dt)
+            self.house.publish()
@@ -0,0 +1,32 @@
+"""Fixtures for the Smart Thermostat tests."""
+from __future__ import annotations
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import restore_state
+
+from .common import ThermostatHarness, VirtualClock
+
+
+@pytest.fixture
+async def hass(tmp_path, clock):
+    """Return an in-process Home Assistant core on the virtual clock."""
+    hass = HomeAssistant(str(tmp_path))
+    await restore_state.async_load(hass)
+    yield hass
+    await hass.async_stop(force=True)
+
+
+@pytest.fixture
+def clock():
+    """Return a virtual clock patched in for the duration of the test."""
+    clock = VirtualClock()
+    clock.start_patches()
+    yield clock
+    clock.stop_patches()
+
+
+@pytest.fixture
+def harness(hass, clock):
+    """Return a thermostat harness at a constant 30°F outside."""
+    return ThermostatHarness(hass, clock)
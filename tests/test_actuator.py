@@ -0,0 +1,82 @@
+"""Tests for the actuator command layer."""
+from __future__ import annotations
+
+import pytest
+from homeassistant.const import STATE_OFF, STATE_ON
+
+from smart_selecting_thermostat.actuator import ActuatorController
+
+from .common import LEVEL_SWITCHES, MINISPLIT, POWER_SWITCH, ServiceRecorder
+
+
+@pytest.fixture
+def services(hass, clock) -> ServiceRecorder:
+    """Return the device services with every switch off."""
+    for switch in (POWER_SWITCH, *LEVEL_SWITCHES):
+        hass.states.async_set(switch, STATE_OFF)
+    hass.states.async_set(MINISPLIT, "heat", {"temperature": 66.0})
+    return ServiceRecorder(hass, clock)
+
+
+@pytest.fixture
+def actuator(hass) -> ActuatorController:
+    """Return an actuator controller."""
+    return ActuatorController(hass)
+
+
+async def test_matching_state_sends_nothing(actuator, services):
+    """Entities already in the desired state are skipped."""
+    assert await actuator.async_turn_off(POWER_SWITCH, *LEVEL_SWITCHES)
+    assert await actuator.async_set_temperature(MINISPLIT, 66.0)
+    assert services.calls == []
+    assert actuator.stats.skipped_calls == 7
+
+
+async def test_repeated_command_is_sent_once(hass, actuator, services):
+    """A command awaiting its state update is not sent again."""
+    calls = []
+
+    async def async_unconfirmed(call) -> None:
+        """Accept the call without updating the state yet."""
+        calls.append(call)
+
+    hass.services.async_register("switch", "turn_on", async_unconfirmed)
+    assert await actuator.async_turn_on(POWER_SWITCH)
+    assert await actuator.async_turn_on(POWER_SWITCH)
+    assert len(calls) == 1
+    assert actuator.commanded(POWER_SWITCH) == STATE_ON
+
+
+async def test_drift_from_a_command_is_detected(hass, actuator, services):
+    """A state change away from the commanded value is reported as drift."""
+    await actuator.async_turn_on(POWER_SWITCH)
+    assert not actuator.async_observe(hass.states.get(POWER_SWITCH))
+
+    hass.states.async_set(POWER_SWITCH, STATE_OFF)
+    assert actuator.async_observe(hass.states.get(POWER_SWITCH))
+    assert await actuator.async_turn_on(POWER_SWITCH)
+    assert services.count(service="turn_on") == 2
+
+
+async def test_level_change_touches_only_two_switches(hass, actuator, services):
+    """Changing level turns the old switch off and the new one on."""
+    assert await actuator.async_set_level(LEVEL_SWITCHES, 2)
+    # The thermostat feeds the confirmed states back from its state listener
+    actuator.async_observe(hass.states.get(LEVEL_SWITCHES[1]))
+    assert await actuator.async_set_level(LEVEL_SWITCHES, 4)
+    assert [(call.service, call.entity_ids) for call in services.calls] == [
+        ("turn_on", [LEVEL_SWITCHES[1]]),
+        ("turn_off", [LEVEL_SWITCHES[1]]),
+        ("turn_on", [LEVEL_SWITCHES[3]]),
+    ]
+
+
+async def test_commands_survive_storage(hass, actuator, services):
+    """Restored commanded values detect drift right after a restart."""
+    await actuator.async_turn_on(POWER_SWITCH)
+    restored = ActuatorController(hass)
+    restored.async_load(actuator.as_dict())
+    assert restored.commanded(POWER_SWITCH) == STATE_ON
+
+    hass.states.async_set(POWER_SWITCH, STATE_OFF)
+    assert restored.async_observe(hass.states.get(POWER_SWITCH))
@@ -0,0 +1,172 @@
+"""Tests for the relay-feedback autotuning of the PID gains."""
+from __future__ import annotations
+
+import math
+
+import pytest
+from homeassistant.components.climate import HVACMode
+from homeassistant.exceptions import HomeAssistantError
+
+from smart_selecting_thermostat.autotune import RelayAutotuner, relay_gains
+from smart_selecting_thermostat.const import (
+    ATTR_AUTOTUNE,
+    AUTOTUNE_ABORTED,
+    AUTOTUNE_FINISHED,
+    AUTOTUNE_RUNNING,
+    CONF_PID_KD,
+    CONF_PID_KI,
+    CONF_PID_KP,
+    DOMAIN,
+    SERVICE_ABORT_AUTOTUNE,
+    SERVICE_START_AUTOTUNE,
+    SOURCE_PELLET,
+)
+from smart_selecting_thermostat.flight_recorder import FlightReplay, read_log
+
+HOUR = 3600
+
+
+def oscillate(
+    tuner: RelayAutotuner, amplitude: float, period: float, until: float
+) -> list[int]:
+    """Feed the tuner a sine around its setpoint and return the levels."""
+    levels = []
+    now = 0.0
+    while tuner.running and now < until:
+        now += 10.0
+        temperature = tuner.setpoint + amplitude * math.sin(
+            2 * math.pi * now / period + math.pi
+        )
+        levels.append(tuner.update(now, temperature))
+    return levels
+
+
+def test_steady_oscillation_gives_the_ultimate_gain_and_period():
+    """The describing function of the relay gives the ultimate gain."""
+    tuner = RelayAutotuner(68.0, 0.0, high_level=4, low_level=1, hysteresis=0.2)
+    levels = oscillate(tuner, 1.0, HOUR, until=12 * HOUR)
+
+    assert tuner.state == AUTOTUNE_FINISHED
+    assert set(levels) == {1, 4}
+    assert tuner.ultimate_period == pytest.approx(HOUR, abs=10)
+    assert tuner.ultimate_gain == pytest.approx(
+        4 * 1.5 / (math.pi * math.sqrt(1.0 - 0.2**2)), rel=0.01
+    )
+    assert tuner.gains == relay_gains(tuner.ultimate_gain, tuner.ultimate_period)
+    # Settling oscillation plus the consistent ones
+    assert len(levels) * 10 < (1 + tuner.settle_cycles + tuner.cycles) * HOUR
+
+
+def test_gains_follow_the_tyreus_luyben_pi_rule():
+    """The gains are per second and have no derivative term."""
+    kp, ki, kd = relay_gains(6.4, 3600.0)
+    assert kp == pytest.approx(2.0)
+    assert ki == pytest.approx(2.0 / (2.2 * 3600))
+    assert kd == 0.0
+
+
+def test_experiment_aborts_outside_the_allowed_band():
+    """A temperature too far from the setpoint ends the experiment."""
+    tuner = RelayAutotuner(68.0, 0.0, max_deviation=3.0)
+    assert tuner.update(60.0, 67.0) == tuner.high_level
+    tuner.update(120.0, 64.5)
+    assert tuner.state == AUTOTUNE_ABORTED
+    assert tuner.reason == "out_of_bounds"
+    assert tuner.gains is None
+
+
+def test_experiment_aborts_when_it_does_not_settle():
+    """Without a steady oscillation the experiment times out."""
+    tuner = RelayAutotuner(68.0, 0.0, max_duration=6 * HOUR)
+    oscillate(tuner, 0.1, HOUR, until=7 * HOUR)
+    assert tuner.state == AUTOTUNE_ABORTED
+    assert tuner.reason == "timeout"
+
+
+def test_levels_must_form_a_relay():
+    """The high level must be above the low level."""
+    with pytest.raises(ValueError):
+        RelayAutotuner(68.0, 0.0, high_level=2, low_level=2)
+
+
+async def call(harness, service: str, **data) -> None:
+    """Call a thermostat service on the zone of ``harness``."""
+    await harness.hass.services.async_call(
+        DOMAIN,
+        service,
+        {"entity_id": harness.thermostat.entity_id, **data},
+        blocking=True,
+    )
+
+
+async def test_autotune_saves_and_applies_the_gains(harness):
+    """A finished experiment writes the gains to the options of the zone."""
+    thermostat = await harness.async_setup(platforms=["climate"])
+    await thermostat.async_set_temperature(temperature=68.0)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(6 * HOUR)
+
+    await call(harness, SERVICE_START_AUTOTUNE)
+    assert thermostat.extra_state_attributes[ATTR_AUTOTUNE]["state"] == (
+        AUTOTUNE_RUNNING
+    )
+    for _ in range(16):
+        await harness.async_run(HOUR)
+        if not thermostat._autotune.running:
+            break
+    assert thermostat._autotune.state == AUTOTUNE_FINISHED
+    assert thermostat._active_source == SOURCE_PELLET
+    await harness.clock.async_settle(harness.hass)
+
+    kp, ki, kd = thermostat._autotune.gains
+    assert harness.entry.options == {
+        CONF_PID_KP: kp,
+        CONF_PID_KI: ki,
+        CONF_PID_KD: kd,
+    }
+    # Applied to the running zone without a reload
+    tuned = harness.find_thermostat()
+    assert tuned is thermostat
+    assert tuned._pid_gains == (kp, ki, kd)
+    assert (tuned._pid_controller.kp, tuned._pid_controller.ki) == (kp, ki)
+    assert tuned.hvac_mode == HVACMode.HEAT
+
+    # The tuned zone holds the target without chattering
+    since = harness.clock.elapsed
+    low = high = harness.house.inside
+    for _ in range(12):
+        await harness.async_run(HOUR)
+        low = min(low, harness.house.inside)
+        high = max(high, harness.house.inside)
+    assert 67.0 <= low and high <= 69.0
+    assert harness.services.count(since=since) <= 12 * 4
+
+    # The experiment does not confuse the replay of the log
+    report = FlightReplay().run(read_log(tuned._flight_recorder.path))
+    assert report.diffs == []
+
+
+async def test_autotune_can_be_aborted(harness):
+    """Aborting hands the stove back to the PID without saving gains."""
+    thermostat = await harness.async_setup(platforms=["climate"])
+    await thermostat.async_set_temperature(temperature=68.0)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(6 * HOUR)
+
+    await call(harness, SERVICE_START_AUTOTUNE, high_level=5, low_level=2)
+    await harness.async_run(HOUR)
+    await call(harness, SERVICE_ABORT_AUTOTUNE)
+    attributes = thermostat.extra_state_attributes[ATTR_AUTOTUNE]
+    assert attributes == {"state": AUTOTUNE_ABORTED, "cycles": 0, "reason": "aborted"}
+    assert harness.entry.options == {}
+
+    await harness.async_run(2 * HOUR)
+    assert harness.find_thermostat() is thermostat
+    assert 67.0 <= harness.house.inside <= 69.0
+
+
+async def test_autotune_needs_a_heating_zone(harness):
+    """The experiment is refused while the thermostat is off."""
+    await harness.async_setup(platforms=["climate"])
+    with pytest.raises(HomeAssistantError):
+        await call(harness, SERVICE_START_AUTOTUNE)
@@ -0,0 +1,61 @@
+"""Tests for the recorder history replay."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from homeassistant.const import STATE_ON
+from homeassistant.core import State
+
+from smart_selecting_thermostat.bootstrap import HistoryReplay
+from smart_selecting_thermostat.const import TEMP_TREND_PERIOD
+from smart_selecting_thermostat.heating_model import SourceRateModels
+from smart_selecting_thermostat.sensor_fusion import SensorFusion
+from smart_selecting_thermostat.temperature_history import TemperatureHistory
+
+START = datetime(2024, 1, 15, tzinfo=timezone.utc)
+
+
+def make_replay(outside: list[str]) -> HistoryReplay:
+    """Return a replay of one inside sensor and ``outside``."""
+    return HistoryReplay(
+        SensorFusion(["sensor.inside"]),
+        SensorFusion(outside),
+        "climate.minisplit",
+        "switch.pellet_power",
+        TemperatureHistory(TEMP_TREND_PERIOD, 64),
+        SourceRateModels(),
+        68.0,
+    )
+
+
+def recorded(
+    entity_id: str,
+    state: str,
+    minute: int,
+    attributes: Optional[dict[str, Any]] = None,
+) -> State:
+    """Return a recorded state ``minute`` minutes into the replay."""
+    when = START + timedelta(minutes=minute)
+    return State(entity_id, state, attributes, last_changed=when, last_updated=when)
+
+
+def test_attributes_are_read_only_for_weather_entities():
+    """Plain sensors are replayed without their attributes."""
+    assert not make_replay(["sensor.outside"]).needs_attributes
+    assert make_replay(["sensor.outside", "weather.home"]).needs_attributes
+
+
+def test_weather_temperature_is_replayed():
+    """The outside temperature of a weather entity comes from its attribute."""
+    replay = make_replay(["weather.home"])
+    replay.feed_all(
+        [
+            recorded("switch.pellet_power", STATE_ON, 0),
+            recorded("weather.home", "cloudy", 0, {"temperature": 28.0}),
+            recorded("sensor.inside", "64.0", 1),
+        ]
+    )
+    assert replay.result.outside_temp == 28.0
+    assert replay.result.inside_temp == 64.0
+    assert replay.result.samples == 1
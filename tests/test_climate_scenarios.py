@@ -0,0 +1,370 @@
+"""Multi-day scenarios of the thermostat on the virtual clock.
+
+Each scenario runs the real integration against the simulated house, so a
+day of control behaviour takes a couple of seconds. Besides comfort, the
+scenarios bound the service calls and control passes per simulated hour:
+a regression that makes the thermostat chatter shows up here first.
+"""
+from __future__ import annotations
+
+import pytest
+from homeassistant.components.climate import HVACMode
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import restore_state
+
+import smart_selecting_thermostat as integration
+from smart_selecting_thermostat.const import (
+    ATTR_FAULTY_SENSORS,
+    ATTR_SENSOR_HEALTH,
+    CONF_INSIDE_TEMP_SENSOR,
+    CONF_MIN_OUTSIDE_TEMP,
+    CONF_PELLET_POWER_SWITCH,
+    CONF_PID_KI,
+    CONF_PID_KP,
+    DATA_COORDINATOR,
+    DOMAIN,
+    MAX_LEVEL_CHANGES_PER_HOUR,
+    MODE_MPC,
+    MODE_ON_OFF,
+    MODE_PID,
+    PID_SAMPLE_JITTER,
+    PID_SAMPLE_TIME,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    TICK_MIN_INTERVAL,
+)
+from smart_selecting_thermostat.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from smart_selecting_thermostat.flight_recorder import FlightReplay, read_log
+from smart_selecting_thermostat.pid_controller import PelletStovePIDController
+
+from .common import (
+    INSIDE_SENSOR,
+    LEVEL_SWITCHES,
+    POWER_SWITCH,
+    ThermostatHarness,
+    VirtualClock,
+)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Control passes per hour: one per coordinator tick plus a few for
+# sensor changes and held back relay changes
+MAX_PASSES_PER_HOUR = 3600 / TICK_MIN_INTERVAL + 5
+# A settled zone backs off to a tick every few minutes
+MAX_SETTLED_PASSES_PER_HOUR = 15
+
+
+async def start(harness: ThermostatHarness, target: float = 68.0, **options):
+    """Set up a zone, heat to ``target`` and return the thermostat."""
+    thermostat = await harness.async_setup(platforms=["climate"], **options)
+    await thermostat.async_set_temperature(temperature=target)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    return thermostat
+
+
+def level_changes_per_hour(harness: ThermostatHarness, since: float) -> list[int]:
+    """Return the stove level changes in each hour after ``since``."""
+    hours: dict[int, int] = {}
+    for call in harness.services.calls:
+        if (
+            call.time >= since
+            and call.service == "turn_on"
+            and set(call.entity_ids) & set(LEVEL_SWITCHES)
+        ):
+            hour = int((call.time - since) // HOUR)
+            hours[hour] = hours.get(hour, 0) + 1
+    return list(hours.values())
+
+
+@pytest.mark.parametrize(
+    ("mode", "max_calls_per_hour"),
+    [(MODE_PID, 8), (MODE_ON_OFF, 3), (MODE_MPC, 3)],
+)
+async def test_cold_weather_is_heated_by_the_stove(
+    harness, mode, max_calls_per_hour
+):
+    """Below the minimum outside temperature the stove holds the target."""
+    thermostat = await start(harness, control_mode=mode)
+
+    # Warm up from 62°F, then hold for a day
+    await harness.async_run(12 * HOUR)
+    assert thermostat._active_source == SOURCE_PELLET
+    since = harness.clock.elapsed
+    passes = harness.stats.passes
+    low = high = harness.house.inside
+    for _ in range(24):
+        await harness.async_run(HOUR)
+        low = min(low, harness.house.inside)
+        high = max(high, harness.house.inside)
+
+    assert 66.5 <= low and high <= 69.5
+    assert harness.services.count(since=since) <= 24 * max_calls_per_hour
+    assert harness.stats.passes - passes <= 24 * MAX_PASSES_PER_HOUR
+    assert max(level_changes_per_hour(harness, since), default=0) <= (
+        MAX_LEVEL_CHANGES_PER_HOUR
+    )
+
+
+async def test_mild_weather_settles_on_the_minisplit(clock, hass):
+    """Above the minimum outside temperature the mini-split holds the target."""
+    harness = ThermostatHarness(hass, clock, outside=lambda elapsed: 50.0)
+    thermostat = await start(harness)
+
+    await harness.async_run(12 * HOUR)
+    assert thermostat._active_source == SOURCE_MINISPLIT
+    since = harness.clock.elapsed
+    passes = harness.stats.passes
+    await harness.async_run(DAY)
+
+    # A settled house needs no service calls and few control passes
+    assert harness.services.count(since=since) == 0
+    assert harness.services.count("climate", "set_temperature") == 1
+    assert 67.0 <= harness.house.inside <= 69.0
+    assert harness.stats.passes - passes <= 24 * MAX_SETTLED_PASSES_PER_HOUR
+    assert thermostat.tick_interval > TICK_MIN_INTERVAL
+
+
+async def test_settled_zone_reacts_to_a_cold_snap(clock, hass):
+    """Backing off the ticks does not delay the reaction to a real change."""
+    harness = ThermostatHarness(
+        hass, clock, outside=lambda elapsed: 50.0 if elapsed < 12 * HOUR else 30.0
+    )
+    thermostat = await start(harness)
+    await harness.async_run(12 * HOUR - 60)
+    assert thermostat._active_source == SOURCE_MINISPLIT
+    assert thermostat.tick_interval > TICK_MIN_INTERVAL
+
+    # The outside sensor reports the cold snap with the next reading
+    await harness.async_run(60)
+    await harness.async_run(TICK_MIN_INTERVAL)
+    assert thermostat._active_source == SOURCE_PELLET
+    assert harness.house.stove_level() > 0
+
+
+async def test_target_change_is_applied_right_away(clock, hass):
+    """A new target is sent without waiting for the next coordinator tick."""
+    harness = ThermostatHarness(hass, clock, outside=lambda elapsed: 50.0)
+    thermostat = await start(harness)
+    await harness.async_run(12 * HOUR)
+
+    changed_at = harness.clock.elapsed
+    await thermostat.async_set_temperature(temperature=70.0)
+    await harness.clock.async_settle(harness.hass)
+    call = harness.services.calls[-1]
+    assert (call.domain, call.service) == ("climate", "set_temperature")
+    assert call.data["temperature"] == 70.0
+    assert call.time == pytest.approx(changed_at, abs=1)
+
+
+async def test_turning_off_stops_every_source(harness):
+    """Turning the thermostat off switches everything off and stays quiet."""
+    thermostat = await start(harness)
+    await harness.async_run(2 * HOUR)
+    assert harness.house.stove_level() > 0
+
+    await thermostat.async_set_hvac_mode(HVACMode.OFF)
+    await harness.clock.async_settle(harness.hass)
+    call = harness.services.calls[-1]
+    # The mini-split is already off, so only the stove needs a call
+    assert (call.service, call.entity_ids) == ("turn_off", [POWER_SWITCH])
+    assert harness.house.stove_level() == 0
+    assert harness.house.minisplit_setpoint() is None
+
+    since = harness.clock.elapsed
+    await harness.async_run(6 * HOUR)
+    assert harness.services.count(since=since) == 0
+
+
+async def test_heating_starts_right_after_an_idle_period(harness):
+    """Switching an idle zone to heat acts at once, not on the idle tick."""
+    thermostat = await harness.async_setup(platforms=["climate"])
+    await thermostat.async_set_temperature(temperature=68.0)
+    await harness.async_run(HOUR)
+    coordinator = harness.hass.data[DOMAIN][DATA_COORDINATOR]
+    assert coordinator._next_tick - harness.hass.loop.time() > TICK_MIN_INTERVAL
+    since = harness.clock.elapsed
+
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.clock.async_settle(harness.hass)
+    assert harness.services.count(service="turn_on", since=since) >= 1
+    # Ticks fall on whole seconds plus the coordinator's offset
+    assert coordinator._next_tick - harness.hass.loop.time() <= TICK_MIN_INTERVAL + 1
+
+
+async def test_steady_sensors_are_not_faulty(clock, hass):
+    """Sensors that keep showing one value are steady, not silent."""
+    harness = ThermostatHarness(hass, clock, outside=lambda elapsed: 62.0)
+    thermostat = await harness.async_setup(platforms=["climate"])
+    await thermostat.async_set_temperature(temperature=68.0)
+    await harness.async_run(3 * HOUR)
+    assert harness.house.inside == 62.0
+
+    attributes = thermostat.extra_state_attributes
+    assert ATTR_FAULTY_SENSORS not in attributes
+    assert attributes[ATTR_SENSOR_HEALTH] == {"inside": 1.0, "outside": 1.0}
+    assert thermostat.current_temperature == 62.0
+
+
+async def test_pid_runs_on_the_sample_time(harness, monkeypatch):
+    """The PID output is recomputed at most once per sample time."""
+    await start(harness)
+    computed_at = []
+    compute = PelletStovePIDController.compute
+
+    def spy(pid, current_temp, target_temp):
+        output = compute(pid, current_temp, target_temp)
+        if not computed_at or pid._last_time != computed_at[-1]:
+            computed_at.append(pid._last_time)
+        return output
+
+    monkeypatch.setattr(PelletStovePIDController, "compute", spy)
+    await harness.async_run(6 * HOUR)
+
+    assert len(computed_at) > 100
+    gaps = [later - earlier for earlier, later in zip(computed_at, computed_at[1:])]
+    assert min(gaps) >= PID_SAMPLE_TIME - PID_SAMPLE_JITTER
+
+
+async def test_ticks_stop_with_the_last_zone(harness):
+    """Unloading the only zone cancels the coordinator's pending tick."""
+    await start(harness)
+    await harness.async_run(HOUR)
+    coordinator = harness.hass.data[DOMAIN][DATA_COORDINATOR]
+    assert coordinator._unsub_tick is not None
+
+    assert await integration.async_unload_entry(harness.hass, harness.entry)
+    await harness.clock.async_settle(harness.hass)
+    assert coordinator._unsub_tick is None
+    passes = harness.stats.passes
+    await harness.async_run(HOUR)
+    assert harness.stats.passes == passes
+
+
+async def test_scenarios_are_deterministic(tmp_path):
+    """The same scenario sends the same service calls at the same times."""
+    runs = []
+    for run in range(2):
+        clock = VirtualClock()
+        clock.start_patches()
+        hass = HomeAssistant(str(tmp_path / str(run)))
+        try:
+            await restore_state.async_load(hass)
+            harness = ThermostatHarness(hass, clock)
+            await start(harness)
+            await harness.async_run(6 * HOUR)
+            runs.append(
+                [
+                    (round(call.time), call.service, tuple(call.entity_ids))
+                    for call in harness.services.calls
+                ]
+            )
+        finally:
+            await hass.async_stop(force=True)
+            clock.stop_patches()
+
+    assert runs[0] and runs[0] == runs[1]
+
+
+async def test_options_apply_to_the_running_zone(harness):
+    """New gains and thresholds apply within a tick and keep what was learned."""
+    thermostat = await start(harness)
+    await harness.async_run(6 * HOUR)
+    assert thermostat._active_source == SOURCE_PELLET
+    history = len(thermostat._temp_history)
+    integral = thermostat._pid_controller._integral
+    passes = harness.stats.passes
+
+    await harness.hass.config_entries.options.async_init(
+        harness.entry.entry_id,
+        data={CONF_PID_KP: 2.0, CONF_PID_KI: 0.0005, CONF_MIN_OUTSIDE_TEMP: 20},
+    )
+    await harness.clock.async_settle(harness.hass)
+    assert harness.find_thermostat() is thermostat
+    assert harness.stats.passes > passes
+    assert thermostat._source_selector.min_outside_temp == 20
+    assert (thermostat._pid_controller.kp, thermostat._pid_controller.ki) == (
+        2.0,
+        0.0005,
+    )
+    assert len(thermostat._temp_history) >= history
+    assert thermostat._pid_controller._integral == pytest.approx(integral, abs=0.5)
+
+    await harness.async_run(2 * HOUR)
+    assert 67.0 <= harness.house.inside <= 69.0
+    # The replay picks the new settings up where they were applied
+    report = FlightReplay().run(read_log(thermostat._flight_recorder.path))
+    assert report.diffs == []
+
+
+async def test_new_entities_reload_the_zone(harness):
+    """Options that change the entities set the zone up again."""
+    thermostat = await start(harness)
+    await harness.async_run(HOUR)
+    harness.hass.states.async_set("sensor.bedroom_temperature", "66.0")
+
+    await harness.hass.config_entries.options.async_init(
+        harness.entry.entry_id,
+        data={CONF_INSIDE_TEMP_SENSOR: [INSIDE_SENSOR, "sensor.bedroom_temperature"]},
+    )
+    await harness.clock.async_settle(harness.hass)
+    reloaded = harness.find_thermostat()
+    assert reloaded is not thermostat
+    assert reloaded._inside_temp_sensors == [
+        INSIDE_SENSOR,
+        "sensor.bedroom_temperature",
+    ]
+    assert reloaded.hvac_mode == HVACMode.HEAT
+
+
+async def test_reload_keeps_the_running_stove(harness):
+    """A reload neither counts a new ignition nor restarts the run time."""
+    thermostat = await start(harness)
+    await harness.async_run(12 * HOUR)
+    assert thermostat._active_source == SOURCE_PELLET
+    ignitions = harness.stats.ignitions
+    level = thermostat._relay_scheduler.level
+    harness.hass.states.async_set("sensor.bedroom_temperature", "66.0")
+
+    await harness.hass.config_entries.options.async_init(
+        harness.entry.entry_id,
+        data={CONF_INSIDE_TEMP_SENSOR: [INSIDE_SENSOR, "sensor.bedroom_temperature"]},
+    )
+    await harness.clock.async_settle(harness.hass)
+    reloaded = harness.find_thermostat()
+    assert reloaded is not thermostat
+    assert reloaded._relay_scheduler.source == SOURCE_PELLET
+    assert reloaded._relay_scheduler.level == level
+    assert reloaded._relay_scheduler.next_change_at() is None
+
+    await harness.async_run(HOUR)
+    assert harness.stats.ignitions == ignitions
+
+
+async def test_relay_sensors_follow_new_switches(harness):
+    """After a reload for a new power switch its actuations are counted."""
+    await harness.async_setup(platforms=["climate", "sensor"])
+    harness.hass.states.async_set("switch.stove_power", "off")
+
+    await harness.hass.config_entries.options.async_init(
+        harness.entry.entry_id,
+        data={CONF_PELLET_POWER_SWITCH: "switch.stove_power"},
+    )
+    await harness.clock.async_settle(harness.hass)
+    unique_ids = {
+        entity.unique_id
+        for entity_platform in harness.hass.config_entries.platforms[
+            harness.entry.entry_id
+        ]
+        for entity in entity_platform.entities.values()
+    }
+    entry_id = harness.entry.entry_id
+    assert f"{entry_id}_relay_actuations_switch.stove_power" in unique_ids
+    assert f"{entry_id}_relay_actuations_{POWER_SWITCH}" not in unique_ids
+
+    diagnostics = await async_get_config_entry_diagnostics(
+        harness.hass, harness.entry
+    )
+    assert diagnostics["config"][CONF_PELLET_POWER_SWITCH] == "switch.stove_power"
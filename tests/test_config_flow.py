@@ -0,0 +1,259 @@
+"""Tests for the Smart Thermostat config flow."""
+from __future__ import annotations
+
+import pytest
+from homeassistant.components.climate import ClimateEntityFeature, HVACMode
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.helpers import entity_registry as er
+
+from smart_selecting_thermostat.config_flow import SmartThermostatConfigFlow
+from smart_selecting_thermostat.const import (
+    CONF_COP_CURVE,
+    CONF_ELECTRICITY_PRICE_ENTITY,
+    CONF_INSIDE_TEMP_SENSOR,
+    CONF_MINISPLIT_ENTITY,
+    CONF_OUTSIDE_TEMP_SENSOR,
+    CONF_PID_KD,
+    CONF_PID_KI,
+    CONF_PID_KP,
+    CONF_SCHEDULE,
+    CONF_TARGET_TIMEOUT,
+    DOMAIN,
+)
+
+from .common import (
+    INSIDE_SENSOR,
+    LEVEL_SWITCHES,
+    MINISPLIT,
+    OUTSIDE_SENSOR,
+    POWER_SWITCH,
+    ZONE_CONFIG,
+)
+
+
+@pytest.fixture
+async def flow(hass):
+    """Return a user config flow with the heating devices present."""
+    await er.async_load(hass)
+    for entity_id in (MINISPLIT, POWER_SWITCH, *LEVEL_SWITCHES):
+        hass.states.async_set(entity_id, "off")
+    for entity_id in (INSIDE_SENSOR, OUTSIDE_SENSOR):
+        hass.states.async_set(entity_id, "60")
+    flow = SmartThermostatConfigFlow()
+    flow.hass = hass
+    flow.handler = DOMAIN
+    flow.flow_id = "test"
+    flow.context = {"source": "user"}
+    return flow
+
+
+async def test_form_is_shown(flow):
+    """Without input the form is shown without errors."""
+    result = await flow.async_step_user()
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "user"
+    assert result["errors"] == {}
+
+
+async def test_entry_is_created(flow):
+    """Valid input creates the config entry."""
+    result = await flow.async_step_user(dict(ZONE_CONFIG))
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["title"] == "Smart Thermostat"
+    assert result["data"] == ZONE_CONFIG
+
+
+async def test_single_outside_sensor_is_accepted(flow):
+    """A single sensor from an older configuration is still valid."""
+    result = await flow.async_step_user(
+        {**ZONE_CONFIG, CONF_OUTSIDE_TEMP_SENSOR: OUTSIDE_SENSOR}
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+
+
+@pytest.mark.parametrize(
+    ("changes", "error"),
+    [
+        ({CONF_MINISPLIT_ENTITY: "climate.missing"}, "Mini-split entity not found"),
+        (
+            {CONF_OUTSIDE_TEMP_SENSOR: [OUTSIDE_SENSOR, "sensor.missing"]},
+            "Outside temperature sensor sensor.missing not found",
+        ),
+        (
+            {CONF_ELECTRICITY_PRICE_ENTITY: "sensor.missing_price"},
+            "Electricity price entity not found",
+        ),
+        (
+            {CONF_COP_CURVE: "not a curve"},
+            "Invalid COP curve, expected temp:cop pairs",
+        ),
+        (
+            {CONF_SCHEDULE: "weekdays 06:30=68"},
+            "Invalid schedule, expected days HH:MM=temp",
+        ),
+    ],
+)
+async def test_invalid_input_shows_an_error(flow, changes, error):
+    """Missing entities and malformed settings are reported on the form."""
+    result = await flow.async_step_user({**ZONE_CONFIG, **changes})
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {"base": error}
+
+
+async def test_every_problem_is_reported_at_once(flow, hass):
+    """Capabilities, values and units of all entities are checked together."""
+    hass.states.async_set(
+        MINISPLIT,
+        HVACMode.OFF,
+        {"supported_features": ClimateEntityFeature.FAN_MODE, "hvac_modes": ["cool"]},
+    )
+    hass.states.async_set(INSIDE_SENSOR, "warm")
+    hass.states.async_set(OUTSIDE_SENSOR, "55", {"unit_of_measurement": "%"})
+    result = await flow.async_step_user(
+        {**ZONE_CONFIG, CONF_COP_CURVE: "not a curve"}
+    )
+    assert result["errors"]["base"].split("; ") == [
+        "Mini-split entity cannot set a target temperature",
+        "Mini-split entity cannot heat",
+        f"Outside temperature sensor {OUTSIDE_SENSOR} does not report a temperature",
+        f"Inside temperature sensor {INSIDE_SENSOR} is not numeric",
+        "Invalid COP curve, expected temp:cop pairs",
+    ]
+
+
+async def test_capable_devices_are_accepted(flow, hass):
+    """Sensors in °C and sensors that have not reported yet are accepted."""
+    hass.states.async_set(
+        MINISPLIT,
+        HVACMode.OFF,
+        {
+            "supported_features": ClimateEntityFeature.TARGET_TEMPERATURE,
+            "hvac_modes": [HVACMode.OFF, HVACMode.HEAT],
+        },
+    )
+    hass.states.async_set(INSIDE_SENSOR, "19.5", {"unit_of_measurement": "°C"})
+    hass.states.async_set(OUTSIDE_SENSOR, "unavailable")
+    result = await flow.async_step_user(dict(ZONE_CONFIG))
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+
+
+async def test_disabled_entities_are_refused(flow, hass):
+    """An entity disabled in the registry is reported, not just missing."""
+    bedroom = er.async_get(hass).async_get_or_create(
+        "sensor",
+        "demo",
+        "bedroom",
+        suggested_object_id="bedroom_temperature",
+        disabled_by=er.RegistryEntryDisabler.USER,
+    )
+    result = await flow.async_step_user(
+        {**ZONE_CONFIG, CONF_INSIDE_TEMP_SENSOR: [INSIDE_SENSOR, bedroom.entity_id]}
+    )
+    assert result["errors"] == {
+        "base": f"Inside temperature sensor {bedroom.entity_id} is disabled"
+    }
+
+
+@pytest.fixture
+async def options_flow(hass):
+    """Return the options flow of a zone with gains entered at setup."""
+    await er.async_load(hass)
+    entry = ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title="Smart Thermostat",
+        data={**ZONE_CONFIG, CONF_PID_KP: 1.5},
+        source="user",
+        options={CONF_TARGET_TIMEOUT: 3600},
+    )
+    flow = SmartThermostatConfigFlow.async_get_options_flow(entry)
+    flow.hass = hass
+    flow.handler = entry.entry_id
+    flow.flow_id = "options"
+    flow.context = {}
+    return flow
+
+
+async def test_options_form_shows_the_current_gains(options_flow):
+    """The options form defaults to the gains in use."""
+    result = await options_flow.async_step_init()
+    assert result["type"] == FlowResultType.FORM
+    schema = result["data_schema"].schema
+    defaults = {
+        str(key): key.default() for key in schema if callable(key.default)
+    }
+    assert defaults == {CONF_PID_KP: 1.5, CONF_PID_KI: 0.1, CONF_PID_KD: 0.05}
+    # The rest suggest the current configuration
+    suggested = {
+        str(key): key.description["suggested_value"]
+        for key in schema
+        if not callable(key.default)
+    }
+    assert suggested[CONF_MINISPLIT_ENTITY] == MINISPLIT
+    assert suggested[CONF_TARGET_TIMEOUT] == 3600
+
+
+async def test_options_keep_the_other_options(options_flow):
+    """New gains are merged into the existing options."""
+    result = await options_flow.async_step_init(
+        {CONF_PID_KP: 2.0, CONF_PID_KI: 0.0002, CONF_PID_KD: 0.0}
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"] == {
+        CONF_TARGET_TIMEOUT: 3600,
+        CONF_PID_KP: 2.0,
+        CONF_PID_KI: 0.0002,
+        CONF_PID_KD: 0.0,
+    }
+
+
+async def test_negative_gains_are_refused(options_flow):
+    """Gains outside the allowed range are reported on the form."""
+    result = await options_flow.async_step_init({CONF_PID_KP: -1.0})
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"]["base"]
+
+
+async def test_options_change_the_schedule(options_flow):
+    """A valid schedule is saved, a malformed one is reported on the form."""
+    result = await options_flow.async_step_init({CONF_SCHEDULE: "daily 07:00=68"})
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_SCHEDULE] == "daily 07:00=68"
+
+    result = await options_flow.async_step_init({CONF_SCHEDULE: "daily 25:00=68"})
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {"base": "Invalid schedule, expected days HH:MM=temp"}
+
+
+async def test_options_check_new_entities(options_flow, hass):
+    """Entities changed in the options are validated like at setup."""
+    result = await options_flow.async_step_init(
+        {CONF_INSIDE_TEMP_SENSOR: ["sensor.missing"]}
+    )
+    assert result["errors"] == {
+        "base": "Inside temperature sensor sensor.missing not found"
+    }
+
+    hass.states.async_set("sensor.bedroom", "64", {"unit_of_measurement": "°F"})
+    result = await options_flow.async_step_init(
+        {CONF_INSIDE_TEMP_SENSOR: ["sensor.bedroom"]}
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_INSIDE_TEMP_SENSOR] == ["sensor.bedroom"]
+
+
+async def test_clearing_the_schedule_box_turns_it_off(options_flow):
+    """A cleared box is left out of the input and removes a setup schedule."""
+    entry = options_flow.config_entry
+    object.__setattr__(
+        entry, "data", {**entry.data, CONF_SCHEDULE: "daily 07:00=68"}
+    )
+    form = await options_flow.async_step_init()
+    schedule = next(key for key in form["data_schema"].schema if key == CONF_SCHEDULE)
+    assert schedule.description == {"suggested_value": "daily 07:00=68"}
+
+    result = await options_flow.async_step_init({CONF_PID_KP: 2.0})
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_SCHEDULE] == ""
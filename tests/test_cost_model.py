@@ -0,0 +1,80 @@
+"""Tests for the heat cost model."""
+from __future__ import annotations
+
+import pytest
+
+from smart_selecting_thermostat.const import (
+    BTU_PER_KWH,
+    PELLET_BTU_PER_LB,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+)
+from smart_selecting_thermostat.cost_model import (
+    CopCurve,
+    CostModel,
+    CostPlan,
+    PriceProfile,
+    parse_cop_curve,
+)
+
+
+def test_parse_cop_curve_sorts_the_points():
+    """Points are read as temp:cop pairs in any order."""
+    assert parse_cop_curve("47:3.9, -15:1.5,17:2.6") == [
+        (-15.0, 1.5),
+        (17.0, 2.6),
+        (47.0, 3.9),
+    ]
+
+
+@pytest.mark.parametrize("text", ["", "17:2.6", "17", "cold:2.0, 47:3.9"])
+def test_parse_cop_curve_rejects_bad_text(text):
+    """Too few points or malformed pairs raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_cop_curve(text)
+
+
+def test_cop_is_interpolated_and_clamped():
+    """The COP is linear between points and flat beyond the ends."""
+    curve = CopCurve([(0.0, 2.0), (40.0, 4.0)])
+    assert curve.cop(20) == pytest.approx(3.0)
+    assert curve.cop(10.4) == pytest.approx(2.5)
+    assert curve.cop(-30) == 2.0
+    assert curve.cop(90) == 4.0
+
+
+def test_cheaper_source_follows_the_outside_temperature():
+    """The mini-split wins when warm and the stove when cold."""
+    model = CostModel(CopCurve([(0.0, 1.0), (50.0, 4.0)]), 0.2, 0.8)
+    assert model.pellet_cost == pytest.approx(0.2 / (PELLET_BTU_PER_LB * 0.8) * 1e6)
+    assert model.minisplit_cost(50, 0.15) == pytest.approx(
+        0.15 / (4.0 * BTU_PER_KWH) * 1e6
+    )
+    assert model.cheaper_source(50, 0.15) == SOURCE_MINISPLIT
+    assert model.cheaper_source(0, 0.15) == SOURCE_PELLET
+
+
+def test_plan_skips_stove_runs_shorter_than_the_run_time():
+    """A short cheap stove spell is not worth an ignition."""
+    sources = [SOURCE_MINISPLIT, SOURCE_PELLET, SOURCE_MINISPLIT]
+    sources += [SOURCE_PELLET] * 3
+    plan = CostPlan(0.0, sources, 2 * 3600)
+    assert plan.source_at(3600, SOURCE_MINISPLIT) == SOURCE_MINISPLIT
+    assert plan.source_at(3600, SOURCE_PELLET) == SOURCE_PELLET
+    assert plan.source_at(3 * 3600, SOURCE_MINISPLIT) == SOURCE_PELLET
+    assert plan.source_at(6 * 3600, SOURCE_PELLET) is None
+    assert plan.source_at(-1, SOURCE_PELLET) is None
+
+
+def test_price_profile_learns_each_hour():
+    """Prices are smoothed per hour of the day and survive storage."""
+    profile = PriceProfile(smoothing=0.5)
+    assert profile.price_at(0.0, 0.12) == 0.12
+    profile.observe(0.0, 0.30)
+    profile.observe(86400.0, 0.10)
+    assert profile.price_at(2 * 86400.0, 0.12) == pytest.approx(0.20)
+    assert profile.price_at(3600.0, 0.12) == 0.12
+
+    restored = PriceProfile()
+    restored.load(profile.as_list())
+    assert restored.as_list() == profile.as_list()
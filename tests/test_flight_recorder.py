@@ -0,0 +1,149 @@
+"""Tests for the flight recorder and its replay."""
+from __future__ import annotations
+
+import os
+
+import pytest
+from homeassistant.components.climate import HVACMode
+
+from smart_selecting_thermostat.const import (
+    CONF_PID_KI,
+    CONF_PID_KP,
+    MODE_ON_OFF,
+    MODE_PID,
+    REASON_AUTOTUNE,
+    SOURCE_PELLET,
+)
+from smart_selecting_thermostat.flight_recorder import (
+    RECORD,
+    RECORD_LEVEL,
+    RECORD_PASS,
+    RECORD_TARGET,
+    FlightRecorder,
+    FlightReplay,
+    main,
+    read_log,
+)
+
+HOUR = 3600
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    """Return the path of a flight recorder log."""
+    return str(tmp_path / "zone.flight")
+
+
+def test_oldest_records_are_overwritten(path):
+    """A full log keeps the newest records, in the order they were written."""
+    recorder = FlightRecorder(path, capacity=8, time_fn=lambda: 0.0)
+    recorder.open()
+    for temperature in range(20):
+        recorder.target(float(temperature))
+    recorder.close()
+
+    assert os.path.getsize(path) == 9 * RECORD.size
+    records = read_log(path)
+    assert [record.seq for record in records] == list(range(13, 21))
+    assert [record.x for record in records] == [float(t) for t in range(12, 20)]
+    assert {record.kind for record in records} == {RECORD_TARGET}
+
+
+def test_log_continues_after_a_restart(path):
+    """Reopening a log appends after its last record."""
+    recorder = FlightRecorder(path, capacity=8, time_fn=lambda: 0.0)
+    recorder.open()
+    recorder.target(68.0)
+    recorder.close()
+
+    recorder.open()
+    assert recorder.seq == 1
+    recorder.target(70.0)
+    recorder.close()
+    assert [record.x for record in read_log(path)] == [68.0, 70.0]
+
+
+def test_log_with_another_capacity_is_started_afresh(path):
+    """A log written with another layout is not misread."""
+    recorder = FlightRecorder(path, capacity=8, time_fn=lambda: 0.0)
+    recorder.open()
+    recorder.target(68.0)
+    recorder.close()
+
+    recorder = FlightRecorder(path, capacity=16, time_fn=lambda: 0.0)
+    recorder.open()
+    assert recorder.seq == 0
+    recorder.close()
+    assert read_log(path) == []
+
+
+def test_closed_recorder_writes_nothing(path):
+    """Recording before the log is opened is a no-op."""
+    recorder = FlightRecorder(path)
+    recorder.target(68.0)
+    assert recorder.seq == 0
+    assert not os.path.exists(path)
+
+
+def test_source_reasons_are_decoded(path):
+    """Every reason the thermostat gives survives the round trip."""
+    recorder = FlightRecorder(path, time_fn=lambda: 0.0)
+    recorder.open()
+    recorder.source(SOURCE_PELLET, REASON_AUTOTUNE, SOURCE_PELLET)
+    recorder.close()
+
+    assert "reason=autotune " in read_log(path)[0].describe()
+
+
+@pytest.mark.parametrize("mode", [MODE_PID, MODE_ON_OFF])
+async def test_replay_reproduces_the_recorded_decisions(harness, mode):
+    """Replaying a log with the same code and settings finds no differences."""
+    thermostat = await harness.async_setup(platforms=["climate"], control_mode=mode)
+    await thermostat.async_set_temperature(temperature=68.0)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(6 * HOUR)
+
+    records = read_log(thermostat._flight_recorder.path)
+    kinds = {record.kind for record in records}
+    assert {RECORD_PASS, RECORD_LEVEL} <= kinds
+
+    report = FlightReplay().run(records)
+    assert report.passes > 300
+    assert report.levels > 300
+    assert report.diffs == []
+
+
+async def test_replay_diffs_changed_settings(harness):
+    """Replaying with other settings reports the decisions that change."""
+    thermostat = await harness.async_setup(platforms=["climate"])
+    await thermostat.async_set_temperature(temperature=68.0)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(6 * HOUR)
+    records = read_log(thermostat._flight_recorder.path)
+
+    # The stove was lit because it is 30°F outside
+    report = FlightReplay(min_outside_temp=20.0).run(records)
+    assert {diff.field for diff in report.diffs} >= {"source"}
+    assert report.diffs[0].recorded == "pellet_stove"
+    assert report.diffs[0].replayed == "mini_split"
+
+    report = FlightReplay(gains=(3.0, 0.1, 0.05)).run(records)
+    assert report.diffs
+    assert {diff.field for diff in report.diffs} == {"level"}
+
+
+async def test_command_line_overrides_only_the_gains_given(harness, capsys):
+    """The gains left off the command line are the recorded ones."""
+    thermostat = await harness.async_setup(
+        platforms=["climate"], **{CONF_PID_KP: 2.0, CONF_PID_KI: 0.0005}
+    )
+    await thermostat.async_set_temperature(temperature=68.0)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(6 * HOUR)
+    path = thermostat._flight_recorder.path
+
+    main([path, "--kp", "2.0"])
+    assert "differences: 0\n" in capsys.readouterr().out
+
+    main([path, "--ki", "0.1"])
+    assert "differences: 0\n" not in capsys.readouterr().out
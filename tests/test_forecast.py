@@ -0,0 +1,57 @@
+"""Tests for the forecast based source schedule."""
+from __future__ import annotations
+
+import pytest
+
+from smart_selecting_thermostat.const import SOURCE_PELLET
+from smart_selecting_thermostat.forecast import ForecastSchedule
+
+HOUR = 3600
+
+
+def schedule(temperatures: list[float], **kwargs) -> ForecastSchedule:
+    """Return a schedule for an hourly forecast starting at zero."""
+    kwargs.setdefault("preheat", 1800)
+    times = [hour * HOUR for hour in range(len(temperatures))]
+    return ForecastSchedule(times, temperatures, 40.0, 2, **kwargs)
+
+
+def test_cold_spell_is_preheated():
+    """The stove is scheduled from the preheat before a long cold spell."""
+    forecast = schedule([45, 45, 35, 30, 35, 45, 45])
+    assert forecast.source_at(2 * HOUR - 1801) is None
+    assert forecast.source_at(2 * HOUR - 1800) == SOURCE_PELLET
+    assert forecast.source_at(5 * HOUR - 1) == SOURCE_PELLET
+    assert forecast.source_at(5 * HOUR) is None
+    assert forecast.next_change_after(0) == 2 * HOUR - 1800
+    assert forecast.next_change_after(5 * HOUR) is None
+
+
+def test_short_cold_spell_is_ignored():
+    """A spell shorter than the minimum forecast hours schedules nothing."""
+    forecast = schedule([45, 35, 45, 45])
+    assert forecast.source_at(HOUR) is None
+    assert forecast.next_change_after(0) is None
+
+
+def test_overlapping_spells_are_merged():
+    """A warm hour shorter than the preheat joins two cold spells."""
+    forecast = schedule([35, 35, 45, 35, 35, 45], preheat=2 * HOUR)
+    assert forecast.source_at(2 * HOUR + 1) == SOURCE_PELLET
+    assert forecast.next_change_after(-2 * HOUR) == 5 * HOUR
+
+
+def test_spell_running_past_the_forecast_is_kept():
+    """A cold spell at the end of the forecast lasts past its last hour."""
+    forecast = schedule([45, 45, 35, 35])
+    assert forecast.source_at(4 * HOUR - 1) == SOURCE_PELLET
+    assert forecast.next_change_after(3 * HOUR) == 4 * HOUR
+
+
+def test_temperature_is_interpolated():
+    """Between forecast hours the temperature is linear, flat beyond."""
+    forecast = schedule([40, 30])
+    assert forecast.temperature_at(HOUR / 2) == pytest.approx(35.0)
+    assert forecast.temperature_at(-HOUR) == 40
+    assert forecast.temperature_at(2 * HOUR) == 30
+    assert ForecastSchedule([], [], 40.0, 2).temperature_at(0) is None
@@ -0,0 +1,85 @@
+"""Tests for the online heating rate models."""
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from smart_selecting_thermostat.const import (
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    TEMP_TREND_PERIOD,
+)
+from smart_selecting_thermostat.heating_model import (
+    HeatingRateModel,
+    SourceRateModels,
+)
+from smart_selecting_thermostat.temperature_history import TemperatureHistory
+
+# rate = 4 + 0.02 * outside - 0.1 * (inside - outside)
+THETA = (4.0, 0.02, -0.1)
+
+
+def true_rate(inside: float, outside: float) -> float:
+    """Return the heating rate of the simulated house in °F per hour."""
+    a, b, c = THETA
+    return a + b * outside + c * (inside - outside)
+
+
+def trained_model() -> HeatingRateModel:
+    """Return a model fitted to noise free samples of the house."""
+    model = HeatingRateModel()
+    for outside in range(0, 50, 5):
+        for inside in range(60, 72):
+            model.update(inside, outside, true_rate(inside, outside))
+    return model
+
+
+def test_rls_recovers_the_parameters():
+    """Noise free samples recover the parameters of the house."""
+    model = trained_model()
+    assert model.trained
+    assert model.theta == pytest.approx(THETA, abs=0.01)
+    assert model.rate(66.0, 20.0) == pytest.approx(true_rate(66.0, 20.0), abs=0.01)
+
+
+def test_time_to_target_solves_the_model():
+    """The time to target matches the closed form of the fitted model."""
+    model = trained_model()
+    a, b, c = THETA
+    outside = 30.0
+    equilibrium = -(a + b * outside - c * outside) / c
+    expected = math.log((equilibrium - 64.0) / (equilibrium - 68.0)) / -c * 3600
+    assert model.time_to_target(64.0, outside, 68.0) == pytest.approx(
+        expected, rel=0.01
+    )
+    assert model.time_to_target(70.0, outside, 68.0) == 0.0
+    assert model.time_to_target(64.0, outside, equilibrium + 1) == math.inf
+
+
+def test_model_survives_storage():
+    """A restored model predicts like the saved one."""
+    model = trained_model()
+    restored = HeatingRateModel.from_dict(model.as_dict())
+    assert restored.samples == model.samples
+    assert restored.rate(66.0, 20.0) == model.rate(66.0, 20.0)
+
+
+def test_models_only_learn_while_a_source_is_working():
+    """Samples are taken once the source settled and the house is below target."""
+    models = SourceRateModels()
+    history = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    for minute in range(16):
+        history.append(minute * 60.0, 64.0 + minute / 60)
+    now = TEMP_TREND_PERIOD
+
+    assert not models.observe(SOURCE_MINISPLIT, now - 60, now, 30.0, 68.0, history)
+    assert not models.observe(SOURCE_PELLET, 0.0, now, 30.0, 68.0, history)
+    assert not models.observe(SOURCE_MINISPLIT, 0.0, now, 30.0, 64.0, history)
+    assert models.observe(SOURCE_MINISPLIT, 0.0, now, 30.0, 68.0, history)
+    assert not models.observe(SOURCE_MINISPLIT, 0.0, now + 1, 30.0, 68.0, history)
+    assert models.models[SOURCE_MINISPLIT].samples == 1
+    assert models.time_to_target(64.0, 30.0, 68.0) == {
+        SOURCE_MINISPLIT: None,
+        SOURCE_PELLET: None,
+    }
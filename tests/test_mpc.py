@@ -0,0 +1,35 @@
+"""Tests for the model-predictive stove controller."""
+from __future__ import annotations
+
+from smart_selecting_thermostat.mpc import MpcController
+
+
+def test_search_runs_on_a_snapshot():
+    """The search reads only its snapshot, so the stove can be tracked meanwhile."""
+    mpc = MpcController()
+    mpc.track(3, 0.0)
+    problem = mpc.problem(1800.0)
+    outside = [30.0] * mpc.horizon_steps
+
+    # The stove is turned off while the search would run in the executor
+    mpc.track(0, 1800.0)
+    result = mpc.search(problem, 64.0, 68.0, outside)
+    assert (mpc.level, mpc.planned_level, mpc.last_solve_time) == (0, None, 0.0)
+    assert result.complete
+
+    assert mpc.apply(1800.0, 68.0, result) == result.level
+    assert mpc.planned_level == result.level
+    assert not mpc.due(1800.0, 68.0)
+    # A cold house below the target is heated
+    assert result.level >= 3
+
+
+def test_solve_matches_the_split_steps():
+    """``solve`` on the event loop gives the same plan as the split steps."""
+    outside = [30.0] * MpcController().horizon_steps
+    split, whole = MpcController(), MpcController()
+    for mpc in (split, whole):
+        mpc.track(2, 0.0)
+    result = split.search(split.problem(900.0), 67.0, 68.0, outside)
+    assert whole.solve(900.0, 67.0, 68.0, outside) == result.level
+    assert whole.heat == split.heat
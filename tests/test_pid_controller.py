@@ -0,0 +1,122 @@
+"""Tests for the pellet stove PID controller."""
+from __future__ import annotations
+
+import pytest
+
+from smart_selecting_thermostat.pid_controller import PelletStovePIDController
+
+
+class ManualClock:
+    """Clock for the controller that moves only when told to."""
+
+    def __init__(self) -> None:
+        """Start at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture
+def clock() -> ManualClock:
+    """Return a manual clock."""
+    return ManualClock()
+
+
+def make_controller(clock: ManualClock, kp=1.0, ki=0.0, kd=0.0, **kwargs):
+    """Return a controller on ``clock`` with a one minute sample time."""
+    return PelletStovePIDController(
+        kp, ki, kd, sample_time=60, time_fn=clock, **kwargs
+    )
+
+
+def test_output_is_clamped_to_the_stove_levels(clock):
+    """The output stays between the lowest and highest level."""
+    pid = make_controller(clock, kp=10.0)
+    assert pid.compute(60.0, 68.0) == 5
+    clock.now += 60
+    assert pid.compute(75.0, 68.0) == 1
+
+
+def test_output_is_held_within_the_sample_time(clock):
+    """A new output is only computed once the sample time has passed."""
+    pid = make_controller(clock)
+    first = pid.compute(66.0, 68.0)
+    clock.now += 59
+    assert pid.compute(60.0, 68.0) == first
+    clock.now += 1
+    assert pid.compute(60.0, 68.0) != first
+
+
+def test_pass_a_hair_early_still_updates(clock):
+    """Timing noise around the sample time does not skip a sample."""
+    pid = make_controller(clock, ki=0.01)
+    first = pid.compute(66.0, 68.0)
+    clock.now += 60 - 1e-6
+    assert pid.compute(66.0, 68.0) > first
+
+
+def test_integral_does_not_wind_up_while_saturated(clock):
+    """A long saturated period does not delay leaving saturation."""
+    pid = make_controller(clock, kp=1.0, ki=0.01)
+    for _ in range(600):
+        assert pid.compute(60.0, 68.0) == 5
+        clock.now += 60
+    _, integral, _ = pid.components
+    assert integral <= 5
+
+    # Slightly above target the output leaves the top level right away
+    assert pid.compute(68.5, 68.0) < 5
+
+
+def test_setpoint_change_does_not_kick_the_derivative(clock):
+    """The derivative acts on the measurement, not on the error."""
+    pid = make_controller(clock, kp=0.0, kd=10.0)
+    pid.compute(67.0, 68.0)
+    clock.now += 60
+    pid.compute(67.0, 72.0)
+    assert pid.components[2] == 0.0
+    clock.now += 60
+    pid.compute(66.0, 72.0)
+    assert pid.components[2] > 0.0
+
+
+def test_level_changes_need_the_hysteresis_margin(clock):
+    """The level only moves once the output clears the hysteresis band."""
+    # Without integral gain the integral rests at the lowest level, 1
+    pid = make_controller(clock, kp=1.0, hysteresis=0.25)
+    assert pid.compute_level(66.0, 68.0) == 3
+    clock.now += 60
+    # Output 3.6 is past the half level but within the hysteresis margin
+    assert pid.compute_level(65.4, 68.0) == 3
+    clock.now += 60
+    assert pid.compute_level(65.2, 68.0) == 4
+
+
+def test_transfer_is_bumpless(clock):
+    """After a transfer the next output continues from the given output."""
+    pid = make_controller(clock, kp=1.0, ki=0.001)
+    pid.transfer(66.0, 68.0, output=4.0)
+    clock.now += 60
+    assert pid.compute(66.0, 68.0) == pytest.approx(4.0, abs=0.2)
+    assert pid.compute_level(66.0, 68.0) == 4
+
+
+def test_state_survives_a_restore(clock):
+    """A restored controller continues with the saved output and level."""
+    pid = make_controller(clock, kp=1.0, ki=0.001)
+    for temp in (64.0, 64.5, 65.0):
+        clock.now += 60
+        pid.compute_level(temp, 68.0)
+
+    restored = make_controller(clock, kp=1.0, ki=0.001)
+    restored.restore(pid.as_dict())
+    assert restored.output == pid.output
+    # The restored output is held for one sample time
+    clock.now += 30
+    assert restored.compute_level(60.0, 68.0) == pid.compute_level(65.0, 68.0)
+    clock.now += 30
+    assert restored.compute(66.0, 68.0) == pytest.approx(
+        pid.compute(66.0, 68.0), abs=1e-9
+    )
@@ -0,0 +1,141 @@
+"""Tests for the relay short-cycle protection."""
+from __future__ import annotations
+
+import pytest
+
+from smart_selecting_thermostat.const import (
+    LEVEL_MIN_DWELL,
+    MAX_LEVEL_CHANGES_PER_HOUR,
+    MINISPLIT_MIN_RUN_TIME,
+    SOURCE_MIN_RUN_TIME,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    STOVE_MIN_OFF_TIME,
+)
+from smart_selecting_thermostat.relay_scheduler import RelayScheduler
+
+
+class ManualClock:
+    """Clock for the scheduler that moves only when told to."""
+
+    def __init__(self) -> None:
+        """Start at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture
+def clock() -> ManualClock:
+    """Return a manual clock."""
+    return ManualClock()
+
+
+@pytest.fixture
+def scheduler(clock: ManualClock) -> RelayScheduler:
+    """Return a scheduler on ``clock``."""
+    return RelayScheduler(time_fn=clock)
+
+
+def test_first_source_and_level_are_applied(scheduler):
+    """Nothing holds back the first source and the level after ignition."""
+    assert scheduler.request_source(SOURCE_PELLET) == SOURCE_PELLET
+    assert scheduler.request_level(3) == 3
+    assert scheduler.stats.ignitions == 1
+    assert scheduler.stats.level_changes == 0
+    assert scheduler.next_change_at() is None
+
+
+def test_level_change_waits_for_the_dwell(scheduler, clock):
+    """A level change inside the dwell is queued and the newest wish wins."""
+    scheduler.request_source(SOURCE_PELLET)
+    scheduler.request_level(3)
+
+    clock.now = 60
+    assert scheduler.request_level(4) == 3
+    clock.now = 120
+    assert scheduler.request_level(5) == 3
+    assert scheduler.pending_level == 5
+    assert scheduler.next_change_at() == LEVEL_MIN_DWELL
+    assert scheduler.stats.deferred_changes == 2
+
+    clock.now = LEVEL_MIN_DWELL
+    assert scheduler.request_level(5) == 5
+    assert scheduler.pending_level is None
+    assert scheduler.stats.level_changes == 1
+
+
+def test_returning_to_the_level_drops_the_pending_change(scheduler, clock):
+    """Asking for the current level again cancels the queued change."""
+    scheduler.request_source(SOURCE_PELLET)
+    scheduler.request_level(3)
+    clock.now = 60
+    scheduler.request_level(4)
+    assert scheduler.request_level(3) == 3
+    assert scheduler.pending_level is None
+    assert scheduler.next_change_at() is None
+
+
+def test_level_changes_keep_the_hourly_budget(scheduler, clock):
+    """Once the hourly budget is spent the next change waits for the oldest."""
+    scheduler.request_source(SOURCE_PELLET)
+    scheduler.request_level(1)
+    for change in range(MAX_LEVEL_CHANGES_PER_HOUR):
+        clock.now = (change + 1) * LEVEL_MIN_DWELL
+        assert scheduler.request_level(2 + change % 2) == 2 + change % 2
+    first = LEVEL_MIN_DWELL
+
+    clock.now += LEVEL_MIN_DWELL
+    held = scheduler.level
+    assert scheduler.request_level(5) == held
+    assert scheduler.next_change_at() == first + 3600
+
+    clock.now = first + 3600
+    assert scheduler.request_level(5) == 5
+    assert scheduler.stats.level_changes == MAX_LEVEL_CHANGES_PER_HOUR + 1
+
+
+def test_source_keeps_its_minimum_run_time(scheduler, clock):
+    """A selected source runs for its minimum run time before a switch."""
+    scheduler.request_source(SOURCE_MINISPLIT)
+    clock.now = MINISPLIT_MIN_RUN_TIME - 1
+    assert scheduler.request_source(SOURCE_PELLET) == SOURCE_MINISPLIT
+    assert scheduler.next_change_at() == MINISPLIT_MIN_RUN_TIME
+
+    clock.now = MINISPLIT_MIN_RUN_TIME
+    assert scheduler.request_source(SOURCE_PELLET) == SOURCE_PELLET
+    clock.now += SOURCE_MIN_RUN_TIME - 1
+    assert scheduler.request_source(SOURCE_MINISPLIT) == SOURCE_PELLET
+
+
+def test_stove_stays_off_for_its_minimum_off_time(scheduler, clock):
+    """After the stove goes out the mini-split bridges until it may relight."""
+    scheduler.request_source(SOURCE_PELLET)
+    scheduler.request_level(3)
+    clock.now = SOURCE_MIN_RUN_TIME
+    scheduler.stop()
+    assert scheduler.level is None
+
+    clock.now += 60
+    assert scheduler.request_source(SOURCE_PELLET) == SOURCE_MINISPLIT
+    assert scheduler.pending_source == SOURCE_PELLET
+
+    clock.now = SOURCE_MIN_RUN_TIME + STOVE_MIN_OFF_TIME
+    assert scheduler.request_source(SOURCE_PELLET) == SOURCE_PELLET
+    assert scheduler.stats.ignitions == 2
+    assert scheduler.request_level(2) == 2
+
+
+def test_restore_continues_a_running_stove(scheduler, clock):
+    """A restored stove is neither relit nor released from its limits."""
+    clock.now = 10_000
+    scheduler.restore(SOURCE_PELLET, 600, 3, 300)
+
+    assert scheduler.request_source(SOURCE_PELLET) == SOURCE_PELLET
+    assert scheduler.stats.ignitions == 0
+    assert scheduler.request_source(SOURCE_MINISPLIT) == SOURCE_PELLET
+    assert scheduler.next_change_at() == 10_000 - 600 + SOURCE_MIN_RUN_TIME
+    assert scheduler.request_level(4) == 3
+    assert scheduler.level_age() == 300
@@ -0,0 +1,235 @@
+"""Tests for the comfort schedule and its optimal start."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from homeassistant.components.climate import HVACMode
+
+from smart_selecting_thermostat.const import (
+    ATTR_NEXT_SETPOINT,
+    CONF_MIN_OUTSIDE_TEMP,
+    CONF_SCHEDULE,
+    SOURCE_MINISPLIT,
+    SOURCE_PELLET,
+    STOVE_WARMUP_TIME,
+)
+from smart_selecting_thermostat.flight_recorder import FlightReplay, read_log
+from smart_selecting_thermostat.heating_model import SourceRateModels
+from smart_selecting_thermostat.schedule import (
+    ComfortSchedule,
+    OptimalStartPlanner,
+    parse_schedule,
+)
+
+HOUR = 3600
+# Monday 2024-01-15 00:00 UTC, the start of the harness clock
+MONDAY = datetime(2024, 1, 15, tzinfo=timezone.utc).timestamp()
+
+
+def at(day: int, hours: float) -> float:
+    """Return the timestamp ``hours`` into ``day`` days after MONDAY."""
+    return MONDAY + day * 24 * HOUR + hours * HOUR
+
+
+def rate_models(minisplit: float = 0.0, pellet: float = 0.0) -> SourceRateModels:
+    """Return models trained on constant heating rates in °F per hour."""
+    models = SourceRateModels()
+    for source, rate in ((SOURCE_MINISPLIT, minisplit), (SOURCE_PELLET, pellet)):
+        if rate:
+            models.models[source].theta = [rate, 0.0, 0.0]
+            models.models[source].samples = 100
+    return models
+
+
+def test_schedule_text_is_parsed():
+    """Day ranges wrap around the week and expand to sorted steps."""
+    assert parse_schedule("sat-mon 08:00=68; daily 23:00=62") == [
+        (0, 8 * 60, 68.0),
+        (0, 23 * 60, 62.0),
+        (1, 23 * 60, 62.0),
+        (2, 23 * 60, 62.0),
+        (3, 23 * 60, 62.0),
+        (4, 23 * 60, 62.0),
+        (5, 8 * 60, 68.0),
+        (5, 23 * 60, 62.0),
+        (6, 8 * 60, 68.0),
+        (6, 23 * 60, 62.0),
+    ]
+    assert parse_schedule("Tue,Thu 06:30=67.5;") == [
+        (1, 6 * 60 + 30, 67.5),
+        (3, 6 * 60 + 30, 67.5),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "mon-fri",
+        "weekdays 06:30=68",
+        "mon 6=68",
+        "mon 24:00=68",
+        "mon 06:75=68",
+        "mon 06:30=warm",
+        "daily 06:30=68; mon 06:30=70",
+    ],
+)
+def test_malformed_schedules_are_refused(text):
+    """Bad days, times, targets and clashing setpoints raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_schedule(text)
+
+
+def test_steps_follow_local_time_across_daylight_saving():
+    """A 06:30 step stays at 06:30 local when the clocks change."""
+    new_york = ZoneInfo("America/New_York")
+    schedule = ComfortSchedule(parse_schedule("daily 06:30=68 22:00=62"), new_york)
+    start = datetime(2024, 3, 9, 12, tzinfo=new_york).timestamp()
+    steps = schedule.steps_between(start, start + 2 * 24 * HOUR)
+
+    local = [
+        datetime.fromtimestamp(step, new_york).strftime("%a %H:%M")
+        for step, _ in steps
+    ]
+    assert local == ["Sat 22:00", "Sun 06:30", "Sun 22:00", "Mon 06:30"]
+    # The night of the change is an hour shorter
+    assert steps[1][0] - steps[0][0] == 7.5 * HOUR
+    assert schedule.target_at(steps[1][0]) == 68.0
+    assert schedule.target_at(steps[1][0] - 1) == 62.0
+
+
+def make_planner(**kwargs) -> OptimalStartPlanner:
+    """Return a planner for a daily 06:30 to 22:00 comfort period."""
+    schedule = ComfortSchedule(
+        parse_schedule("daily 06:30=68 22:00=62"), timezone.utc
+    )
+    return OptimalStartPlanner(schedule, min_outside_temp=40.0, **kwargs)
+
+
+@pytest.mark.parametrize(
+    ("outside", "models", "lead", "source"),
+    [
+        # Untrained models fall back to the default lead
+        (50.0, rate_models(), HOUR, None),
+        # 6°F at 2°F/h with a 10% margin
+        (50.0, rate_models(minisplit=2.0, pellet=4.0), 3.3 * HOUR, SOURCE_MINISPLIT),
+        # Too slow for the longest preheat, the stove takes over
+        (
+            50.0,
+            rate_models(minisplit=1.0, pellet=4.0),
+            (1.5 * HOUR + STOVE_WARMUP_TIME) * 1.1,
+            SOURCE_PELLET,
+        ),
+        # Below the minimum outside temperature only the stove is planned
+        (
+            30.0,
+            rate_models(minisplit=4.0, pellet=4.0),
+            (1.5 * HOUR + STOVE_WARMUP_TIME) * 1.1,
+            SOURCE_PELLET,
+        ),
+        # The longest preheat caps a stove that barely keeps up
+        (30.0, rate_models(pellet=0.5), 4 * HOUR, SOURCE_PELLET),
+    ],
+)
+def test_preheat_uses_the_learned_heating_rates(outside, models, lead, source):
+    """The warm-up starts early enough for the planned source to make it."""
+    planner = make_planner()
+    planner.plan(at(0, 0), 62.0, models, lambda timestamp: outside)
+
+    event = planner.next_event
+    assert event.at == at(0, 6.5)
+    assert event.target == 68.0
+    assert event.start == pytest.approx(event.at - lead)
+    assert event.source == source
+
+
+def test_each_step_is_applied_once():
+    """Due steps fire once, and replanning does not repeat them."""
+    planner = make_planner()
+    models = rate_models()
+    planner.plan(at(0, 0), 62.0, models, lambda timestamp: 50.0)
+
+    assert planner.due(at(0, 5)) is None
+    assert planner.due(at(0, 5.5)).target == 68.0
+    assert planner.preheating(at(0, 6)).at == at(0, 6.5)
+    assert planner.due(at(0, 6)) is None
+    assert planner.preheating(at(0, 7)) is None
+
+    # The replan keeps the applied step behind the cursor
+    assert planner.needs_plan(at(0, 7))
+    planner.plan(at(0, 7), 68.0, models, lambda timestamp: 50.0)
+    assert planner.next_event.at == at(0, 22)
+    assert planner.due(at(0, 7)) is None
+
+    # Sleeping through several steps applies the latest one
+    assert planner.due(at(1, 21)).at == at(1, 6.5)
+    assert planner.due(at(1, 21)) is None
+
+
+def test_replan_keeps_a_step_that_fell_due():
+    """A step due between two plans is still applied after the replan."""
+    planner = make_planner()
+    planner.plan(at(0, 21), 68.0, rate_models(), lambda timestamp: 50.0)
+    assert planner.due(at(0, 21.5)) is None
+
+    planner.plan(at(0, 22) + 1, 68.0, rate_models(), lambda timestamp: 50.0)
+    assert planner.due(at(0, 22) + 1).target == 62.0
+    assert planner.next_event.at == at(1, 6.5)
+
+
+async def test_setback_night_is_warm_again_by_morning(harness):
+    """The zone holds the setback overnight and preheats for the morning."""
+    thermostat = await harness.async_setup(
+        platforms=["climate"], schedule="daily 06:30=68 22:00=62"
+    )
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(HOUR)
+    assert thermostat.target_temperature == 62.0
+
+    # The first morning trains the models, later ones are planned on them
+    await harness.async_run(24 * HOUR)
+    next_setpoint = thermostat.extra_state_attributes[ATTR_NEXT_SETPOINT]
+    assert next_setpoint["at"] == "2024-01-16T06:30:00+00:00"
+    assert next_setpoint["source"] == SOURCE_PELLET
+    for day in (1, 2):
+        await harness.async_run(at(day, 3) - MONDAY - harness.clock.elapsed)
+        assert harness.house.inside < 66.0
+        await harness.async_run(3.5 * HOUR)
+        assert thermostat.target_temperature == 68.0
+        assert harness.house.inside >= 67.5
+
+    report = FlightReplay().run(read_log(thermostat._flight_recorder.path))
+    assert report.diffs == []
+
+
+async def test_schedule_changes_apply_to_the_running_zone(harness):
+    """A schedule set in the options takes over without a reload."""
+    thermostat = await harness.async_setup(platforms=["climate"])
+    await thermostat.async_set_temperature(temperature=68.0)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(HOUR)
+
+    options = harness.hass.config_entries.options
+    await options.async_init(
+        harness.entry.entry_id, data={CONF_SCHEDULE: "daily 06:30=68 22:00=62"}
+    )
+    await harness.clock.async_settle(harness.hass)
+    assert harness.find_thermostat() is thermostat
+    assert thermostat.target_temperature == 62.0
+    assert thermostat._planner.next_event.at == at(0, 6.5)
+
+    # A new threshold replans the preheat, the schedule is kept
+    planner = thermostat._planner
+    await options.async_init(
+        harness.entry.entry_id, data={CONF_MIN_OUTSIDE_TEMP: 20}
+    )
+    await harness.clock.async_settle(harness.hass)
+    assert thermostat._planner is planner
+    assert planner.min_outside_temp == 20
+
+    await options.async_init(harness.entry.entry_id, data={CONF_SCHEDULE: ""})
+    await harness.clock.async_settle(harness.hass)
+    assert thermostat._planner is None
+    assert ATTR_NEXT_SETPOINT not in thermostat.extra_state_attributes
@@ -0,0 +1,114 @@
+"""Tests for the fusion of redundant temperature sensors."""
+from __future__ import annotations
+
+import pytest
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.core import State
+
+from smart_selecting_thermostat.const import (
+    FUSION_MAX_AGE,
+    FUSION_STEP_CONFIRM,
+)
+from smart_selecting_thermostat.sensor_fusion import (
+    SensorFusion,
+    SensorTrack,
+    parse_temperature,
+)
+
+SENSORS = ["sensor.hall", "sensor.kitchen", "sensor.bedroom"]
+
+
+def test_parse_temperature_reads_sensors_and_weather():
+    """Sensors report the state, weather entities the temperature attribute."""
+    assert parse_temperature(State("sensor.hall", "67.5")) == 67.5
+    assert parse_temperature(
+        State("weather.home", "sunny", {"temperature": 31})
+    ) == 31.0
+    assert parse_temperature(State("sensor.hall", STATE_UNAVAILABLE)) is None
+    assert parse_temperature(State("sensor.hall", "warm")) is None
+    assert parse_temperature(None) is None
+
+
+def test_spike_is_rejected():
+    """A single reading far from the estimate is ignored."""
+    track = SensorTrack()
+    for second in range(0, 600, 60):
+        assert track.update(68.0, second)
+    assert not track.update(85.0, 600)
+    assert track.value == pytest.approx(68.0)
+    assert track.rejections == 1
+    assert track.update(68.1, 660)
+
+
+def test_confirmed_step_restarts_the_filter():
+    """Readings that keep disagreeing are a real change."""
+    track = SensorTrack()
+    track.update(68.0, 0)
+    assert not track.update(75.0, 60)
+    assert track.update(75.0, 60 + FUSION_STEP_CONFIRM)
+    assert track.value == 75.0
+
+
+def test_stuck_sensor_is_outvoted():
+    """With three sensors one far from the median is left out and faulty."""
+    fusion = SensorFusion(SENSORS)
+    fusion.update("sensor.hall", 68.0, 0)
+    fusion.update("sensor.kitchen", 68.4, 0)
+    assert fusion.update("sensor.bedroom", 55.0, 0) == pytest.approx(68.2)
+    assert fusion.faulty_sensors(0) == ["sensor.bedroom"]
+    assert fusion.sensor_health("sensor.hall", 0) == 1.0
+
+
+def test_two_sensors_that_disagree_are_averaged():
+    """Two sensors cannot outvote each other."""
+    fusion = SensorFusion(SENSORS[:2])
+    fusion.update("sensor.hall", 68.0, 0)
+    assert fusion.update("sensor.kitchen", 62.0, 0) == pytest.approx(65.0)
+    assert fusion.faulty_sensors(0) == []
+
+
+def test_stale_sensor_is_dropped_until_none_is_fresh():
+    """A silent sensor leaves the estimate, unless every sensor went quiet."""
+    fusion = SensorFusion(SENSORS[:2])
+    fusion.update("sensor.hall", 68.0, 0)
+    fusion.update("sensor.kitchen", 66.0, 0)
+    fusion.update("sensor.hall", 68.0, FUSION_MAX_AGE)
+    assert fusion.refresh(FUSION_MAX_AGE + 60) == pytest.approx(68.0)
+    assert fusion.faulty_sensors(FUSION_MAX_AGE + 60) == ["sensor.kitchen"]
+
+    assert fusion.refresh(3 * FUSION_MAX_AGE) == pytest.approx(67.0)
+
+
+def test_steady_sensor_stays_fresh():
+    """A sensor whose state still shows its last reading is not stale."""
+    fusion = SensorFusion(SENSORS[:2])
+    fusion.update("sensor.hall", 68.0, 0)
+    fusion.update("sensor.kitchen", 66.0, 0)
+    states = {
+        "sensor.hall": State("sensor.hall", "68.0"),
+        "sensor.kitchen": State("sensor.kitchen", "66.0"),
+    }
+    now = 2 * FUSION_MAX_AGE
+    assert fusion.refresh_states(states.get, now) == pytest.approx(67.0)
+    assert fusion.faulty_sensors(now) == []
+    assert fusion.sensor_health("sensor.kitchen", now) == 1.0
+
+
+def test_held_step_is_confirmed_without_new_readings():
+    """A rejected step the sensor keeps showing is taken after the wait."""
+    fusion = SensorFusion(SENSORS[:1])
+    fusion.update("sensor.hall", 68.0, 0)
+    assert fusion.update("sensor.hall", 75.0, 60) == 68.0
+    states = {"sensor.hall": State("sensor.hall", "75.0")}
+    assert fusion.refresh_states(states.get, 60 + FUSION_STEP_CONFIRM - 1) == 68.0
+    assert fusion.refresh_states(states.get, 60 + FUSION_STEP_CONFIRM) == 75.0
+    assert fusion.sensor_health("sensor.hall", 60 + FUSION_STEP_CONFIRM) > 0.5
+
+
+def test_unavailable_sensor_leaves_the_estimate():
+    """An unavailable sensor stops counting right away."""
+    fusion = SensorFusion(SENSORS[:2])
+    fusion.update("sensor.hall", 68.0, 0)
+    fusion.update("sensor.kitchen", 66.0, 0)
+    assert fusion.update("sensor.kitchen", None, 60) == pytest.approx(68.0)
+    assert fusion.as_dict(60)["sensors"]["sensor.kitchen"]["available"] is False
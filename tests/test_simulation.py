@@ -0,0 +1,43 @@
+"""Tests for the offline simulator."""
+from __future__ import annotations
+
+import numpy as np
+
+from smart_selecting_thermostat.const import (
+    MAX_LEVEL_CHANGES_PER_HOUR,
+    MODE_ON_OFF,
+    MODE_PID,
+)
+from smart_selecting_thermostat.simulation import Simulator, synthetic_season
+from smart_selecting_thermostat.tuning import evaluate
+
+DAYS = 3
+
+
+def test_stove_levels_keep_the_relay_limits():
+    """Level changes go through the relay scheduler, like in the entity."""
+    for mode in (MODE_PID, MODE_ON_OFF):
+        simulator = Simulator(synthetic_season(days=DAYS), control_mode=mode)
+        report = simulator.run()
+        stats = simulator.relays.stats
+        assert stats.ignitions == 1
+        assert stats.level_changes <= MAX_LEVEL_CHANGES_PER_HOUR * DAYS * 24
+        # One call to light the stove, then two relays per level change
+        assert report.relay_actuations == 1 + 2 * stats.level_changes
+
+
+def test_sweep_keeps_the_relay_limits():
+    """The vectorized sweep holds level changes back like the scheduler."""
+    season = synthetic_season(days=DAYS)
+    outside = np.array([season.at(t) for t in range(0, DAYS * 86400 + 1, 60)])
+    params = {
+        "kp": np.array([1.0, 8.0]),
+        "ki": np.array([0.1, 0.5]),
+        "kd": np.array([0.05, 0.0]),
+        "min_outside_temp": np.array([40.0, 40.0]),
+        "target_timeout": np.array([3600.0, 3600.0]),
+    }
+    for mode in (MODE_PID, MODE_ON_OFF):
+        result = evaluate(outside, 68.0, params, control_mode=mode)
+        changes = (result["relay_cycles"] - 1) / 2
+        assert (changes <= MAX_LEVEL_CHANGES_PER_HOUR * DAYS * 24).all()
@@ -0,0 +1,160 @@
+"""Tests for the multi-resolution telemetry rollups."""
+from __future__ import annotations
+
+import pytest
+from homeassistant.components.climate import HVACMode
+
+from smart_selecting_thermostat.const import DATA_TELEMETRY, DOMAIN
+from smart_selecting_thermostat.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from smart_selecting_thermostat.telemetry import (
+    CHANNELS,
+    ControlTelemetry,
+    RollupRing,
+    statistics,
+)
+
+HOUR = 3600
+# 2024-01-15 00:00 UTC
+MIDNIGHT = 1705276800.0
+
+
+def reading(
+    inside=None, outside=None, error=None, level=0, stove=0.0, minisplit=0.0
+):
+    """Return the channel values of one reading."""
+    return (inside, outside, error, level, stove, minisplit)
+
+
+def test_means_are_weighted_by_the_time_a_reading_is_held():
+    """A reading counts for as long as it holds, split at period boundaries."""
+    telemetry = ControlTelemetry()
+    telemetry.observe(MIDNIGHT, reading(inside=66.0))
+    telemetry.observe(MIDNIGHT + 30, reading(inside=70.0))
+    telemetry.observe(MIDNIGHT + 120, reading(inside=68.0))
+
+    first, second = telemetry.minutes.rollups()
+    assert first.start == MIDNIGHT
+    # 30 s at 66°F and 30 s at 70°F
+    assert first.values["inside_temperature"] == (68.0, 66.0, 70.0)
+    assert second.values["inside_temperature"] == (70.0, 70.0, 70.0)
+    hour = telemetry.hours.rollup(MIDNIGHT)
+    assert hour.values["inside_temperature"] == pytest.approx((69.0, 66.0, 70.0))
+    assert telemetry.days.rollup(MIDNIGHT).values == hour.values
+
+
+def test_unknown_values_and_long_gaps_are_left_out():
+    """Channels without a value and readings held too long are not added."""
+    telemetry = ControlTelemetry(max_gap=900)
+    telemetry.observe(MIDNIGHT, reading(inside=68.0))
+    telemetry.observe(MIDNIGHT + 600, reading(inside=67.0))
+    # Restarted an hour later
+    telemetry.observe(MIDNIGHT + 4200, reading(inside=66.0))
+    telemetry.observe(MIDNIGHT + 4260, reading(inside=66.0))
+
+    values = telemetry.hours.rollup(MIDNIGHT).values
+    assert values["inside_temperature"] == (68.0, 68.0, 68.0)
+    assert "outside_temperature" not in values
+    assert telemetry.hours.rollup(MIDNIGHT + HOUR).values[
+        "inside_temperature"
+    ] == (66.0, 66.0, 66.0)
+
+
+def test_ring_keeps_a_fixed_number_of_periods():
+    """Old periods are overwritten in place once the ring is full."""
+    ring = RollupRing(60, capacity=10)
+    size = len(ring._sums)
+    for minute in range(25):
+        start = MIDNIGHT + minute * 60
+        ring.add(start, start + 60, reading(inside=float(minute)))
+
+    rollups = list(ring.rollups())
+    assert [rollup.start for rollup in rollups] == [
+        MIDNIGHT + minute * 60 for minute in range(15, 25)
+    ]
+    assert rollups[0].values["inside_temperature"] == (15.0, 15.0, 15.0)
+    assert ring.rollup(MIDNIGHT) is None
+    assert len(ring._sums) == size == 10 * len(CHANNELS)
+
+
+def test_completed_hours_are_handed_out_once():
+    """Each hour is returned by the first reading after it ended."""
+    telemetry = ControlTelemetry()
+    completed = []
+    for minute in range(0, 3 * 60 + 1, 5):
+        completed.extend(
+            telemetry.observe(MIDNIGHT + minute * 60, reading(stove=100.0))
+        )
+
+    assert [rollup.start for rollup in completed] == [
+        MIDNIGHT,
+        MIDNIGHT + HOUR,
+        MIDNIGHT + 2 * HOUR,
+    ]
+    assert completed[0].values["pellet_stove_duty"] == (100.0, 100.0, 100.0)
+
+
+def test_statistics_rows_per_channel():
+    """Each channel with data becomes an external statistic of the zone."""
+    telemetry = ControlTelemetry()
+    for offset in (0, 900, 1800, 2700):
+        below = offset < 1800
+        telemetry.observe(
+            MIDNIGHT + offset,
+            reading(inside=68.0 if below else 69.0, error=-0.5 if below else 0.5),
+        )
+    rollups = telemetry.observe(MIDNIGHT + HOUR, reading())
+
+    exported = {
+        metadata["statistic_id"]: (metadata, rows)
+        for metadata, rows in statistics("living_room", "Living room", rollups)
+    }
+    assert set(exported) == {
+        "smart_thermostat:living_room_inside_temperature",
+        "smart_thermostat:living_room_setpoint_error",
+        "smart_thermostat:living_room_stove_level",
+        "smart_thermostat:living_room_pellet_stove_duty",
+        "smart_thermostat:living_room_minisplit_duty",
+    }
+    metadata, rows = exported["smart_thermostat:living_room_inside_temperature"]
+    assert metadata == {
+        "has_mean": True,
+        "has_sum": False,
+        "name": "Living room inside temperature",
+        "source": DOMAIN,
+        "statistic_id": "smart_thermostat:living_room_inside_temperature",
+        "unit_of_measurement": "°F",
+    }
+    assert rows == [{"start": MIDNIGHT, "mean": 68.5, "min": 68.0, "max": 69.0}]
+    # A difference is not converted like a temperature
+    metadata, rows = exported["smart_thermostat:living_room_setpoint_error"]
+    assert metadata["unit_of_measurement"] is None
+    assert rows[0]["mean"] == 0.0
+
+
+async def test_zone_rolls_up_its_control_loop(harness):
+    """The zone feeds its rollups on every pass, shown in the diagnostics."""
+    thermostat = await harness.async_setup(platforms=["climate"])
+    await thermostat.async_set_temperature(temperature=68.0)
+    await thermostat.async_set_hvac_mode(HVACMode.HEAT)
+    await harness.async_run(12 * HOUR)
+
+    telemetry = harness.hass.data[DOMAIN][harness.entry.entry_id][DATA_TELEMETRY]
+    *_, last_hour = telemetry.hours.rollups(until=telemetry.hours.latest)
+    mean, low, high = last_hour.values["inside_temperature"]
+    assert 66.5 <= low <= mean <= high <= 69.5
+    assert last_hour.values["outside_temperature"] == (30.0, 30.0, 30.0)
+    # Cold outside: the stove heats the whole hour
+    assert last_hour.values["pellet_stove_duty"] == (100.0, 100.0, 100.0)
+    assert last_hour.values["minisplit_duty"] == (0.0, 0.0, 0.0)
+    assert 1 <= last_hour.values["stove_level"][1]
+    assert abs(last_hour.values["setpoint_error"][0]) < 1.0
+    # Time weighting leaves no hour of the run unaccounted for
+    assert len(list(telemetry.minutes.rollups())) == telemetry.minutes.capacity
+
+    diagnostics = await async_get_config_entry_diagnostics(
+        harness.hass, harness.entry
+    )
+    assert len(diagnostics["telemetry"]["hour"]) == 12
+    assert diagnostics["telemetry"]["day"][0]["start"] == MIDNIGHT
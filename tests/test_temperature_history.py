@@ -0,0 +1,127 @@
+"""Tests for the time-windowed temperature history."""
+from __future__ import annotations
+
+import pytest
+
+from smart_selecting_thermostat.const import (
+    REASON_TEMP_DECREASING,
+    SOURCE_MINISPLIT,
+    TEMP_TREND_PERIOD,
+)
+from smart_selecting_thermostat.source_selector import SourceSelector
+from smart_selecting_thermostat.temperature_history import TemperatureHistory
+
+
+def falling(history: TemperatureHistory, until: float) -> None:
+    """Append a reading every minute up to ``until``, falling 1°F per hour."""
+    for minute in range(int(until // 60) + 1):
+        history.append(minute * 60.0, 68.0 - minute / 60)
+
+
+def test_quiet_sensor_leaves_no_stale_trend():
+    """Trimming to the current time drops readings older than the window."""
+    history = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    falling(history, TEMP_TREND_PERIOD)
+    assert history.slope * 3600 == pytest.approx(-1.0)
+
+    # The sensor holds its last value for an hour and reports nothing
+    now = 2 * TEMP_TREND_PERIOD + 3600
+    history.trim(now)
+    assert len(history) == 1
+    assert history.span == 0.0
+    assert history.slope is None
+    assert history.latest == pytest.approx(68.0 - TEMP_TREND_PERIOD / 3600)
+
+    selector = SourceSelector(min_outside_temp=40.0)
+    assert selector.select(
+        SOURCE_MINISPLIT, history.latest, 68.0, 50.0, history, 60.0
+    ) == (SOURCE_MINISPLIT, None)
+
+
+def test_trim_keeps_the_readings_in_the_window():
+    """Readings newer than the window are kept by a trim."""
+    history = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    falling(history, TEMP_TREND_PERIOD)
+    history.trim(TEMP_TREND_PERIOD + 300)
+    assert [timestamp for timestamp, _ in history][0] == 300.0
+    assert history.span == TEMP_TREND_PERIOD - 300
+
+    selector = SourceSelector(min_outside_temp=40.0)
+    _, reason = selector.select(
+        SOURCE_MINISPLIT, history.latest, 68.0, 50.0, history, 60.0
+    )
+    assert reason == REASON_TEMP_DECREASING
+
+
+def test_old_readings_are_evicted_on_append():
+    """Appending keeps only the readings within the window."""
+    history = TemperatureHistory(600, 64)
+    for minute in range(30):
+        history.append(minute * 60.0, 60.0 + minute)
+    assert [timestamp for timestamp, _ in history][0] == 29 * 60.0 - 600
+    assert history.span == 600
+    assert history.mean == pytest.approx(60.0 + 24)
+
+
+def test_full_buffer_drops_the_oldest_reading():
+    """At capacity the oldest reading makes room for the newest."""
+    history = TemperatureHistory(3600, 4)
+    for second in range(6):
+        history.append(float(second), float(second))
+    assert list(history) == [(2.0, 2.0), (3.0, 3.0), (4.0, 4.0), (5.0, 5.0)]
+    assert history.latest == 5.0
+    assert history.latest_time == 5.0
+
+
+def test_slope_is_the_least_squares_fit():
+    """The slope and variance match a direct computation over the window."""
+    history = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    readings = [(0.0, 66.0), (120.0, 66.4), (300.0, 66.3), (420.0, 67.1)]
+    for timestamp, value in readings:
+        history.append(timestamp, value)
+
+    times, values = zip(*readings)
+    mean_t = sum(times) / len(times)
+    mean_y = sum(values) / len(values)
+    expected = sum((t - mean_t) * (y - mean_y) for t, y in readings) / sum(
+        (t - mean_t) ** 2 for t in times
+    )
+    assert history.slope == pytest.approx(expected)
+    assert history.variance == pytest.approx(
+        sum((y - mean_y) ** 2 for y in values) / len(values)
+    )
+
+
+def test_slope_needs_two_readings_at_different_times():
+    """One reading, or readings at the same time, have no slope."""
+    history = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    assert history.slope is None
+    history.append(0.0, 66.0)
+    assert history.slope is None
+    history.append(0.0, 67.0)
+    assert history.slope is None
+
+
+def test_sums_stay_accurate_on_epoch_timestamps():
+    """Rebasing the origin keeps a week of epoch timestamps accurate."""
+    history = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    start = 1_700_000_000.0
+    for minute in range(7 * 24 * 60):
+        history.append(start + minute * 60, 68.0 + minute / 60)
+    assert history.slope * 3600 == pytest.approx(1.0)
+    assert history.span == TEMP_TREND_PERIOD
+    assert history.latest_time == start + (7 * 24 * 60 - 1) * 60
+
+
+def test_pack_round_trips_the_window():
+    """Unpacked readings match the packed ones, minus those out of the window."""
+    history = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    falling(history, TEMP_TREND_PERIOD)
+    restored = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    restored.unpack(history.pack())
+    assert list(restored) == list(history)
+    assert restored.slope == pytest.approx(history.slope)
+
+    later = TemperatureHistory(TEMP_TREND_PERIOD, 64)
+    later.unpack(history.pack(), now=TEMP_TREND_PERIOD + 300)
+    assert [timestamp for timestamp, _ in later][0] == 300.0
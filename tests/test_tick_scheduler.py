@@ -0,0 +1,58 @@
+"""Tests for the adaptive control tick scheduler."""
+from __future__ import annotations
+
+from smart_selecting_thermostat.tick_scheduler import TickScheduler
+
+
+def make_scheduler() -> TickScheduler:
+    """Return a scheduler ticking between one and ten minutes."""
+    return TickScheduler(min_interval=60, max_interval=600, quantum=60)
+
+
+def test_settled_zone_backs_off_gradually():
+    """A flat zone at its target doubles the interval up to the maximum."""
+    scheduler = make_scheduler()
+    intervals = [scheduler.next_interval(0.0, 0.0) for _ in range(6)]
+    assert intervals == [120, 240, 480, 600, 600, 600]
+
+
+def test_intervals_are_whole_sample_times():
+    """Settled intervals are multiples of the quantum."""
+    scheduler = make_scheduler()
+    scheduler.interval = 600
+    # 0.15°F of margin at 1°F/h lasts nine minutes, halved for margin
+    assert scheduler.next_interval(0.15, 1.0 / 3600) == 240
+
+
+def test_leaving_the_settled_band_ticks_fast_right_away():
+    """Off target or in a transition the next tick is the minimum interval."""
+    scheduler = make_scheduler()
+    scheduler.interval = 600
+    assert scheduler.next_interval(-0.5, 0.0) == 60
+
+    scheduler.interval = 600
+    assert scheduler.next_interval(0.0, 0.0, transition=True) == 60
+    assert scheduler.next_interval(None, None) == 60
+
+
+def test_deadlines_are_not_slept_through():
+    """A known deadline ends the interval just after it falls due."""
+    scheduler = make_scheduler()
+    scheduler.interval = 600
+    assert scheduler.next_interval(0.0, 0.0, deadlines=[130.2, -5.0]) == 132
+    # Deadlines never make the ticks faster than the minimum
+    assert scheduler.next_interval(0.0, 0.0, deadlines=[10.0]) == 60
+
+
+def test_a_controller_can_keep_its_own_rate():
+    """The per-pass maximum holds the interval at a controller's sample time."""
+    scheduler = make_scheduler()
+    for _ in range(5):
+        assert scheduler.next_interval(0.0, 0.0, max_interval=60) == 60
+
+
+def test_idle_zone_uses_the_maximum_interval():
+    """A zone that is off is ticked at the maximum interval."""
+    scheduler = make_scheduler()
+    assert scheduler.idle() == 600
+    assert scheduler.interval == 600